@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+from analyzer_snapshot import CACHE_DIR, snapshot_key
+
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, "checkpoint")
+STATE_FILENAME = "state.pkl"
+
+# 检查点内容的格式版本，结构变化时递增
+CHECKPOINT_VERSION = 1
+
+# 默认每分析多少首诗或每隔多少分钟写一次检查点（先到者为准）
+DEFAULT_CHECKPOINT_EVERY = 10000
+DEFAULT_CHECKPOINT_MINUTES = 10.0
+
+
+def run_key(options):
+    """
+    影响分析结果的运行参数与词典输入（同分析器快照键）的哈希；续跑时必须一致
+    """
+    payload = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1(f"{CHECKPOINT_VERSION}\0{snapshot_key()}\0{payload}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _write_pickle(obj, path):
+    """
+    先写临时文件并落盘，再替换目标文件，中断时不会留下半个文件
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AnalysisCheckpoint:
+    """
+    分析过程的检查点。逐诗结果按段追加写出（每段只含上次检查点之后的新结果），
+    读取位置（InputCursor）、符号表、去重索引与分级抽查统计整体写入 state.pkl；
+    state.pkl 只引用已完整写出的段，因此任何时刻中断都能回到最近一次完整的检查点。
+    关联矩阵与作者提及由逐诗结果按顺序重建，不单独保存
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, key=None, cursor=None, dedup=None,
+                 every=DEFAULT_CHECKPOINT_EVERY, minutes=DEFAULT_CHECKPOINT_MINUTES):
+        self.directory = directory
+        self.key = key
+        self.cursor = cursor
+        self.dedup = dedup
+        self.every = every
+        self.interval = minutes * 60 if minutes else None
+        self.segments = []
+        self.saved = 0
+        self.saves = 0
+        self._last_save = time.monotonic()
+
+    @property
+    def state_path(self):
+        return os.path.join(self.directory, STATE_FILENAME)
+
+    def due(self, count):
+        """
+        已分析 count 首时是否应写检查点
+        """
+        pending = count - self.saved
+        if pending <= 0:
+            return False
+        if self.every and pending >= self.every:
+            return True
+        return self.interval is not None and time.monotonic() - self._last_save >= self.interval
+
+    def save(self, records, tables, tier_report=None):
+        """
+        records 为到目前为止的全部逐诗结果（按顺序），只写出上次检查点之后新增的部分
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        segment = f"records-{len(self.segments):05d}.pkl"
+        _write_pickle(list(records[self.saved:]), os.path.join(self.directory, segment))
+        segments = self.segments + [segment]
+        _write_pickle(
+            {
+                "version": CHECKPOINT_VERSION,
+                "key": self.key,
+                "segments": segments,
+                "count": len(records),
+                "cursor": self.cursor.copy(),
+                "tables": tables,
+                "dedup": self.dedup,
+                "tier_report": tier_report,
+                "saved_at": time.time()
+            },
+            self.state_path
+        )
+        self.segments = segments
+        self.saved = len(records)
+        self.saves += 1
+        self._last_save = time.monotonic()
+
+    def load(self):
+        """
+        读取检查点并接管其中的读取位置与去重索引，返回 (state, records)；
+        没有检查点时返回 None，运行参数或词典与写检查点时不一致则报错
+        """
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != CHECKPOINT_VERSION or state.get("key") != self.key:
+            raise ValueError(
+                f"检查点 {self.directory} 与当前参数或词典不一致，无法续跑；请删除该目录或去掉 --resume"
+            )
+
+        records = []
+        for segment in state["segments"]:
+            with open(os.path.join(self.directory, segment), "rb") as f:
+                records.extend(pickle.load(f))
+        self.segments = list(state["segments"])
+        self.saved = state["count"]
+        self.cursor = state["cursor"]
+        self.dedup = state["dedup"]
+        self._last_save = time.monotonic()
+        return state, records
+
+    def clear(self):
+        """
+        删除检查点目录（新的一次运行开始时与全部导出完成后）
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.segments = []
+        self.saved = 0
@@ -0,0 +1,159 @@
+import hashlib
+import io
+import marshal
+import os
+import pickle
+import sys
+
+from poetry_lexicon import AUTHOR_PROFILES_PATH, BASE_DIR, GEO_COORDINATES_PATH, GEO_ENTITIES_PATH, OUTPUT_DIR
+
+CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "analyzer.snapshot")
+USERDICT_PATH = os.path.join(CACHE_DIR, "geo_userdict.txt")
+
+# 快照内容的格式版本，结构变化时递增
+SNAPSHOT_VERSION = 2
+
+# 参与快照键计算的输入：三份词典，以及其常量或类会进入快照的全部模块——
+# 构建分析器的代码、内置词表与情感/主题词典（poetry_lexicon）、符号表类（poetry_interning）、
+# 结巴用户词典的生成方式（本模块）
+SNAPSHOT_INPUTS = (
+    GEO_ENTITIES_PATH,
+    GEO_COORDINATES_PATH,
+    AUTHOR_PROFILES_PATH,
+    os.path.join(BASE_DIR, "poetey_analysis.py"),
+    os.path.join(BASE_DIR, "poetry_lexicon.py"),
+    os.path.join(BASE_DIR, "poetry_interning.py"),
+    os.path.abspath(__file__),
+)
+
+# 地名在结巴中的最低词频，保证“长安”“洞庭”等能整体切出
+GEO_WORD_FREQ = 2000
+GEO_WORD_TAG = "ns"
+
+
+def snapshot_key(paths=SNAPSHOT_INPUTS):
+    """
+    输入文件的大小与修改时间（不存在的文件记为缺失）、快照版本与结巴版本的哈希。
+    只看 stat 不读内容：热启动时读全部输入算哈希要近 0.1 秒；文件被改写或 touch 都会使快照失效
+    """
+    import jieba
+
+    digest = hashlib.sha1(f"{SNAPSHOT_VERSION}\0{jieba.__version__}".encode("utf-8"))
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature = f"{stat.st_size}\0{stat.st_mtime_ns}"
+        except FileNotFoundError:
+            signature = "missing"
+        digest.update(f"{os.path.basename(path)}\0{signature}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_jieba_userdict(alias_map, path=USERDICT_PATH):
+    """
+    由地理词典（标准名与别名）生成结巴用户词典：每行“词 词频 ns”
+    """
+    import jieba
+
+    jieba.dt.check_initialized()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for name in sorted(alias_map):
+            if not name or any(c.isspace() for c in name):
+                continue
+            freq = max(GEO_WORD_FREQ, jieba.dt.FREQ.get(name, 0))
+            f.write(f"{name} {freq} {GEO_WORD_TAG}\n")
+    return path
+
+
+def export_jieba_state(user_tags):
+    """
+    结巴前缀词典（已载入用户词典）与完整词性表（dict.txt 的词性加用户词性），
+    用 marshal 序列化（与结巴自带缓存同格式）
+    """
+    import jieba
+    import jieba.posseg as pseg
+
+    jieba.dt.check_initialized()
+    word_tags = dict(pseg.dt.word_tag_tab)
+    word_tags.update(user_tags)
+    # 按词性分组、每组的词以换行连接：载入时比逐词的 dict 快
+    grouped = {}
+    for word, tag in word_tags.items():
+        grouped.setdefault(tag, []).append(word)
+    grouped = {tag: "\n".join(words) for tag, words in grouped.items()}
+    return marshal.dumps((jieba.dt.FREQ, jieba.dt.total, grouped))
+
+
+def restore_jieba_state(data):
+    """
+    直接装入前缀词典与词性表，跳过结巴读取 dict.txt / jieba.cache 的冷启动。
+    jieba.posseg 导入时会为词性表再读一遍 dict.txt（约 0.5 秒），这里让它读空文件，随后换上快照中的词性表
+    """
+    import jieba
+
+    freq, total, grouped = marshal.loads(data)
+    with jieba.dt.lock:
+        jieba.dt.FREQ = freq
+        jieba.dt.total = total
+        jieba.dt.initialized = True
+    if "jieba.posseg" not in sys.modules:
+        jieba.dt.get_dict_file = io.BytesIO
+        try:
+            import jieba.posseg
+        finally:
+            del jieba.dt.get_dict_file
+    import jieba.posseg as pseg
+
+    word_tags = {}
+    for tag, words in grouped.items():
+        word_tags.update(dict.fromkeys(words.split("\n"), tag))
+    pseg.dt.word_tag_tab = word_tags
+
+
+def load_snapshot(path=SNAPSHOT_PATH, key=None):
+    """
+    读取快照；文件不存在、版本或输入哈希不一致时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except Exception as exc:
+        print(f"读取分析器快照失败，将重新构建。错误：{exc}")
+        return None
+    if snapshot.get("key") != (key or snapshot_key()):
+        return None
+    return snapshot
+
+
+def save_snapshot(state, jieba_state, path=SNAPSHOT_PATH, key=None):
+    """
+    写出快照（先写临时文件再替换，避免并发读到半个文件）
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot = {"key": key or snapshot_key(), "state": state, "jieba": jieba_state}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return snapshot
+
+
+def main():
+    """
+    构建（或刷新）分析器快照：python analyzer_snapshot.py
+    """
+    import time
+    from poetey_analysis import PoetryAnalyzer
+
+    started = time.time()
+    PoetryAnalyzer(snapshot_path=SNAPSHOT_PATH, rebuild=True)
+    print(f"已生成分析器快照 {SNAPSHOT_PATH}（{os.path.getsize(SNAPSHOT_PATH) / 1024 / 1024:.1f} MB，用时 {time.time() - started:.2f} 秒）")
+    print(f"结巴用户词典：{USERDICT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import json
 import os
 from typing import List, Dict
 
+from poetry_lexicon import EXCLUDED_NAMES
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 
@@ -11,7 +13,6 @@ GEO_SUFFIXES = [
     "坡", "洲", "州", "郡", "城", "关", "谷", "洞", "泉", "台", "岛"
 ]
 
-EXCLUDED_NAMES = {"千山","江山","山林","青山", "四海", "江湖", "山川","山河","西山","东山","天下", "九州", "五湖", "六合", "八荒", "九域", "四方", "宇内", "寰中", "江表", "河朔", "塞北", "岭南", "漠北", "中原", "南疆", "北疆", "关内", "关外", "河东", "河西", "山南", "山北", "淮左", "淮右", "山水", "四面山", "山河大地", "山阜", "峽山", "峡山", "河明", "浮川", "居海", "如海", "福海", "海陽", "海國", "海霧江", "湖江", "北湖", "青草湖", "柳邊湖", "明河", "陂湖", "好山", "山開南國", "莫指雲山", "中峰", "中台", "陽洲", "花洲", "四海九州"}
 
 
 def load_geo_stats() -> List[Dict]:
@@ -0,0 +1,68 @@
+import argparse
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 工具脚本依赖的模块与各自的导入时间上限（毫秒），约为实测值的两倍以上，避免机器负载波动造成误报；
+# poetey_analysis 导入 numpy、scipy，实测约 0.3 秒
+IMPORT_BUDGETS_MS = {
+    "poetry_lexicon": 50,
+    "poetry_interning": 50,
+    "poetry_db": 80,
+    "analyzer_snapshot": 80,
+    "poetry_pipeline": 160,
+    "poetey_analysis": 600,
+}
+
+# 不应在导入阶段加载的重量级依赖
+HEAVY_MODULES = ("jieba", "jieba.posseg", "jieba.analyse", "snownlp", "tqdm")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(f"{{elapsed:.1f}} {{','.join(heavy)}}")
+"""
+
+
+def measure(module, repeat=5):
+    """
+    在全新的解释器中导入 module，取 repeat 次中的最小耗时（毫秒）及导入阶段加载的重量级依赖
+    """
+    best, heavy = None, []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        elapsed = float(output[0])
+        heavy = output[1].split(",") if len(output) > 1 else []
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量各模块在全新解释器中的导入耗时")
+    parser.add_argument("modules", nargs="*", help="要测量的模块，默认全部")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块重复次数（取最小值）")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules or IMPORT_BUDGETS_MS:
+        elapsed, heavy = measure(module, args.repeat)
+        budget = IMPORT_BUDGETS_MS.get(module)
+        over = budget is not None and elapsed > budget
+        failed = failed or over or bool(heavy)
+        status = "超时" if over else "正常"
+        if heavy:
+            status = f"导入了 {','.join(heavy)}"
+        print(f"{module:<20} {elapsed:8.1f} ms  上限 {budget or '-'} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from memory_profile import deep_sizeof
+
+# 固定的小语料：花间集全部词作（约 500 首），保证各次测量可比
+FIXTURE_DATASET = "wudai-huajianji"
+
+# 每首诗的内存上限（字节），分析器本身（结巴词典、地理词典）不计入：
+# poems 为读入的原始诗词，analysis 为分析后保留的逐诗结果、作者提及与关联矩阵（不含与原始诗词共享的正文），
+# records 为逐诗结果（PoemRecord，含其引用的正文）的 deep_sizeof，peak 为读入与分析过程中 tracemalloc 的峰值。
+# 花间集全集实测约为 549 / 1020 / 1100 / 1663，只取 100 首时固定开销摊得多，peak 约 2800
+MEMORY_BUDGETS_PER_POEM = {
+    "poems": 1536,
+    "analysis": 4096,
+    "records": 2048,
+    "peak": 8192,
+}
+
+
+def measure(tokenizer="jieba", max_poems=None):
+    """
+    在固定语料上测量每首诗的内存：先构建分析器，再用 tracemalloc 分别计量读入与分析后保留的分配。
+    返回 {项目: 每首诗字节数} 与诗数
+    """
+    from poetey_analysis import PoetryAnalyzer, load_poetry_from_local
+
+    analyzer = PoetryAnalyzer(tokenizer=tokenizer)
+    # 先分析一首，让结巴、SnowNLP 等完成首次加载，不计入每首诗的开销
+    warmup = load_poetry_from_local(1, datasets=FIXTURE_DATASET, workers=1)
+    analyzer.analyze_poetry_collection(warmup)
+    gc.collect()
+
+    tracemalloc.start()
+    poems = load_poetry_from_local(max_poems or sys.maxsize, datasets=FIXTURE_DATASET, workers=1)
+    gc.collect()
+    after_load, _ = tracemalloc.get_traced_memory()
+    analysis = analyzer.analyze_poetry_collection(poems)
+    gc.collect()
+    after_analysis, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = max(1, len(poems))
+    results = {
+        "poems": after_load / count,
+        "analysis": (after_analysis - after_load) / count,
+        "peak": peak / count,
+        "records": deep_sizeof(analysis["poems"]) / count,
+    }
+    return results, len(poems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在固定语料上测量每首诗的内存占用，超出上限时以非零状态退出")
+    parser.add_argument("--tokenizer", choices=("jieba", "classical"), default="jieba", help="分析器使用的分词器")
+    parser.add_argument("--max-poems", type=int, help="只取语料的前若干首，默认全部")
+    args = parser.parse_args()
+
+    results, count = measure(args.tokenizer, args.max_poems)
+    print(f"固定语料 {FIXTURE_DATASET}：{count} 首")
+    failed = False
+    for item, per_poem in results.items():
+        budget = MEMORY_BUDGETS_PER_POEM.get(item)
+        over = budget is not None and per_poem > budget
+        failed = failed or over
+        status = "超出" if over else "正常"
+        print(f"{item:<22} {per_poem:10.0f} 字节/首  上限 {budget or '-'} 字节  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from analyzer_snapshot import CACHE_DIR
+from poetry_lexicon import AUTHOR_PROFILES_PATH, BASE_DIR, DATA_DIR, GEO_COORDINATES_PATH, GEO_ENTITIES_PATH, OUTPUT_DIR
+
+MANIFEST_PATH = os.path.join(CACHE_DIR, "build_manifest.json")
+LOG_DIR = os.path.join(CACHE_DIR, "logs")
+TEMPLATE_PATH = os.path.join(BASE_DIR, "templates", "dashboard_template.html")
+
+# 清单格式版本，结构变化时递增
+MANIFEST_VERSION = 1
+
+# poetey_analysis.py 写出的文件（见 export_analysis_outputs）
+ANALYSIS_OUTPUTS = (
+    "geo_stats.json",
+    "sentiment_trend.json",
+    "keyword_clouds.json",
+    "poet_paths.json",
+    "place_network.json",
+    "poet_network.json",
+    "geo_cube.npz",
+)
+
+
+def output_path(filename):
+    return os.path.join(OUTPUT_DIR, filename)
+
+
+def relative(path):
+    return os.path.relpath(path, BASE_DIR).replace(os.sep, "/")
+
+
+class Stage:
+    """
+    一个构建步骤：在仓库根目录运行 script（附 args），读取 inputs、写出 outputs。
+    script 及其（递归）导入的本仓库模块自动计入输入
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), args=()):
+        self.name = name
+        self.script = os.path.join(BASE_DIR, script)
+        self.inputs = [os.path.abspath(path) for path in inputs]
+        self.outputs = [os.path.abspath(path) for path in outputs]
+        self.args = [str(arg) for arg in args]
+
+    @property
+    def command(self):
+        return [sys.executable, self.script, *self.args]
+
+    def code_inputs(self):
+        return local_modules(self.script)
+
+
+def local_modules(script, search_dirs=(BASE_DIR,)):
+    """
+    script 及其递归导入的本仓库模块（按 import 语句解析，不执行代码）
+    """
+    found = []
+    seen = set()
+    stack = [os.path.abspath(script)]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        found.append(path)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        dirs = (os.path.dirname(path), *search_dirs)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                for directory in dirs:
+                    candidate = os.path.join(directory, *name.split(".")) + ".py"
+                    if os.path.exists(candidate):
+                        stack.append(candidate)
+                        break
+    return sorted(found)
+
+
+def build_stages(args):
+    """
+    声明全部步骤。依赖关系由输入输出推出：某步骤的输入若是另一步骤的输出，则在其后运行
+    """
+    from classical_segmenter import CHAR_TABLE_PATH, CLASSICAL_WORDS_PATH
+    from poetry_datasets import resolve_datasets
+
+    corpus = [path for spec in resolve_datasets(args.datasets) for path in spec.files()]
+    analysis_args = ["--max-poems", args.max_poems]
+    if args.datasets:
+        analysis_args += ["--datasets", args.datasets]
+    geo_stats = output_path("geo_stats.json")
+
+    return [
+        Stage(
+            "analysis",
+            "poetey_analysis.py",
+            inputs=[
+                *corpus,
+                GEO_ENTITIES_PATH,
+                GEO_COORDINATES_PATH,
+                AUTHOR_PROFILES_PATH,
+                CLASSICAL_WORDS_PATH,
+                CHAR_TABLE_PATH,
+            ],
+            outputs=[output_path(name) for name in ANALYSIS_OUTPUTS],
+            args=analysis_args
+        ),
+        Stage(
+            "audit",
+            "audit_geo_entities.py",
+            inputs=[geo_stats],
+            outputs=[output_path("geo_stats_filtered.json")]
+        ),
+        Stage(
+            "geo_only",
+            "generate_geo_only.py",
+            inputs=[geo_stats],
+            outputs=[output_path("geo_stats_mountains_rivers_only.json")]
+        ),
+        Stage(
+            "real_geos",
+            "data/export_real_geos.py",
+            # load_geo_stats 读取 poetry.db（--sqlite 导出），不存在或比 geo_stats.json 旧时读 geo_stats.json
+            inputs=[geo_stats, output_path("poetry.db"), GEO_COORDINATES_PATH],
+            outputs=[os.path.join(DATA_DIR, "real_geographic_locations.json")]
+        ),
+        Stage(
+            "dashboard",
+            "visual_dashboard.py",
+            inputs=[
+                geo_stats,
+                output_path("sentiment_trend.json"),
+                output_path("keyword_clouds.json"),
+                output_path("poet_paths.json"),
+                output_path("place_network.json"),
+                TEMPLATE_PATH,
+            ],
+            outputs=[output_path("poetry_dashboard.html")]
+        ),
+    ]
+
+
+class FileHasher:
+    """
+    文件内容的 sha1；按（大小, 修改时间）缓存，未改动的文件不重新读取（语料有上百 MB）
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or {}
+
+    def digest(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = relative(path)
+        entry = self.cache.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cache[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return self.cache[key][2]
+
+
+def stage_key(stage, hasher):
+    """
+    命令行与全部输入（数据、代码）内容的哈希；不存在的输入按缺失计
+    """
+    inputs = sorted(set(stage.inputs) | set(stage.code_inputs()))
+    payload = {
+        "command": [relative(stage.script), *stage.args],
+        "inputs": [[relative(path), hasher.digest(path)] for path in inputs]
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except ValueError:
+            pass
+    return {"version": MANIFEST_VERSION, "stages": {}, "files": {}}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def is_fresh(stage, key, manifest, hasher):
+    """
+    输入哈希与上次成功运行一致，且输出仍是当时写出的内容
+    """
+    record = manifest["stages"].get(stage.name)
+    if not record or record.get("key") != key:
+        return False
+    return all(
+        hasher.digest(path) is not None and hasher.digest(path) == record["outputs"].get(relative(path))
+        for path in stage.outputs
+    )
+
+
+def stage_dependencies(stages):
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {
+        stage.name: {producers[path] for path in stage.inputs if producers.get(path, stage.name) != stage.name}
+        for stage in stages
+    }
+
+
+def select_stages(stages, targets):
+    """
+    目标步骤及其上游步骤（保持声明顺序）
+    """
+    if not targets:
+        return stages
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的步骤：{','.join(unknown)}（可选：{','.join(by_name)}）")
+    deps = stage_dependencies(stages)
+    wanted = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in wanted:
+            wanted.add(name)
+            stack.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def run_stage(stage):
+    """
+    运行一个步骤，标准输出与错误写入 output/cache/logs/<步骤>.log；返回 (退出码, 耗时秒数)
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    started = time.perf_counter()
+    env = dict(os.environ, TQDM_DISABLE="1")
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), "w", encoding="utf-8") as log:
+        result = subprocess.run(stage.command, cwd=BASE_DIR, stdout=log, stderr=subprocess.STDOUT, env=env)
+    return result.returncode, time.perf_counter() - started
+
+
+def _log_tail(stage, lines=10):
+    with open(os.path.join(LOG_DIR, f"{stage.name}.log"), encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+
+def build(stages, jobs=1, force=(), dry_run=False, manifest_path=MANIFEST_PATH):
+    """
+    按依赖顺序运行过期的步骤：上游全部完成（或跳过）后计算输入哈希，未变则跳过，
+    互不依赖的步骤最多 jobs 个同时运行。返回 {步骤: "跳过" / "完成" / "失败" / "未运行"}
+    """
+    manifest = load_manifest(manifest_path)
+    hasher = FileHasher(manifest["files"])
+    deps = stage_dependencies(stages)
+    names = {stage.name for stage in stages}
+    force = names if "all" in force else set(force)
+    status = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for stage in list(pending):
+                    upstream = deps[stage.name] & names
+                    if any(status.get(name) in ("失败", "未运行") for name in upstream):
+                        status[stage.name] = "未运行"
+                    elif dry_run and any(status.get(name) == "将运行" for name in upstream):
+                        status[stage.name] = "将运行"
+                        print(f"[将运行] {stage.name}：上游将重新生成")
+                    elif all(status.get(name) in ("跳过", "完成") for name in upstream):
+                        key = stage_key(stage, hasher)
+                        if stage.name not in force and is_fresh(stage, key, manifest, hasher):
+                            status[stage.name] = "跳过"
+                            print(f"[跳过] {stage.name}：输入未变")
+                        elif dry_run:
+                            status[stage.name] = "将运行"
+                            print(f"[将运行] {stage.name}")
+                        else:
+                            print(f"[开始] {stage.name}：{' '.join(relative(arg) if os.path.isabs(arg) else arg for arg in stage.command[1:])}")
+                            running[pool.submit(run_stage, stage)] = (stage, key)
+                            status[stage.name] = "运行中"
+                    else:
+                        continue
+                    pending.remove(stage)
+                    progressed = True
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, key = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode != 0:
+                    status[stage.name] = "失败"
+                    print(f"[失败] {stage.name}（退出码 {returncode}，{seconds:.2f} 秒），日志末尾：\n{_log_tail(stage)}")
+                    continue
+                status[stage.name] = "完成"
+                manifest["stages"][stage.name] = {
+                    "key": key,
+                    "outputs": {relative(path): hasher.digest(path) for path in stage.outputs},
+                    "seconds": round(seconds, 3)
+                }
+                save_manifest(manifest, manifest_path)
+                print(f"[完成] {stage.name}（{seconds:.2f} 秒）")
+
+    if not dry_run:
+        save_manifest(manifest, manifest_path)
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="按依赖顺序生成分析结果、后处理文件与可视化页面，输入未变的步骤直接跳过"
+    )
+    parser.add_argument("targets", nargs="*", help="要生成的步骤（连同其上游），默认全部")
+    parser.add_argument("--force", action="append", default=[], help="强制重跑的步骤，可重复；all 表示全部")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要运行的步骤")
+    parser.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1), help="最多同时运行的步骤数")
+    parser.add_argument("--max-poems", type=int, default=10000, help="传给 poetey_analysis.py 的 --max-poems")
+    parser.add_argument("--datasets", help="传给 poetey_analysis.py 的 --datasets")
+    parser.add_argument("--list", action="store_true", help="列出全部步骤及其输入输出")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stages = build_stages(args)
+    if args.list:
+        deps = stage_dependencies(stages)
+        for stage in stages:
+            print(f"{stage.name}（依赖：{','.join(sorted(deps[stage.name])) or '-'}）")
+            print(f"  输入：{len(stage.inputs)} 个文件 + {len(stage.code_inputs())} 个模块")
+            for path in stage.outputs:
+                print(f"  输出：{relative(path)}")
+        return
+
+    try:
+        stages = select_stages(stages, args.targets)
+        unknown = [name for name in args.force if name != "all" and name not in {stage.name for stage in stages}]
+        if unknown:
+            raise ValueError(f"--force 指定了未选中的步骤：{','.join(unknown)}")
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    status = build(stages, args.jobs, args.force, args.dry_run)
+    print(f"用时 {time.perf_counter() - started:.2f} 秒")
+    sys.exit(1 if "失败" in status.values() else 0)
+
+
+if __name__ == "__main__":
+    main()
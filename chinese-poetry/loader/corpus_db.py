@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from data_loader import DATAS_CONFIG, DYNASTY_CODES, dataset_files, file_dynasty, load_config
+
+
+CORPUS_DB = "./corpus.db"
+BATCH_SIZE = 10000
+
+# keys that may hold the title of a poem, in order of preference
+TITLE_KEYS = ("title", "rhythmic", "chapter", "section")
+
+SCHEMA = """
+CREATE TABLE datasets (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL
+);
+CREATE TABLE poems (
+    id INTEGER PRIMARY KEY,
+    dataset_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    dynasty TEXT,
+    content TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE poems_fts USING fts5(
+    title, content, content='poems', content_rowid='id', tokenize='trigram'
+);
+"""
+
+INDEXES = """
+CREATE INDEX idx_poems_dataset ON poems (dataset_id);
+CREATE INDEX idx_poems_author ON poems (author);
+CREATE INDEX idx_poems_dynasty ON poems (dynasty);
+CREATE INDEX idx_poems_title ON poems (title);
+"""
+
+
+def parse_file(job: tuple) -> list:
+    """
+    parse one json file into (source, title, author, dynasty, content) rows;
+    runs in a worker process, entries without the body tag are skipped
+    """
+    dataset_id, path, tag, default_dynasty, top_level_path = job
+    with open(path, mode='r', encoding='utf-8') as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = [data]
+
+    source = os.path.relpath(path, top_level_path)
+    rows = []
+    for poem in data:
+        if not isinstance(poem, dict):
+            continue
+        body = poem.get(tag)
+        if not body:
+            continue
+        content = body if isinstance(body, str) else "\n".join(body)
+        title = next((poem[key] for key in TITLE_KEYS if poem.get(key)), None)
+        dynasty = poem.get("dynasty")
+        rows.append(
+            (dataset_id, source, title, poem.get("author"),
+             DYNASTY_CODES.get(dynasty, dynasty) or default_dynasty, content)
+        )
+    return rows
+
+
+def build_corpus_db(db_path: str=CORPUS_DB, config_path: str=DATAS_CONFIG,
+                    targets: list=None, workers: int=None) -> int:
+    """
+    import every dataset in datas.json (or only `targets`) into one sqlite
+    file with a trigram fts5 index over titles and text.
+    json files are parsed in a process pool, rows are inserted in batches
+    inside a single transaction and the fts index is built once at the end.
+    returns the number of imported poems
+    """
+    data = load_config(config_path)
+    top_level_path = data["cp_path"]
+    datasets = data["datasets"]
+    targets = targets or list(datasets)
+
+    jobs = []
+    dataset_rows = []
+    for key in targets:
+        configs = datasets[key]
+        dataset_rows.append((configs["id"], key, configs["name"]))
+        for path in dataset_files(top_level_path, configs):
+            jobs.append((configs["id"], path, configs["tag"], file_dynasty(path, configs), top_level_path))
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA synchronous = OFF")
+    total = 0
+    try:
+        with conn, ProcessPoolExecutor(max_workers=workers) as pool:
+            conn.executescript(SCHEMA)
+            conn.executemany("INSERT INTO datasets VALUES (?, ?, ?)", dataset_rows)
+            pending = []
+            # files are parsed in parallel, but map() keeps their order
+            for rows in pool.map(parse_file, jobs, chunksize=8):
+                pending += rows
+                if len(pending) >= BATCH_SIZE:
+                    conn.executemany(
+                        "INSERT INTO poems (dataset_id, source, title, author, dynasty, content) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        pending
+                    )
+                    total += len(pending)
+                    pending = []
+            if pending:
+                conn.executemany(
+                    "INSERT INTO poems (dataset_id, source, title, author, dynasty, content) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    pending
+                )
+                total += len(pending)
+            conn.executescript(INDEXES)
+            conn.execute("INSERT INTO poems_fts (poems_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO poems_fts (poems_fts) VALUES ('optimize')")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return total
+
+
+def search(conn: sqlite3.Connection, text: str, author: str=None,
+           dataset: str=None, limit: int=20) -> list:
+    """
+    full-text search over titles and content.
+    the trigram index needs at least 3 characters; shorter queries fall
+    back to a LIKE scan
+    """
+    params = []
+    if len(text) >= 3:
+        sql = (
+            "SELECT p.id, p.title, p.author, p.dynasty, d.key, p.content "
+            "FROM poems_fts JOIN poems p ON p.id = poems_fts.rowid "
+            "JOIN datasets d ON d.id = p.dataset_id WHERE poems_fts MATCH ?"
+        )
+        params.append('"' + text.replace('"', '""') + '"')
+    else:
+        sql = (
+            "SELECT p.id, p.title, p.author, p.dynasty, d.key, p.content "
+            "FROM poems p JOIN datasets d ON d.id = p.dataset_id "
+            "WHERE (p.content LIKE ? OR p.title LIKE ?)"
+        )
+        params += [f"%{text}%", f"%{text}%"]
+    if author:
+        sql += " AND p.author = ?"
+        params.append(author)
+    if dataset:
+        sql += " AND d.key = ?"
+        params.append(dataset)
+    # fts hits are ranked by bm25, LIKE hits keep corpus order
+    sql += " ORDER BY poems_fts.rank LIMIT ?" if len(text) >= 3 else " ORDER BY p.id LIMIT ?"
+    params.append(limit)
+
+    keys = ("id", "title", "author", "dynasty", "dataset", "content")
+    return [dict(zip(keys, row)) for row in conn.execute(sql, params)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="build or query the corpus sqlite database")
+    parser.add_argument("--db", default=CORPUS_DB)
+    parser.add_argument("--config", default=DATAS_CONFIG)
+    parser.add_argument("--datasets", nargs="*", help="dataset keys from datas.json, default all")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--search", help="query an existing database instead of building it")
+    parser.add_argument("--author")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.search:
+        if not os.path.isfile(args.db):
+            parser.error(f"database {args.db} does not exist, build it first (run without --search)")
+        # read-only, so a wrong --db path cannot leave an empty database behind
+        conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        for row in search(conn, args.search, args.author, limit=args.limit):
+            print(row["id"], row["dataset"], row["author"], row["title"])
+            print(row["content"])
+        conn.close()
+    else:
+        count = build_corpus_db(args.db, args.config, args.datasets, args.workers)
+        print(f"imported {count} poems into {args.db}")
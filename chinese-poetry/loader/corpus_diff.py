@@ -0,0 +1,263 @@
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import re
+from collections import Counter
+
+from data_loader import natural_key
+
+
+# punctuation and whitespace are ignored when comparing texts
+PUNCTUATION = re.compile(r"[，。、；：？！“”‘’「」『』《》〈〉…（）()·・\-—\s,.;:?!\"'\[\]【】□]")
+
+NGRAM = 2
+MIN_SIMILARITY = 0.6
+# grams shared by more entries than this are too common to help alignment
+MAX_POSTINGS = 500
+
+
+def only_text(text: str) -> str:
+    """ drop punctuation, keep the characters """
+    return PUNCTUATION.sub("", text)
+
+
+def entry_text(entry: dict, tag: str="paragraphs") -> str:
+    body = entry.get(tag, "")
+    if not isinstance(body, str):
+        body = "".join(body)
+    return only_text(body)
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def ngrams(text: str, n: int=NGRAM) -> set:
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def similarity(a: set, b: set) -> float:
+    """ dice coefficient of two n-gram sets """
+    if not a and not b:
+        return 1.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class EntryIndex:
+    """
+    hashed index over one version of a dataset: exact text hashes plus an
+    inverted n-gram index, built once and reusable across many diffs
+    """
+
+    def __init__(self, entries: list, tag: str="paragraphs", n: int=NGRAM):
+        self.entries = entries
+        self.tag = tag
+        self.n = n
+        self.texts = [entry_text(entry, tag) for entry in entries]
+        self.grams = [ngrams(text, n) for text in self.texts]
+        self.by_hash = {}
+        for position, text in enumerate(self.texts):
+            self.by_hash.setdefault(text_hash(text), []).append(position)
+        self.postings = {}
+        for position, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+
+    def candidates(self, grams: set, taken: set, limit: int=5) -> list:
+        """ best untaken positions sharing the most n-grams with `grams` """
+        hits = Counter()
+        for gram in grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) > MAX_POSTINGS:
+                continue
+            hits.update(posting)
+        best = heapq.nlargest(
+            limit, ((count, position) for position, count in hits.items() if position not in taken)
+        )
+        return [position for _, position in best]
+
+
+def _increasing_run(pairs: list) -> set:
+    """
+    pairs are (old, new) sorted by old; returns the indices of a longest
+    subsequence whose new positions increase, i.e. the entries that kept
+    their relative order. everything else has moved
+    """
+    tails, tail_index, parent = [], [], [None] * len(pairs)
+    for i, (_, new) in enumerate(pairs):
+        k = bisect.bisect_left(tails, new)
+        if k == len(tails):
+            tails.append(new)
+            tail_index.append(i)
+        else:
+            tails[k] = new
+            tail_index[k] = i
+        parent[i] = tail_index[k - 1] if k else None
+    keep = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        keep.add(i)
+        i = parent[i]
+    return keep
+
+
+def diff_entries(old_entries: list, new_entries: list, tag: str="paragraphs",
+                 min_similarity: float=MIN_SIMILARITY, index: EntryIndex=None) -> dict:
+    """
+    align two versions of a dataset.
+    entries with the same text are paired first (in order), the rest are
+    paired through the n-gram index when their similarity reaches
+    `min_similarity`. pairs outside the longest in-order run are moved.
+    returns {"pairs": [(old, new, similarity, status)], "added": [new],
+    "removed": [old]} where status is identical / minor-variant / moved
+    """
+    index = index or EntryIndex(new_entries, tag)
+    taken = set()
+    matched = {}
+
+    unmatched = []
+    for old, entry in enumerate(old_entries):
+        text = entry_text(entry, tag)
+        positions = index.by_hash.get(text_hash(text), ())
+        position = next((p for p in positions if p not in taken and index.texts[p] == text), None)
+        if position is None:
+            unmatched.append(old)
+        else:
+            taken.add(position)
+            matched[old] = (position, 1.0)
+
+    # near matches, most similar first so every new entry goes to its best old one
+    proposals = []
+    for old in unmatched:
+        grams = ngrams(entry_text(old_entries[old], tag), index.n)
+        for position in index.candidates(grams, taken):
+            score = similarity(grams, index.grams[position])
+            if score >= min_similarity:
+                proposals.append((-score, old, position))
+    proposals.sort()
+    for negative_score, old, position in proposals:
+        if old in matched or position in taken:
+            continue
+        taken.add(position)
+        matched[old] = (position, -negative_score)
+
+    ordered = sorted(matched.items())
+    in_order = _increasing_run([(old, position) for old, (position, _) in ordered])
+    pairs = []
+    for i, (old, (position, score)) in enumerate(ordered):
+        if i not in in_order:
+            status = "moved"
+        elif score == 1.0 and old_entries[old] == index.entries[position]:
+            status = "identical"
+        else:
+            status = "minor-variant"
+        pairs.append((old, position, score, status))
+
+    return {
+        "pairs": pairs,
+        "added": [p for p in range(len(index.entries)) if p not in taken],
+        "removed": [old for old in range(len(old_entries)) if old not in matched]
+    }
+
+
+def summarize(diff: dict) -> dict:
+    counts = Counter(status for _, _, _, status in diff["pairs"])
+    counts["added"] = len(diff["added"])
+    counts["removed"] = len(diff["removed"])
+    return dict(counts)
+
+
+def _field_changes(old: dict, new: dict) -> dict:
+    changes = {key: value for key, value in new.items() if old.get(key) != value}
+    dropped = [key for key in old if key not in new]
+    if dropped:
+        changes["__drop__"] = dropped
+    return changes
+
+
+def make_patch(old_entries: list, new_entries: list, diff: dict) -> dict:
+    """
+    compact patch turning `old_entries` into `new_entries`:
+    unchanged pairs are stored as runs [old_start, new_start, length],
+    changed pairs as [old, new, {field: value}], added entries in full
+    """
+    runs, changed = [], []
+    for old, new, _, _ in sorted(diff["pairs"], key=lambda pair: pair[1]):
+        changes = _field_changes(old_entries[old], new_entries[new])
+        if changes:
+            changed.append([old, new, changes])
+        elif runs and runs[-1][0] + runs[-1][2] == old and runs[-1][1] + runs[-1][2] == new:
+            runs[-1][2] += 1
+        else:
+            runs.append([old, new, 1])
+    return {
+        "old_count": len(old_entries),
+        "new_count": len(new_entries),
+        "summary": summarize(diff),
+        "keep": runs,
+        "change": changed,
+        "add": [[new, new_entries[new]] for new in diff["added"]],
+        "remove": diff["removed"]
+    }
+
+
+def apply_patch(old_entries: list, patch: dict) -> list:
+    if len(old_entries) != patch["old_count"]:
+        raise ValueError(
+            f"patch expects {patch['old_count']} entries, got {len(old_entries)}"
+        )
+    result = [None] * patch["new_count"]
+    for old, new, length in patch["keep"]:
+        result[new:new + length] = old_entries[old:old + length]
+    for old, new, changes in patch["change"]:
+        entry = {
+            key: value for key, value in old_entries[old].items()
+            if key not in changes.get("__drop__", ())
+        }
+        entry.update({key: value for key, value in changes.items() if key != "__drop__"})
+        result[new] = entry
+    for new, entry in patch["add"]:
+        result[new] = entry
+    return result
+
+
+def load_entries(path: str) -> list:
+    """ a json file, or every json file of a directory in natural order """
+    if os.path.isfile(path):
+        files = [path]
+    else:
+        files = [
+            os.path.join(path, filename)
+            for filename in sorted(os.listdir(path), key=natural_key)
+            if filename.endswith(".json")
+        ]
+    entries = []
+    for filename in files:
+        with open(filename, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entries += data if isinstance(data, list) else [data]
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="diff two versions of a dataset")
+    parser.add_argument("old", help="json file or directory")
+    parser.add_argument("new", help="json file or directory")
+    parser.add_argument("--tag", default="paragraphs", help="field holding the text")
+    parser.add_argument("--min-similarity", type=float, default=MIN_SIMILARITY)
+    parser.add_argument("--patch", help="write the patch to this file")
+    args = parser.parse_args()
+
+    old_entries = load_entries(args.old)
+    new_entries = load_entries(args.new)
+    diff = diff_entries(old_entries, new_entries, args.tag, args.min_similarity)
+    print(json.dumps(summarize(diff), ensure_ascii=False))
+    if args.patch:
+        patch = make_patch(old_entries, new_entries, diff)
+        with open(args.patch, "w", encoding="utf-8") as f:
+            json.dump(patch, f, ensure_ascii=False, separators=(",", ":"))
@@ -1,59 +1,190 @@
+import hashlib
 import json
 import os
+import pickle
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 
 
 DATAS_CONFIG = "./loader/datas.json"
 
+# english dynasty codes used in file names and records
+DYNASTY_CODES = {"tang": "唐", "song": "宋", "yuan": "元", "ming": "明", "qing": "清"}
+# dynasty marker in a file name, as in poet.tang.1000.json / poet.song.1000.json
+FILE_DYNASTY_PATTERN = re.compile(r"\.(tang|song|yuan|ming|qing)\.")
+
+
+def natural_key(filename: str) -> list:
+    """ sort key putting poet.tang.2.json before poet.tang.10.json """
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", filename)]
+
+
+def load_config(config_path: str=DATAS_CONFIG) -> dict:
+    """ datas.json: cp_path and the dataset registry """
+    with open(config_path, 'r', encoding='utf-8') as config:
+        return json.load(config)
+
+
+def dataset_files(top_level_path: str, configs: dict) -> list:
+    """
+    json files making up a dataset, in natural order. sub-directories (such
+    as 全唐诗/error) and files in the dataset's excludes are skipped; a
+    missing path gives no files
+    """
+    full_path = os.path.join(top_level_path, configs["path"])
+    if os.path.isfile(full_path):  # single file json
+        return [full_path]
+    if not os.path.isdir(full_path):
+        return []
+    # a dir, probably with a skip list
+    excludes = set(configs.get("excludes", ()))
+    return [
+        os.path.join(full_path, filename)
+        for filename in sorted(os.listdir(full_path), key=natural_key)
+        if filename.endswith(".json")
+        and filename not in excludes
+        and os.path.isfile(os.path.join(full_path, filename))
+    ]
+
+
+def file_dynasty(path: str, configs: dict):
+    """
+    dynasty of the poems in one file: the marker in its name when there is
+    one (全唐诗 mixes tang and song files), else the dataset's "dynasty"
+    """
+    match = FILE_DYNASTY_PATTERN.search(os.path.basename(path))
+    return DYNASTY_CODES[match.group(1)] if match else configs.get("dynasty")
+
+
+def parse_body_file(job: tuple) -> list:
+    """
+    paragraphs of one json file; records without the tag are skipped and a
+    plain string body counts as one paragraph. runs in worker processes
+    """
+    path, tag = job
+    with open(path, mode='r', encoding='utf-8') as file:
+        data = json.load(file)
+    body = []
+    for poem in data:
+        value = poem.get(tag) if isinstance(poem, dict) else None
+        if not value:
+            continue
+        if isinstance(value, str):
+            body.append(value)
+        else:
+            body += value
+    return body
+
 
 class PlainDataLoader():
-    def __init__(self, config_path: str=DATAS_CONFIG) -> None:
+    def __init__(self, config_path: str=DATAS_CONFIG, workers: int=None,
+                 cache_dir: str=None) -> None:
+        """
+        workers: processes used to parse directory datasets (None = cpu count,
+            1 = parse in this process)
+        cache_dir: optional directory for parsed files, reused while the
+            source file's mtime and size are unchanged
+        """
         self._path = config_path
-        with open(config_path, 'r', encoding='utf-8') as config:
-            data = json.load(config)
-            self.top_level_path:str = data["cp_path"]
-            self.datasets:dict = data["datasets"]
-            self.id_table = {
-                v["id"]: k for (k, v) in self.datasets.items()
-            }
-    
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        data = load_config(config_path)
+        self.top_level_path:str = data["cp_path"]
+        self.datasets:dict = data["datasets"]
+        self.id_table = {
+            v["id"]: k for (k, v) in self.datasets.items()
+        }
+
+    def dataset_files(self, target: str) -> list:
+        return dataset_files(self.top_level_path, self.datasets[target])
+
+    def _cache_path(self, path: str, tag: str) -> str:
+        digest = hashlib.sha1(f"{os.path.abspath(path)}\0{tag}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".pickle")
+
+    def _load_cached(self, path: str, tag: str):
+        if not self.cache_dir:
+            return None
+        cache_path = self._cache_path(path, tag)
+        if not os.path.exists(cache_path):
+            return None
+        stat = os.stat(path)
+        with open(cache_path, 'rb') as file:
+            stamp, body = pickle.load(file)
+        if stamp != (stat.st_mtime_ns, stat.st_size):
+            return None
+        return body
+
+    def _store_cached(self, path: str, tag: str, body: list) -> None:
+        if not self.cache_dir:
+            return
+        stat = os.stat(path)
+        with open(self._cache_path(path, tag), 'wb') as file:
+            pickle.dump(((stat.st_mtime_ns, stat.st_size), body), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _iter_file_bodies(self, files: list, tag: str):
+        """
+        paragraphs per file, in file order. uncached files are parsed by the
+        pool with at most 2 * workers files in flight, so memory stays bounded
+        """
+        if self.workers <= 1 or len(files) <= 1:
+            for path in files:
+                body = self._load_cached(path, tag)
+                if body is None:
+                    body = parse_body_file((path, tag))
+                    self._store_cached(path, tag, body)
+                yield body
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            queue = iter(files)
+            while True:
+                while len(pending) < 2 * self.workers:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    body = self._load_cached(path, tag)
+                    pending.append((path, body if body is not None else pool.submit(parse_body_file, (path, tag))))
+                if not pending:
+                    return
+                path, result = pending.popleft()
+                if not isinstance(result, list):
+                    result = result.result()
+                    self._store_cached(path, tag, result)
+                yield result
+
+    def iter_body(self, target: str):
+        """ stream the paragraphs of one dataset """
+        if target not in self.datasets:
+            print(f"{target} is not included in datas.json as a dataset")
+            return
+        tag = self.datasets[target]["tag"]
+        for body in self._iter_file_bodies(self.dataset_files(target), tag):
+            yield from body
+
+    def iter_multiple(self, targets: list):
+        """ stream the paragraphs of several datasets, one dataset after another """
+        return chain.from_iterable(self.iter_body(target) for target in targets)
+
+    def iter_with_ids(self, ids: list):
+        return self.iter_multiple([self.id_table[id] for id in ids])
+
     def body_extractor(self, target: str) -> list:
         if target not in self.datasets:
             print(f"{target} is not included in datas.json as a dataset")
             return None
-        configs = self.datasets[target]
-        tag = configs["tag"]
-        body = []  # may get a bit huge... 
-        full_path = os.path.join(self.top_level_path, configs["path"])
-        if os.path.isfile(full_path):  # single file json
-            with open(full_path, mode='r', encoding='utf-8') as file:
-                data = json.load(file)
-                for poem in data:
-                    body += poem[tag]
-            return body
-        # a dir, probably with a skip list
-        subpaths = os.listdir(full_path)
-        for filename in subpaths:
-            if filename in configs["excludes"]:
-                continue
-            with open(os.path.join(full_path, filename), mode='r', encoding='utf-8') as file:
-                data = json.load(file)
-                for poem in data:
-                    body += poem[tag]
-        return body
+        return list(self.iter_body(target))
 
     def extract_from_multiple(self, targets: list) -> list:
-        results = []
-        for target in targets:
-            results += self.body_extractor(target)
-        return results
-    
+        return list(self.iter_multiple(targets))
+
     def extract_with_ids(self, ids: list) -> list:
-        results = []
-        for id in ids:
-            results += self.body_extractor(
-                self.id_table[id]
-            )
-        return results
+        return list(self.iter_with_ids(ids))
 
 
 
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from data_loader import DATAS_CONFIG, dataset_files, load_config
+
+
+# fields every record of a dataset must carry besides its body tag
+REQUIRED_FIELDS = {
+    "wudai-huajianji": ("title", "author"),
+    "wudai-nantang": ("title", "author"),
+    "yuanqu": ("title", "author"),
+    "tangsong": ("title", "author"),
+    "mengzi": ("chapter",),
+    "songci": ("rhythmic", "author"),
+    "youmengying": (),
+    "yudingquantangshi": ("title", "author"),
+    "caocao": ("title",),
+    "chuci": ("title", "author"),
+    "shuimotangshi": ("title", "author"),
+    "nalanxingde": ("title", "author"),
+    "lunyu": ("chapter",),
+    "shijing": ("title", "chapter"),
+}
+
+# body tags that hold a single string instead of a list of paragraphs
+STRING_BODIES = {"youmengying"}
+
+# these issues make a file unusable; everything else is reported as a warning
+ERROR_CODES = {"parse_error", "bad_root"}
+
+
+def is_book_directory(name: str, parent: str=".") -> bool:
+    """
+    same rule as test_poetry.py: a directory with a cjk character in its
+    own name. `name` is the bare entry name, the cjk test never looks at
+    `parent` (which may itself contain cjk characters)
+    """
+    return os.path.isdir(os.path.join(parent, name)) and any(u'一' < c < u'鿿' for c in name)
+
+
+def issue(code: str, path: str, message: str, index: int=None) -> dict:
+    return {
+        "level": "error" if code in ERROR_CODES else "warning",
+        "code": code,
+        "file": path,
+        "index": index,
+        "message": message,
+    }
+
+
+def validate_file(job: tuple) -> dict:
+    """
+    parse one file and check it against its dataset schema (None = only
+    check that it parses). runs in a worker process; returns the issues,
+    the record count and the ids seen, so duplicates can be found across files
+    """
+    path, dataset, tag, required = job
+    result = {"file": path, "dataset": dataset, "records": 0, "issues": [], "ids": []}
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except Exception as e:
+        result["issues"].append(issue("parse_error", path, f"{type(e).__name__}: {e}"))
+        return result
+    if dataset is None:
+        return result
+
+    if not isinstance(data, list):
+        result["issues"].append(issue("bad_root", path, f"expected a list, got {type(data).__name__}"))
+        return result
+
+    result["records"] = len(data)
+    for index, record in enumerate(data):
+        if not isinstance(record, dict):
+            result["issues"].append(issue("bad_record", path, f"record is {type(record).__name__}", index))
+            continue
+        missing = [field for field in (tag,) + required if field not in record]
+        if missing:
+            result["issues"].append(issue("missing_field", path, f"missing {', '.join(missing)}", index))
+        if tag in record:
+            body = record[tag]
+            if dataset in STRING_BODIES:
+                valid = isinstance(body, str)
+            else:
+                valid = isinstance(body, list) and all(isinstance(p, str) for p in body)
+            if not valid:
+                result["issues"].append(issue("bad_type", path, f"{tag} has unexpected type", index))
+            elif not "".join(body).strip():
+                result["issues"].append(issue("empty_content", path, f"{tag} is empty", index))
+        if "id" in record:
+            result["ids"].append((record["id"], index))
+    return result
+
+
+def collect_jobs(config_path: str=DATAS_CONFIG) -> list:
+    """
+    every json file under the book directories. files of a registered
+    dataset (and not excluded by it) are checked against its schema, the
+    rest only have to parse
+    """
+    data = load_config(config_path)
+    top_level_path = data["cp_path"]
+
+    schema_of = {}
+    for key, configs in data["datasets"].items():
+        for path in dataset_files(top_level_path, configs):
+            schema_of[os.path.normpath(path)] = (key, configs["tag"])
+
+    jobs = []
+    for book in sorted(os.listdir(top_level_path)):
+        if not is_book_directory(book, top_level_path):
+            continue
+        for root, _, files in os.walk(os.path.join(top_level_path, book)):
+            for filename in sorted(files):
+                if not filename.endswith('.json'):
+                    continue
+                path = os.path.normpath(os.path.join(root, filename))
+                dataset, tag = schema_of.get(path, (None, None))
+                jobs.append((path, dataset, tag, REQUIRED_FIELDS.get(dataset, ())))
+    return jobs
+
+
+def validate_corpus(config_path: str=DATAS_CONFIG, workers: int=None) -> dict:
+    """
+    validate the whole corpus in a process pool and return a structured report
+    """
+    started = time.time()
+    jobs = collect_jobs(config_path)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        results = map(validate_file, jobs)
+        results = list(results)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_file, jobs, chunksize=16))
+
+    issues = []
+    datasets = {}
+    first_seen = {}
+    for result in results:
+        issues += result["issues"]
+        summary = datasets.setdefault(result["dataset"] or "(unregistered)", Counter())
+        summary["files"] += 1
+        summary["records"] += result["records"]
+        for code in (i["code"] for i in result["issues"]):
+            summary[code] += 1
+        for record_id, index in result["ids"]:
+            key = (result["dataset"], record_id)
+            if key in first_seen:
+                path, first_index = first_seen[key]
+                issues.append(issue(
+                    "duplicate_id", result["file"],
+                    f"id {record_id} already used in {path}[{first_index}]", index
+                ))
+                summary["duplicate_id"] += 1
+            else:
+                first_seen[key] = (result["file"], index)
+
+    counts = Counter(i["level"] for i in issues)
+    return {
+        "files": len(results),
+        "records": sum(result["records"] for result in results),
+        "errors": counts["error"],
+        "warnings": counts["warning"],
+        "elapsed": round(time.time() - started, 3),
+        "datasets": {key: dict(value) for key, value in sorted(datasets.items())},
+        "issues": issues,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="validate every json file of the corpus")
+    parser.add_argument("--config", default=DATAS_CONFIG)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", help="write the full json report to this file")
+    parser.add_argument("--strict", action="store_true", help="fail on warnings as well")
+    args = parser.parse_args()
+
+    report = validate_corpus(args.config, args.workers)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    summary = {key: value for key, value in report.items() if key != "issues"}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    for item in report["issues"][:20]:
+        print(f"[{item['level']}] {item['code']} {item['file']}[{item['index']}]: {item['message']}")
+    failed = report["errors"] or (args.strict and report["warnings"])
+    sys.exit(1 if failed else 0)
@@ -1,46 +1,29 @@
 # -*- coding: utf-8 -*-
 import os
-import json
 import sys
-import traceback
 import functools
 
-namespace = locals()
-
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "loader"))
+from validate_corpus import is_book_directory, validate_corpus
 
-def check_json(f, _dir):
-    filepath = os.path.join(_dir, f)
-
-    if os.path.isdir(filepath):
-        [check_json(f, filepath) for f in os.listdir(filepath)]
+namespace = locals()
 
-    if not f.endswith('.json'):
-        return True
 
-    with open(filepath) as file:
-        try:
-            _ = json.loads(file.read())
-            sys.stdout.write(f"{filepath} 校验成功")
-            return True
-        except Exception as e:
-            sys.stderr.write(traceback.format_exc())
-            print(dir(e))
-            assert False, f"{filepath} 校验失败, {e}"
+@functools.lru_cache(maxsize=None)
+def corpus_report():
+    """整个语料只校验一次（进程池并行），各目录的测试共用同一份报告"""
+    return validate_corpus()
 
 
 def check_path(path):
-    """校验 指定目录 中的 json 文件"""
-    [check_json(f, path) for f in os.listdir(path)]
-
-
-def is_book_directory(book):
-    if not os.path.isdir(book):
-        return False
-
-    for i in book:
-        if i > u'\u4e00' and i < u'\u9fff':
-            return True
-    return False
+    """校验 指定目录 中的 json 文件：能否解析，以及已登记数据集的结构"""
+    errors = [
+        item for item in corpus_report()["issues"]
+        if item["level"] == "error" and item["file"].startswith(path + os.sep)
+    ]
+    for item in errors:
+        sys.stderr.write(f"{item['file']} 校验失败, {item['message']}\n")
+    assert not errors, f"{path} 中有 {len(errors)} 个文件校验失败"
 
 
 for path in [i for i in os.listdir('.') if is_book_directory(i)]:
@@ -2,12 +2,24 @@ import json
 import logging
 import os
 import re
+import sys
 from difflib import SequenceMatcher
 
 import requests
 from bs4 import BeautifulSoup
 from bs4.element import NavigableString
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "loader"))
+from corpus_diff import MIN_SIMILARITY, EntryIndex, diff_entries, entry_text
+
+# 对齐用 corpus_diff 的二元组 dice 系数：低于此值的条目不配对，记为未匹配并告警、不更新。
+# 只有缺字、错字时，quick_ratio >= 0.9 的条目 dice 不低于约 0.7，因此原先会更新的条目仍能配对；
+# 原先按位置配对后只告警的条目，现在多半记为未匹配，同样不更新
+ALIGN_SIMILARITY = MIN_SIMILARITY
+# 下面的更新阈值是按 SequenceMatcher.quick_ratio（字的多重集合重合度）调定的，
+# 对已配对的条目仍用它计算，不直接套用 dice 系数
+UPDATE_RATIO = 0.9
+
 
 def get_page_content(page: int) -> list:
     """ 获取目录页每一页的内容 """
@@ -58,27 +70,25 @@ def get_all_page(temp_file: str):
         f.write(json.dumps(all_data, indent=2, ensure_ascii=False))
 
 
-def only_text(text: str):
-    """ 去除标点只保留文字 """
-    return re.sub(r"[，。、《》…（）·・\s]", "", text)
-
-
-def update_file_data(old_data: list, new_data: list):
-    for i in range(len(old_data)):
-        old_text = only_text("".join(old_data[i]["paragraphs"]))
-        new_text = only_text("".join(new_data[start + i]["paragraphs"]))
+def update_file_data(old_data: list, new_data: list, index: EntryIndex = None):
+    """ 按文字内容（而非位置）对齐新旧数据后更新，条目增删移位不影响对齐 """
+    diff = diff_entries(old_data, new_data, min_similarity=ALIGN_SIMILARITY, index=index)
+    for i, j, _, _ in diff["pairs"]:
         # 计算纯文字的相似度
-        ratio = SequenceMatcher(a=old_text, b=new_text).quick_ratio()
-        if 0.9 <= ratio < 1.0:
+        ratio = SequenceMatcher(a=entry_text(old_data[i]), b=entry_text(new_data[j])).quick_ratio()
+        if UPDATE_RATIO <= ratio < 1.0:
             # 假定此范围内说明缺字，需要更新
-            old_data[i]["author"] = new_data[start + i]["author"]
-            old_data[i]["paragraphs"] = new_data[start + i]["paragraphs"]
-        elif ratio < 0.9:
+            old_data[i]["author"] = new_data[j]["author"]
+            old_data[i]["paragraphs"] = new_data[j]["paragraphs"]
+        elif ratio < UPDATE_RATIO:
             # 异常情况warning输出，不更新
-            logging.warning(old_text)
-            logging.warning(new_text)
+            logging.warning("".join(old_data[i]["paragraphs"]))
+            logging.warning("".join(new_data[j]["paragraphs"]))
         else:
-            old_data[i]["author"] = new_data[start + i]["author"]
+            old_data[i]["author"] = new_data[j]["author"]
+    for i in diff["removed"]:
+        # 新数据中找不到对应条目，不更新
+        logging.warning("未匹配：" + "".join(old_data[i]["paragraphs"]))
 
 
 char_dict = {
@@ -121,14 +131,14 @@ if __name__ == '__main__':
     # 读取临时文件
     with open("all.json", "r", encoding="utf-8") as f:
         all_data = json.load(f)
+    # 新数据的哈希与 n-gram 索引只建一次，供各文件复用
+    all_index = EntryIndex(all_data)
     # 遍历当前目录
     for file_name in os.listdir("./"):
         if re.match(r"ci\.song\.\d+\.json", file_name):
-            # 每个文件开始的数据索引
-            start = int(file_name.split(".")[2])
             with open(file_name, "r", encoding="utf-8") as f:
                 file_data = json.load(f)
-            update_file_data(file_data, all_data)
+            update_file_data(file_data, all_data, all_index)
             correct(file_data)
             # 保存数据，原文件中逗号后有空格，这里保持一致
             with open(file_name, "w", encoding="utf-8") as f:
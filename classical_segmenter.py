@@ -0,0 +1,554 @@
+import os
+import re
+from collections import Counter
+
+from poetry_lexicon import (
+    DATA_DIR,
+    EXCLUDED_NAMES,
+    SENTIMENT_DICTIONARY,
+    THEME_KEYWORDS,
+    load_author_profiles,
+    load_geo_entities,
+)
+
+CLASSICAL_WORDS_PATH = os.path.join(DATA_DIR, "classical_words.txt")
+# 词表中此行之前为手工整理的词条，之后由 write_word_list 从语料统计生成（重新生成时只替换后半部分）
+GENERATED_MARKER = "# ---- 以下由 classical_segmenter.write_word_list 从语料统计生成 ----"
+# 生成词表：结巴词典中的 2–4 字词在语料中至少出现 MIN_ATTESTED 次即收录；
+# 结巴词典之外的双字组合需出现至少 MIN_MINED 次、互信息（log2）不低于 MIN_PMI
+MIN_ATTESTED = 3
+MIN_MINED = 30
+MIN_PMI = 6.0
+# 方位字：地名后缀 + 方位字构成的短语（山下、江上、城头）不收录
+LOCATIVE_CHARS = set("上下中前后里外头边间畔口底侧")
+# 繁体字 -> 简体字（一对一），由 SnowNLP 的繁简表导出，见 write_char_table
+CHAR_TABLE_PATH = os.path.join(DATA_DIR, "hant_chars.txt")
+
+# 词性：地名 ns、人名 nr、情感词 a、一般词 n；词典外的单字记为 g（语素），标点与空白记为 x
+PLACE_TAG = "ns"
+# 连续单字以这些字结尾时合并为地名候选（如“敬亭山”），与后缀正则所用的字一致
+PLACE_SUFFIXES = set("山江河湖川州郡县城关岭湾溪谷岛原津")
+PLACE_SUFFIX_PATTERN = re.compile("[" + "".join(sorted(PLACE_SUFFIXES)) + "]")
+MAX_GUESS_LENGTH = 3
+# 不作地名开头的字：数字、常见虚词与代词，以及地名后缀本身（避免“千山万山”这类合并）
+NAME_STOP_CHARS = set("一二三四五六七八九十百千万两几半满空之乎者也其而以于与不无有是在此彼我吾君何谁") | PLACE_SUFFIXES
+
+# 按标点与空白切成短句，短句内做双向最大匹配
+SENTENCE_SPLIT = re.compile("([^\u4e00-\u9fff\u3400-\u4dbf\U00020000-\U0002ffff]+)")
+
+
+class DoubleArrayTrie:
+    """
+    双数组字典树：状态 s 经字符编码 c 转移到 t = base[s] + c，当且仅当 check[t] == s。
+    字符编码按词典中出现次数从多到少分配（从 1 开始），词典外的字没有编码，直接失配
+    """
+
+    MAX_PROBES = 2
+
+    def __init__(self, words):
+        """
+        words: {词: 值}，值为非负整数（此处为词性编号）
+        """
+        # 常用字编码小，同一节点的子节点编码更集中，找 base 时更容易一次放下
+        frequency = Counter(ch for word in words for ch in word)
+        self.codes = {ch: code for code, (ch, _) in enumerate(frequency.most_common(), 1)}
+        self.max_length = max((len(word) for word in words), default=0)
+
+        # 先建普通字典树：节点 -> {编码: 子节点}，再逐层放入双数组
+        children = [{}]
+        values = [-1]
+        for word, value in words.items():
+            node = 0
+            for ch in word:
+                code = self.codes[ch]
+                child = children[node].get(code)
+                if child is None:
+                    child = len(children)
+                    children[node][code] = child
+                    children.append({})
+                    values.append(-1)
+                node = child
+            values[node] = value
+
+        size = len(children) + len(self.codes) + 1
+        base = [0] * size
+        check = [-1] * size
+        value = [-1] * size
+        check[0] = 0
+        # free[p]：p 起第一个候选空位（带路径压缩的并查集），找 base 时只在空位上试探，
+        # 不必逐格扫过已填满的区间；一个空位作为首个子节点的落点失败 MAX_PROBES 次后
+        # 不再作候选（仍是空位，只是不再试探，做法同 darts-clone），否则词多时建树近乎平方复杂度
+        free = list(range(size + 1))
+        failures = Counter()
+
+        def next_free(position):
+            root = position
+            while free[root] != root:
+                root = free[root]
+            while free[position] != root:
+                free[position], position = root, free[position]
+            return root
+
+        def grow(limit):
+            extra = limit - len(check) + len(check) // 2
+            start = len(check)
+            base.extend([0] * extra)
+            check.extend([-1] * extra)
+            value.extend([-1] * extra)
+            free.extend(range(start + 1, start + extra + 1))
+
+        state_of = {0: 0}
+        used_bases = set()
+        queue = [0]
+        for node in queue:
+            state = state_of[node]
+            value[state] = values[node]
+            codes = sorted(children[node])
+            if not codes:
+                continue
+            # 首个编码落在空位 p 上，b = p - codes[0]
+            position = next_free(1 + codes[0])
+            while True:
+                b = position - codes[0]
+                limit = b + codes[-1] + 1
+                if limit > len(check):
+                    grow(limit)
+                if b not in used_bases and all(check[b + code] == -1 for code in codes):
+                    break
+                failures[position] += 1
+                if failures[position] >= self.MAX_PROBES:
+                    free[position] = position + 1
+                position = next_free(position + 1)
+            used_bases.add(b)
+            base[state] = b
+            for code in codes:
+                check[b + code] = state
+                free[b + code] = b + code + 1
+            for code in codes:
+                child = children[node][code]
+                state_of[child] = b + code
+                queue.append(child)
+
+        last = max(i for i, owner in enumerate(check) if owner != -1) + 1
+        # 匹配时逐字访问，list 比 array/numpy 的标量访问快
+        self._base = base[:last]
+        self._check = check[:last]
+        self._value = value[:last]
+        # 首字 -> 根节点转移后的状态；多数字不能作词首，查一次字典即可判定为单字
+        self.roots = {
+            ch: base[0] + code for ch, code in self.codes.items()
+            if base[0] + code < last and check[base[0] + code] == 0
+        }
+
+    def __len__(self):
+        return len(self._base)
+
+    def longest_match(self, text, start):
+        """
+        从 start 起的最长词，返回 (结束位置, 值)；无匹配时返回 (start, -1)
+        """
+        codes, base, check, value = self.codes, self._base, self._check, self._value
+        size = len(check)
+        state, end, found = 0, start, -1
+        for i in range(start, min(len(text), start + self.max_length)):
+            code = codes.get(text[i])
+            if code is None:
+                break
+            target = base[state] + code
+            if target >= size or check[target] != state:
+                break
+            state = target
+            if value[state] >= 0:
+                end, found = i + 1, value[state]
+        return end, found
+
+
+def load_word_list(path=CLASSICAL_WORDS_PATH):
+    """
+    古汉语常用词表：每行“词 [词性]”，# 开头为注释
+    """
+    words = {}
+    if not os.path.exists(path):
+        return words
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            words[parts[0]] = parts[1] if len(parts) > 1 else "n"
+    return words
+
+
+def load_char_table(path=CHAR_TABLE_PATH):
+    """
+    读取繁简字表，返回可直接用于 str.translate 的映射；文件不存在时不做归一
+    """
+    table = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and not line.startswith("#"):
+                    table[ord(parts[0])] = parts[1]
+    return table
+
+
+def write_char_table(path=CHAR_TABLE_PATH):
+    """
+    从 SnowNLP 的繁简转换表导出一对一的字映射（导入 SnowNLP 较慢，只在生成字表时用到）
+    """
+    from snownlp.normal import zh
+
+    pairs = sorted(
+        (source, target) for source, target in zh.zh2hans.items()
+        if len(source) == 1 and len(target) == 1 and source != target
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# 繁体字 简体字，由 classical_segmenter.write_char_table 从 SnowNLP 繁简表导出\n")
+        for source, target in pairs:
+            f.write(f"{source} {target}\n")
+    return len(pairs)
+
+
+def _jieba_word_tags():
+    """
+    结巴词典中的 2–4 字词及其词性，归并为本词表的 n / v / a；
+    地名与人名（ns、nr 等）不收录，地名只来自地理词典，人名只来自作者表
+    """
+    import jieba
+
+    words = {}
+    with jieba.get_dict_file() as f:
+        for line in f:
+            parts = line.decode("utf-8").split()
+            if len(parts) < 3 or not 2 <= len(parts[0]) <= 4:
+                continue
+            word, flag = parts[0], parts[2]
+            if flag.startswith(("ns", "nr", "nt")):
+                continue
+            if flag.startswith("a") or flag == "z":
+                words[word] = "a"
+            elif flag.startswith("v") or flag in ("d", "p", "c", "u", "r", "f"):
+                words[word] = "v"
+            else:
+                words[word] = "n"
+    return words
+
+
+def write_word_list(path=CLASSICAL_WORDS_PATH, datasets=None):
+    """
+    从语料统计生成词表的后半部分（手工词条保留）：语料按繁简字表归一、按标点切成短句，
+    统计其中出现的结巴词典词与高互信息的双字组合。
+    会挡住地名或作者名识别的词不收录：含地名或作者名的、以地名后缀结尾的、地名后缀加方位字的短语
+    """
+    import math
+    from poetry_datasets import iter_poems
+
+    with open(path, "r", encoding="utf-8") as f:
+        curated = f.read().split(GENERATED_MARKER)[0].rstrip("\n") + "\n"
+    char_table = load_char_table()
+    jieba_words = _jieba_word_tags()
+    attested, chars, pairs = Counter(), Counter(), Counter()
+    for poem in iter_poems(datasets):
+        text = poem["content"].translate(char_table)
+        for sentence in SENTENCE_SPLIT.split(text)[::2]:
+            chars.update(sentence)
+            pairs.update(sentence[i:i + 2] for i in range(len(sentence) - 1))
+            for size in (3, 4):
+                attested.update(
+                    gram for gram in (sentence[i:i + size] for i in range(len(sentence) - size + 1))
+                    if gram in jieba_words
+                )
+    for pair, count in pairs.items():
+        if pair in jieba_words:
+            attested[pair] = count
+
+    blocked = {name.translate(char_table) for name in load_geo_entities()[1] if len(name) >= 2}
+    blocked |= {name.translate(char_table) for name in load_author_profiles() if len(name) >= 2}
+    excluded = {name.translate(char_table) for name in EXCLUDED_NAMES}
+    known = {word.translate(char_table) for word in load_word_list(path)}
+
+    def usable(word):
+        if word in known or word in excluded:
+            return False
+        if word[-1] in PLACE_SUFFIXES or (word[0] in PLACE_SUFFIXES and set(word[1:]) <= LOCATIVE_CHARS):
+            return False
+        return not any(
+            word[i:j] in blocked for i in range(len(word)) for j in range(i + 2, len(word) + 1)
+        )
+
+    generated = {word: jieba_words[word] for word, count in attested.items() if count >= MIN_ATTESTED}
+    total = sum(chars.values())
+    for pair, count in pairs.items():
+        if count >= MIN_MINED and pair not in jieba_words:
+            if math.log2(count * total / (chars[pair[0]] * chars[pair[1]])) >= MIN_PMI:
+                generated[pair] = "n"
+    ranked = sorted(
+        ((word, tag) for word, tag in generated.items() if usable(word)),
+        key=lambda item: (-(attested[item[0]] or pairs[item[0]]), item[0]),
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(curated)
+        f.write(GENERATED_MARKER + "\n")
+        f.write(
+            f"# 结巴词典词出现 >= {MIN_ATTESTED} 次，或双字组合出现 >= {MIN_MINED} 次且互信息 >= {MIN_PMI}；按语料频次降序\n"
+        )
+        for word, tag in ranked:
+            f.write(f"{word} {tag}\n")
+    return len(ranked)
+
+
+def build_lexicon(geo_alias_map=None, author_profiles=None, extra_words=None, word_list_path=CLASSICAL_WORDS_PATH):
+    """
+    合并分词词典：古汉语词表、主题词、情感词、作者名与地理词典（同一词以后者为准，地名优先）
+    """
+    if geo_alias_map is None:
+        geo_alias_map = load_geo_entities()[1]
+    if author_profiles is None:
+        author_profiles = load_author_profiles()
+    lexicon = load_word_list(word_list_path)
+    for keywords in THEME_KEYWORDS.values():
+        for word in keywords:
+            lexicon[word] = "n"
+    for info in SENTIMENT_DICTIONARY.values():
+        for word in info["keywords"]:
+            lexicon[word] = "a"
+    for name in author_profiles:
+        lexicon[name] = "nr"
+    for word, tag in (extra_words or {}).items():
+        lexicon[word] = tag
+    for name in geo_alias_map:
+        if name and not name.isspace():
+            lexicon[name] = PLACE_TAG
+    return lexicon
+
+
+class ClassicalSegmenter:
+    """
+    面向文言诗词的双向最大匹配分词：正反两向各做一次最长匹配，
+    取词数少者，词数相同取单字少者，再相同取反向结果。
+    匹配前按繁简字表把字归一（词典与原文都按简体匹配），输出仍是原文写法；
+    连续单字若以地名后缀结尾（如“敬亭山”），合并并标注为 ns
+    """
+
+    def __init__(self, lexicon=None, guess_places=True, char_table=None):
+        lexicon = build_lexicon() if lexicon is None else lexicon
+        self.char_table = load_char_table() if char_table is None else char_table
+        self.tags = sorted(set(lexicon.values()) | {"g", "x", "n", PLACE_TAG})
+        tag_ids = {tag: idx for idx, tag in enumerate(self.tags)}
+        normalized = {word.translate(self.char_table): tag_ids[tag] for word, tag in lexicon.items()}
+        self.lexicon = lexicon
+        self.forward = DoubleArrayTrie(normalized)
+        self.backward = DoubleArrayTrie({word[::-1]: tag for word, tag in normalized.items()})
+        self.excluded = {name.translate(self.char_table) for name in EXCLUDED_NAMES}
+        self.guess_places = guess_places
+        self._single = tag_ids["g"]
+        self._place = tag_ids[PLACE_TAG]
+        self._noun = tag_ids["n"]
+        self._punct = tag_ids["x"]
+
+    def _longest_spans(self, trie, text):
+        """
+        在 trie 上逐位做最长匹配，返回 [(起, 止, 词性编号)] 与是否出现多字词。
+        逐字循环是热点，这里把双数组转移直接展开；不能作词首的字只查一次 roots
+        """
+        roots, codes, base, check, value = trie.roots, trie.codes, trie._base, trie._check, trie._value
+        size, max_length, single = len(check), trie.max_length, self._single
+        spans = []
+        multi = False
+        i, n = 0, len(text)
+        while i < n:
+            state = roots.get(text[i])
+            if state is None:
+                spans.append((i, i + 1, single))
+                i += 1
+                continue
+            end, tag = i + 1, value[state] if value[state] >= 0 else single
+            for j in range(i + 1, min(n, i + max_length)):
+                code = codes.get(text[j])
+                if code is None:
+                    break
+                target = base[state] + code
+                if target >= size or check[target] != state:
+                    break
+                state = target
+                if value[target] >= 0:
+                    end, tag = j + 1, value[target]
+            if end - i > 1:
+                multi = True
+            spans.append((i, end, tag))
+            i = end
+        return spans, multi
+
+    def _segment_sentence(self, text):
+        """
+        text 为归一后的短句，返回所选切分的 [(起, 止, 词性编号)]
+        """
+        forward, multi = self._longest_spans(self.forward, text)
+        if multi:
+            n = len(text)
+            reversed_spans, _ = self._longest_spans(self.backward, text[::-1])
+            backward = [(n - end, n - start, tag) for start, end, tag in reversed(reversed_spans)]
+            if len(forward) != len(backward):
+                best = forward if len(forward) < len(backward) else backward
+            else:
+                forward_singles = sum(1 for start, end, _ in forward if end - start == 1)
+                backward_singles = sum(1 for start, end, _ in backward if end - start == 1)
+                best = forward if forward_singles < backward_singles else backward
+        else:
+            # 正向全是单字时没有任何多字词可匹配，反向结果相同
+            best = forward
+        if self.guess_places and PLACE_SUFFIX_PATTERN.search(text):
+            return self._guess_places(text, best)
+        return best
+
+    def _guess_places(self, text, spans):
+        """
+        连续单字中，以地名后缀结尾的 2–3 字（如“庐山”“敬亭山”）合并为一个 ns 词；
+        双字名词后接地名后缀（如“昆仑 山”“蓬莱 岛”）同样合并；数字、虚词等不作地名开头
+        """
+        joined = []
+        for span in spans:
+            start, end, tag = span
+            if joined and end - start == 1 and tag != self._place and text[start] in PLACE_SUFFIXES:
+                previous_start, previous_end, previous_tag = joined[-1]
+                if (previous_tag == self._noun and previous_end - previous_start == 2
+                        and text[previous_start] not in NAME_STOP_CHARS
+                        and text[previous_start:end] not in self.excluded):
+                    joined[-1] = (previous_start, end, self._place)
+                    continue
+            joined.append(span)
+
+        merged = []
+        run = []
+        for span in joined + [(len(text), len(text), -1)]:
+            start, end, tag = span
+            if end - start == 1 and tag != self._place:
+                run.append(span)
+                continue
+            emitted = 0
+            for k, (position, _, _) in enumerate(run):
+                if text[position] not in PLACE_SUFFIXES:
+                    continue
+                first = k
+                while first > max(emitted, k + 1 - MAX_GUESS_LENGTH) and text[run[first - 1][0]] not in NAME_STOP_CHARS:
+                    first -= 1
+                name = text[run[first][0]:position + 1]
+                if first < k and name not in self.excluded:
+                    merged.extend(run[emitted:first])
+                    merged.append((run[first][0], position + 1, self._place))
+                    emitted = k + 1
+            merged.extend(run[emitted:])
+            run = []
+            if end > start:
+                merged.append(span)
+        return merged
+
+    def _pieces(self, text):
+        """
+        [(原文写法, 词性编号)]；split 的结果中奇数位是标点与空白，偶数位是短句
+        """
+        pieces = []
+        for index, part in enumerate(SENTENCE_SPLIT.split(text)):
+            if not part:
+                continue
+            if index % 2:
+                pieces.append((part, self._punct))
+            else:
+                pieces.extend(
+                    (part[start:end], tag)
+                    for start, end, tag in self._segment_sentence(part.translate(self.char_table))
+                )
+        return pieces
+
+    def cut(self, text):
+        """
+        分词，返回词列表（标点原样保留为单独的词）
+        """
+        return [word for word, _ in self._pieces(text)]
+
+    def posseg(self, text):
+        """
+        带词性的分词，返回 (词, 词性) 列表
+        """
+        tags = self.tags
+        return [(word, tags[tag]) for word, tag in self._pieces(text)]
+
+    def extract_tags(self, text, top_k=30):
+        """
+        与 jieba.analyse.extract_tags 相同的 TF-IDF 关键词（使用结巴的 IDF 表与停用词），分词改用本分词器
+        """
+        return self.tags_from_counts(self.keyword_counts(text), top_k)
+
+    def keyword_counts(self, text):
+        """
+        关键词候选的词频（去掉标点、单字与停用词）；各段文本的词频相加后即为合并文本的词频
+        （标点连写会跨段合并，因此不计入）
+        """
+        import jieba.analyse
+
+        stop_words = jieba.analyse.default_tfidf.stop_words
+        counts = {}
+        for word, tag in self._pieces(text):
+            if tag == self._punct or len(word.strip()) < 2 or word.lower() in stop_words:
+                continue
+            counts[word] = counts.get(word, 0) + 1
+        return counts
+
+    def tags_from_counts(self, counts, top_k=30):
+        """
+        由词频计算 TF-IDF 权重，返回权重最高的 top_k 个 (词, 权重)；
+        与 jieba.analyse.extract_tags 相同，权重为 count * (idf / total)，同权重的词保持 counts 中的先后
+        """
+        import jieba.analyse
+
+        tfidf = jieba.analyse.default_tfidf
+        total = sum(counts.values())
+        if not total:
+            return []
+        weights = {
+            word: count * (tfidf.idf_freq.get(word.translate(self.char_table), tfidf.median_idf) / total)
+            for word, count in counts.items()
+        }
+        return sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def main():
+    """
+    分词示例与吞吐量测试：python classical_segmenter.py [文本文件]；
+    python classical_segmenter.py --build-char-table 重新生成繁简字表；
+    python classical_segmenter.py --build-word-list 从语料重新生成词表的统计部分
+    """
+    import sys
+    import time
+
+    if sys.argv[1:] == ["--build-char-table"]:
+        print(f"已写出 {write_char_table()} 个繁简字对至 {CHAR_TABLE_PATH}")
+        return
+    if sys.argv[1:] == ["--build-word-list"]:
+        print(f"已写出 {write_word_list()} 个统计词条至 {CLASSICAL_WORDS_PATH}")
+        return
+
+    segmenter = ClassicalSegmenter()
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        from poetry_datasets import iter_poems
+        from itertools import islice
+        text = "\n".join(poem["content"] for poem in islice(iter_poems(workers=1), 20000))
+
+    print(" / ".join(f"{w}:{t}" for w, t in segmenter.posseg(text[:80])))
+    started = time.perf_counter()
+    segmenter.cut(text)
+    elapsed = time.perf_counter() - started
+    size = len(text.encode("utf-8"))
+    print(
+        f"词典 {len(segmenter.lexicon)} 词，双数组 {len(segmenter.forward)} 个状态；"
+        f"{len(text)} 字（{size / 1024 / 1024:.1f} MB）用时 {elapsed:.2f} 秒，{size / 1024 / 1024 / elapsed:.2f} MB/秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
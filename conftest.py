@@ -0,0 +1,2 @@
+# chinese-poetry 是独立的语料仓库，其测试在该目录下单独运行（见 chinese-poetry/.github/workflows/test.yml）
+collect_ignore = ["chinese-poetry"]
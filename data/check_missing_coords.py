@@ -1,13 +1,16 @@
 import json
 import os
+import sys
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
 COORDS_PATH = os.path.join(BASE_DIR, "geo_coordinates.json")
 
-with open(os.path.join(OUTPUT_DIR, "geo_stats.json"), encoding="utf-8") as f:
-    geo_stats = json.load(f)
+sys.path.append(ROOT_DIR)
+from poetry_db import load_geo_stats
+
+geo_stats = load_geo_stats()
 with open(COORDS_PATH, encoding="utf-8") as f:
     coords = json.load(f)
 
@@ -1,14 +1,17 @@
 import json
 import os
 import re
+import sys
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
 COORDS_PATH = os.path.join(BASE_DIR, "geo_coordinates.json")
 
-# 排除词（从poetey_analysis导入，这里直接定义避免导入问题）
-EXCLUDED_NAMES = {"千山","江山","山林","青山", "四海", "江湖", "山川","山河","西山","东山","天下", "九州", "五湖", "六合", "八荒", "九域", "四方", "宇内", "寰中", "江表", "河朔", "塞北", "岭南", "漠北", "中原", "南疆", "北疆", "关内", "关外", "河东", "河西", "山南", "山北", "淮左", "淮右", "山水", "四面山", "山河大地", "山阜", "峽山", "峡山", "河明", "浮川", "居海", "如海", "福海", "海陽", "海國", "海霧江", "湖江", "北湖", "青草湖", "柳邊湖", "明河", "陂湖", "好山", "山開南國", "莫指雲山", "中峰", "中台", "陽洲", "花洲", "四海九州"}
+sys.path.append(ROOT_DIR)
+from poetry_db import load_geo_stats
+from poetry_lexicon import EXCLUDED_NAMES
+
 
 # 泛指词
 GENERIC_WORDS = {
@@ -88,8 +91,7 @@ def is_real_geographic_location(name, geo_type, count):
 
 # 加载数据
 print("正在加载数据...")
-with open(os.path.join(OUTPUT_DIR, "geo_stats.json"), encoding="utf-8") as f:
-    geo_stats = json.load(f)
+geo_stats = load_geo_stats()
 with open(COORDS_PATH, encoding="utf-8") as f:
     coords = json.load(f)
 
@@ -8,10 +8,11 @@ OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
 COORDS_PATH = os.path.join(BASE_DIR, "geo_coordinates.json")
 ENTITIES_PATH = os.path.join(BASE_DIR, "geo_entities.json")
 
-# 从poetey_analysis导入排除词
+# 从 poetry_lexicon 导入排除词（不依赖 jieba、SnowNLP）
 import sys
 sys.path.append(ROOT_DIR)
-from poetey_analysis import EXCLUDED_NAMES
+from poetry_lexicon import EXCLUDED_NAMES
+from poetry_db import load_geo_stats
 
 # 泛指词和抽象概念词（需要排除）
 GENERIC_WORDS = {
@@ -119,8 +120,7 @@ def is_real_geographic_location(name, geo_type, count):
 
 def load_existing_data():
     """加载现有数据"""
-    with open(os.path.join(OUTPUT_DIR, "geo_stats.json"), encoding="utf-8") as f:
-        geo_stats = json.load(f)
+    geo_stats = load_geo_stats()
     with open(COORDS_PATH, encoding="utf-8") as f:
         coords = json.load(f)
     return geo_stats, coords
@@ -1,6 +1,6 @@
 import json
 import os
-from poetey_analysis import EXCLUDED_NAMES
+from poetry_lexicon import EXCLUDED_NAMES
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
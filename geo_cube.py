@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from poetry_interning import SENTIMENT_LABELS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+CUBE_PATH = os.path.join(OUTPUT_DIR, "geo_cube.npz")
+
+DIMENSIONS = ("place", "dynasty", "author", "label")
+# 无作者的诗（author_id 为 NO_ID）在作者维度上的名称。intern_author 不登记空作者，
+# 作者表中不会有空字符串，因此不会与真实作者（包括读取语料时补上的“未知作者”）重名
+NO_AUTHOR = ""
+
+
+class GeoCube:
+    """
+    地名 × 朝代 × 作者 × 情感类型 的稀疏聚合立方体：
+    每个非空单元保存提及次数与情感得分之和，支持切片、切块与上卷查询
+    """
+
+    def __init__(self, coords, counts, score_sums, names, author_origins):
+        # coords: {维度: 每个单元在该维度上的 ID 数组}
+        self.coords = coords
+        self.counts = counts
+        self.score_sums = score_sums
+        # names: {维度: ID -> 名称 的数组}
+        self.names = names
+        self.author_origins = author_origins
+        self._ids = {
+            dim: {name: idx for idx, name in enumerate(values.tolist())}
+            for dim, values in names.items()
+        }
+
+    @classmethod
+    def from_incidence(cls, incidence, tables, excluded_ids=(), author_profiles=None):
+        matrix = incidence.matrix
+        rows = incidence.mention_rows
+        places = matrix.indices.astype(np.int64)
+        keep = ~np.isin(places, np.fromiter(excluded_ids, dtype=np.int64)) if len(excluded_ids) else slice(None)
+
+        n_dynasties = len(tables.dynasties)
+        n_authors = len(tables.authors) + 1
+        n_labels = len(SENTIMENT_LABELS)
+        authors = incidence.author_ids[rows].astype(np.int64)
+        # 无作者的诗归入最后一个作者槽位
+        authors[authors < 0] = n_authors - 1
+
+        keys = (
+            (places[keep] * n_dynasties + incidence.dynasty_ids[rows][keep]) * n_authors
+            + authors[keep]
+        ) * n_labels + incidence.label_ids[rows][keep]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique_keys))
+        score_sums = np.bincount(
+            inverse, weights=incidence.scores[rows][keep], minlength=len(unique_keys)
+        )
+
+        label_ids, rest = unique_keys % n_labels, unique_keys // n_labels
+        author_ids, rest = rest % n_authors, rest // n_authors
+        dynasty_ids, place_ids = rest % n_dynasties, rest // n_dynasties
+
+        author_names = tables.authors.names + [NO_AUTHOR]
+        profiles = author_profiles or {}
+        return cls(
+            {
+                "place": place_ids.astype(np.int32),
+                "dynasty": dynasty_ids.astype(np.int16),
+                "author": author_ids.astype(np.int32),
+                "label": label_ids.astype(np.int8)
+            },
+            counts.astype(np.int64),
+            score_sums,
+            {
+                "place": np.array(tables.places.names, dtype=str),
+                "dynasty": np.array(tables.dynasties.names, dtype=str),
+                "author": np.array(author_names, dtype=str),
+                "label": np.array(SENTIMENT_LABELS, dtype=str)
+            },
+            np.array([profiles.get(name, {}).get("籍贯") or "" for name in author_names], dtype=str)
+        )
+
+    def save(self, path=CUBE_PATH):
+        arrays = {f"coord_{dim}": self.coords[dim] for dim in DIMENSIONS}
+        arrays.update({f"names_{dim}": self.names[dim] for dim in DIMENSIONS})
+        np.savez_compressed(
+            path,
+            counts=self.counts,
+            score_sums=self.score_sums,
+            author_origins=self.author_origins,
+            **arrays
+        )
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                {dim: data[f"coord_{dim}"] for dim in DIMENSIONS},
+                data["counts"],
+                data["score_sums"],
+                {dim: data[f"names_{dim}"] for dim in DIMENSIONS},
+                data["author_origins"]
+            )
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _mask(self, place=None, dynasty=None, author=None, label=None, origin=None):
+        mask = np.ones(len(self.counts), dtype=bool)
+        for dim, value in (("place", place), ("dynasty", dynasty), ("author", author), ("label", label)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            ids = [self._ids[dim][v] for v in values if v in self._ids[dim]]
+            mask &= np.isin(self.coords[dim], ids)
+        if origin is not None:
+            # 按作者籍贯子串筛选，如 origin="四川"
+            matched = np.flatnonzero(np.char.find(self.author_origins, origin) >= 0)
+            mask &= np.isin(self.coords["author"], matched)
+        return mask
+
+    def dice(self, **filters):
+        """
+        按维度取值（名称或名称列表）及作者籍贯筛选，返回子立方体
+        """
+        mask = self._mask(**filters)
+        return GeoCube(
+            {dim: ids[mask] for dim, ids in self.coords.items()},
+            self.counts[mask],
+            self.score_sums[mask],
+            self.names,
+            self.author_origins
+        )
+
+    def rollup(self, by=(), **filters):
+        """
+        按 by 中的维度分组汇总（其余维度上卷），返回按次数降序的行：
+        {维度: 名称, ..., "count": 次数, "score_sum": 得分和, "mean_score": 平均得分}
+        """
+        mask = self._mask(**filters)
+        counts = self.counts[mask]
+        score_sums = self.score_sums[mask]
+        by = tuple(by)
+        if not by:
+            total = int(counts.sum())
+            score_sum = float(score_sums.sum())
+            return [{"count": total, "score_sum": score_sum, "mean_score": score_sum / total if total else None}]
+
+        columns = [self.coords[dim][mask].astype(np.int64) for dim in by]
+        keys = np.zeros(len(counts), dtype=np.int64)
+        for dim, column in zip(by, columns):
+            keys = keys * len(self.names[dim]) + column
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        group_counts = np.bincount(inverse, weights=counts, minlength=len(unique_keys))
+        group_sums = np.bincount(inverse, weights=score_sums, minlength=len(unique_keys))
+
+        rows = []
+        for group in np.argsort(-group_counts, kind="stable").tolist():
+            row = {
+                dim: self.names[dim][column[first[group]]].item()
+                for dim, column in zip(by, columns)
+            }
+            count = int(group_counts[group])
+            row["count"] = count
+            row["score_sum"] = float(group_sums[group])
+            row["mean_score"] = row["score_sum"] / count
+            rows.append(row)
+        return rows
+
+    def top(self, by="place", n=10, per=None, **filters):
+        """
+        取前 n 项；给定 per 时在 per 维度的每个取值内分别取前 n 项，
+        例如 top("place", 10, per="dynasty") 为各朝代的热门地名
+        """
+        if per is None:
+            return self.rollup((by,), **filters)[:n]
+        result = {}
+        for row in self.rollup((per, by), **filters):
+            bucket = result.setdefault(row[per], [])
+            if len(bucket) < n:
+                bucket.append(row)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询 geo_cube.npz 聚合立方体")
+    parser.add_argument("--cube", default=CUBE_PATH)
+    parser.add_argument("--place", action="append")
+    parser.add_argument("--dynasty", action="append")
+    parser.add_argument("--author", action="append")
+    parser.add_argument("--label", action="append")
+    parser.add_argument("--origin", help="按作者籍贯子串筛选")
+    parser.add_argument("--by", default="", help="分组维度，逗号分隔，如 dynasty,place")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    cube = GeoCube.load(args.cube)
+    by = [dim for dim in args.by.split(",") if dim]
+    rows = cube.rollup(
+        by,
+        place=args.place,
+        dynasty=args.dynasty,
+        author=args.author,
+        label=args.label,
+        origin=args.origin
+    )
+    for row in rows[:args.limit]:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
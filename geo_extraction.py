@@ -0,0 +1,96 @@
+import re
+import time
+
+# 地名提取分级：词典 → 词典+后缀正则 → 全部（再加结巴词性标注）；
+# adaptive 只对含词典外后缀候选的诗句做结巴词性标注
+EXTRACTION_TIERS = ("dict", "regex", "adaptive", "full")
+DEFAULT_TIER = "full"
+
+# 各分级执行的环节
+TIER_PASSES = {
+    "dict": ("dict",),
+    "regex": ("dict", "regex"),
+    "adaptive": ("dict", "regex", "pseg_lines"),
+    "full": ("dict", "regex", "pseg"),
+}
+
+# 抽查时默认每隔多少首诗对比一次各分级
+DEFAULT_AUDIT_EVERY = 20
+
+LINE_SPLIT = re.compile(r"[，。！？；：、,.!?;:\s]+")
+
+
+def split_lines(text):
+    """
+    按标点把诗文切成诗句（结巴只需处理候选所在的诗句）
+    """
+    return [line for line in LINE_SPLIT.split(text) if line]
+
+
+class TierRecallReport:
+    """
+    抽查若干首诗，把每个分级的结果与 full 分级对比：
+    以（诗, 地名）对计召回率与精确率，并记录每个分级的平均耗时
+    """
+
+    def __init__(self, every=DEFAULT_AUDIT_EVERY, tiers=EXTRACTION_TIERS):
+        self.every = max(1, every)
+        self.tiers = tiers
+        self.calls = 0
+        self.sampled = 0
+        self.pairs = {tier: 0 for tier in tiers}
+        self.hits = {tier: 0 for tier in tiers}
+        self.reference = 0
+        self.seconds = {tier: 0.0 for tier in tiers}
+
+    def should_sample(self):
+        self.calls += 1
+        return (self.calls - 1) % self.every == 0
+
+    def audit(self, extract):
+        """
+        extract(tier) 返回该分级找到的地名集合；依次运行各分级并计时，返回各分级结果
+        """
+        results = {}
+        for tier in self.tiers:
+            started = time.perf_counter()
+            results[tier] = extract(tier)
+            self.seconds[tier] += time.perf_counter() - started
+        reference = results["full"]
+        self.sampled += 1
+        self.reference += len(reference)
+        for tier, found in results.items():
+            self.pairs[tier] += len(found)
+            self.hits[tier] += len(found & reference)
+        return results
+
+    def summary(self):
+        full_seconds = self.seconds.get("full", 0.0)
+        tiers = {}
+        for tier in self.tiers:
+            seconds = self.seconds[tier]
+            tiers[tier] = {
+                "召回率": round(self.hits[tier] / self.reference, 4) if self.reference else None,
+                "精确率": round(self.hits[tier] / self.pairs[tier], 4) if self.pairs[tier] else None,
+                "平均耗时（毫秒/首）": round(seconds * 1000 / self.sampled, 3) if self.sampled else None,
+                "相对 full 提速": round(full_seconds / seconds, 2) if seconds else None
+            }
+        return {
+            "抽查诗数": self.sampled,
+            "抽查间隔": self.every,
+            "full 地名对数": self.reference,
+            "分级": tiers
+        }
+
+    def format(self):
+        summary = self.summary()
+        lines = [f"地名提取分级对比（抽查 {summary['抽查诗数']} 首，以 full 为准）："]
+        for tier, stats in summary["分级"].items():
+            recall = "-" if stats["召回率"] is None else f"{stats['召回率']:.1%}"
+            precision = "-" if stats["精确率"] is None else f"{stats['精确率']:.1%}"
+            speed = "-" if stats["相对 full 提速"] is None else f"{stats['相对 full 提速']:.1f}×"
+            lines.append(
+                f"  {tier:<8} 召回 {recall:>6}  精确 {precision:>6}  "
+                f"{stats['平均耗时（毫秒/首）']} 毫秒/首  提速 {speed}"
+            )
+        return "\n".join(lines)
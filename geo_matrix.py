@@ -0,0 +1,222 @@
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+from poetry_interning import SENTIMENT_LABELS
+
+LABEL_COUNT = len(SENTIMENT_LABELS)
+
+
+class IncidenceBuilder:
+    """
+    逐首诗累积“诗歌 × 地名”关联矩阵（CSR 的 indptr/indices）及对齐的逐诗属性
+    """
+    __slots__ = ("indptr", "indices", "dynasty_ids", "author_ids", "scores", "label_ids")
+
+    def __init__(self):
+        self.indptr = array("q", [0])
+        self.indices = array("i")
+        self.dynasty_ids = array("i")
+        self.author_ids = array("i")
+        self.scores = array("d")
+        self.label_ids = array("b")
+
+    @classmethod
+    def from_records(cls, records):
+        builder = cls()
+        for record in records:
+            builder.add(record)
+        return builder
+
+    def add(self, record):
+        self.add_poem(
+            [mention.place_id for mention in record.mentions],
+            record.dynasty_id,
+            record.author_id,
+            record.score,
+            record.label_id
+        )
+
+    def add_poem(self, place_ids, dynasty_id, author_id, score, label_id):
+        self.indices.extend(place_ids)
+        self.indptr.append(len(self.indices))
+        self.dynasty_ids.append(dynasty_id)
+        self.author_ids.append(author_id)
+        self.scores.append(score)
+        self.label_ids.append(label_id)
+
+    def __len__(self):
+        return len(self.dynasty_ids)
+
+    def build(self, tables):
+        """
+        生成 GeoIncidence，矩阵列数取地名表当前大小
+        """
+        n_poems = len(self)
+        n_places = len(tables.places)
+        indices = np.frombuffer(self.indices, dtype=np.int32) if self.indices else np.zeros(0, np.int32)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), indices.copy(), np.array(self.indptr, dtype=np.int64)),
+            shape=(n_poems, n_places)
+        )
+        return GeoIncidence(
+            matrix,
+            np.array(self.dynasty_ids, dtype=np.int32),
+            np.array(self.author_ids, dtype=np.int32),
+            np.array(self.scores, dtype=np.float64),
+            np.array(self.label_ids, dtype=np.int8),
+            len(tables.dynasties),
+            len(tables.authors)
+        )
+
+
+class GeoIncidence:
+    """
+    诗歌 × 地名 CSR 关联矩阵，所有汇总均以 bincount / 稀疏矩阵乘法完成
+    """
+    __slots__ = (
+        "matrix", "dynasty_ids", "author_ids", "scores", "label_ids",
+        "n_dynasties", "n_authors", "_rows", "_csc"
+    )
+
+    def __init__(self, matrix, dynasty_ids, author_ids, scores, label_ids, n_dynasties, n_authors):
+        self.matrix = matrix
+        self.dynasty_ids = dynasty_ids
+        self.author_ids = author_ids
+        self.scores = scores
+        self.label_ids = label_ids
+        self.n_dynasties = n_dynasties
+        self.n_authors = n_authors
+        self._rows = None
+        self._csc = None
+
+    @property
+    def n_poems(self):
+        return self.matrix.shape[0]
+
+    @property
+    def n_places(self):
+        return self.matrix.shape[1]
+
+    @property
+    def mention_rows(self):
+        """
+        每个非零元素所在的诗歌行号，与 matrix.indices 对齐
+        """
+        if self._rows is None:
+            self._rows = np.repeat(
+                np.arange(self.n_poems, dtype=np.int64), np.diff(self.matrix.indptr)
+            )
+        return self._rows
+
+    def place_totals(self):
+        return np.bincount(self.matrix.indices, minlength=self.n_places)
+
+    def place_score_sums(self):
+        return np.bincount(
+            self.matrix.indices, weights=self.scores[self.mention_rows], minlength=self.n_places
+        )
+
+    def place_label_counts(self):
+        keys = self.matrix.indices.astype(np.int64) * LABEL_COUNT + self.label_ids[self.mention_rows]
+        return np.bincount(keys, minlength=self.n_places * LABEL_COUNT).reshape(
+            self.n_places, LABEL_COUNT
+        )
+
+    def _place_dynasty_keys(self):
+        return (
+            self.matrix.indices.astype(np.int64) * self.n_dynasties
+            + self.dynasty_ids[self.mention_rows]
+        )
+
+    def place_dynasty_counts(self):
+        return np.bincount(
+            self._place_dynasty_keys(), minlength=self.n_places * self.n_dynasties
+        ).reshape(self.n_places, self.n_dynasties)
+
+    def place_dynasty_score_sums(self):
+        return np.bincount(
+            self._place_dynasty_keys(),
+            weights=self.scores[self.mention_rows],
+            minlength=self.n_places * self.n_dynasties
+        ).reshape(self.n_places, self.n_dynasties)
+
+    def place_dynasty_label_counts(self):
+        keys = self._place_dynasty_keys() * LABEL_COUNT + self.label_ids[self.mention_rows]
+        return np.bincount(
+            keys, minlength=self.n_places * self.n_dynasties * LABEL_COUNT
+        ).reshape(self.n_places, self.n_dynasties, LABEL_COUNT)
+
+    def dynasty_totals(self):
+        """
+        各朝代的地名提及总次数
+        """
+        return np.bincount(self.dynasty_ids[self.mention_rows], minlength=self.n_dynasties)
+
+    def author_matrix(self):
+        """
+        诗歌 × 作者 的 0/1 矩阵（无作者的诗为空行）
+        """
+        known = self.author_ids >= 0
+        rows = np.nonzero(known)[0]
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, self.author_ids[known])),
+            shape=(self.n_poems, self.n_authors)
+        )
+
+    def place_author_counts(self):
+        """
+        地名 × 作者 的提及次数（CSR），行内非零列即为出现诗人
+        """
+        result = (self.matrix.T.tocsr() @ self.author_matrix()).tocsr()
+        result.sort_indices()
+        return result
+
+    def _first_positions(self, columns, n_columns):
+        """
+        每列首个非零元素在 matrix.indices 中的位置（无元素的列为 -1）；
+        借助 CSR -> CSC 转换按行序排列的特性，避免排序
+        """
+        positions = sparse.csr_matrix(
+            (np.arange(1, len(columns) + 1, dtype=np.int64), columns, self.matrix.indptr),
+            shape=(self.n_poems, n_columns)
+        ).tocsc()
+        first = np.full(n_columns, -1, dtype=np.int64)
+        nonempty = np.diff(positions.indptr) > 0
+        first[nonempty] = positions.data[positions.indptr[:-1][nonempty]] - 1
+        return first
+
+    def first_seen_places(self):
+        """
+        按首次出现位置排列的地名 ID（与逐首遍历时的字典插入顺序一致）
+        """
+        first = self._first_positions(self.matrix.indices, self.n_places)
+        seen = np.flatnonzero(first >= 0)
+        return seen[np.argsort(first[seen], kind="stable")]
+
+    def first_seen_place_dynasties(self):
+        """
+        各地名下出现过的朝代 ID，按首次出现顺序排列；
+        返回 (indptr, dynasty_ids)，地名 p 的朝代为 dynasty_ids[indptr[p]:indptr[p + 1]]
+        """
+        first = self._first_positions(
+            self._place_dynasty_keys(), self.n_places * self.n_dynasties
+        ).reshape(self.n_places, self.n_dynasties)
+        seen_places, seen_dynasties = np.nonzero(first >= 0)
+        # 先按首次出现位置排序，再按地名稳定排序
+        order = np.argsort(first[seen_places, seen_dynasties], kind="stable")
+        order = order[np.argsort(seen_places[order], kind="stable")]
+        indptr = np.zeros(self.n_places + 1, dtype=np.int64)
+        np.cumsum(np.bincount(seen_places, minlength=self.n_places), out=indptr[1:])
+        return indptr, seen_dynasties[order].astype(np.int32)
+
+    def place_poems(self, place_id):
+        """
+        提及该地名的诗歌行号（升序）
+        """
+        if self._csc is None:
+            self._csc = self.matrix.tocsc()
+            self._csc.sort_indices()
+        start, end = self._csc.indptr[place_id], self._csc.indptr[place_id + 1]
+        return self._csc.indices[start:end]
@@ -0,0 +1,189 @@
+import numpy as np
+from scipy import sparse
+
+PLACE_EDGE_FIELDS = ["源", "目标", "共现次数", "PMI"]
+POET_EDGE_FIELDS = ["源", "目标", "共享地点数", "PMI"]
+
+
+def cooccurrence_edges(items, top_k=10, min_count=2, chunk_size=2048):
+    """
+    items 为“对象 × 上下文”的 0/1 稀疏矩阵，分块计算 items @ items.T 得到共现次数；
+    仅保留共现次数 >= min_count 且 PMI > 0 的边，每个节点按共现次数保留 top_k 条。
+    PMI 的总数 N 取至少含一个对象的上下文数，不受矩阵列数（符号表大小、登记历史）影响。
+    返回 (rows, cols, counts, pmi)，rows < cols，边已去重
+    """
+    items = items.tocsr().astype(np.float64)
+    items.eliminate_zeros()
+    n_items = items.shape[0]
+    n_contexts = max(len(np.unique(items.indices)), 1)
+    degree = np.asarray(items.sum(axis=1)).ravel()
+    items_t = items.T.tocsr()
+
+    kept_rows, kept_cols, kept_counts, kept_pmi = [], [], [], []
+    for start in range(0, n_items, chunk_size):
+        block = (items[start:start + chunk_size] @ items_t).tocoo()
+        rows = block.row.astype(np.int64) + start
+        cols = block.col.astype(np.int64)
+        counts = block.data
+        mask = (rows != cols) & (counts >= min_count)
+        rows, cols, counts = rows[mask], cols[mask], counts[mask]
+        pmi = np.log(counts * n_contexts / (degree[rows] * degree[cols]))
+        mask = pmi > 0
+        rows, cols, counts, pmi = rows[mask], cols[mask], counts[mask], pmi[mask]
+
+        # 每行按共现次数降序取前 top_k（同次数时 PMI 高者优先）
+        order = np.lexsort((-pmi, -counts, rows))
+        rows, cols, counts, pmi = rows[order], cols[order], counts[order], pmi[order]
+        row_start = np.searchsorted(rows, rows, side="left")
+        mask = np.arange(len(rows)) - row_start < top_k
+
+        kept_rows.append(rows[mask])
+        kept_cols.append(cols[mask])
+        kept_counts.append(counts[mask])
+        kept_pmi.append(pmi[mask])
+
+    if not kept_rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), np.zeros(0)
+
+    rows = np.concatenate(kept_rows)
+    cols = np.concatenate(kept_cols)
+    counts = np.concatenate(kept_counts)
+    pmi = np.concatenate(kept_pmi)
+
+    # 任一端点保留即保留该边，按 (较小端, 较大端) 去重
+    low = np.minimum(rows, cols)
+    high = np.maximum(rows, cols)
+    _, unique = np.unique(low * n_items + high, return_index=True)
+    return low[unique], high[unique], counts[unique].astype(np.int64), pmi[unique]
+
+
+def label_propagation(n_nodes, rows, cols, weights, max_iter=30):
+    """
+    加权标签传播社区划分（同步更新，保留自身标签作平局裁决），
+    返回按社区规模降序重新编号的社区标签
+    """
+    labels = np.arange(n_nodes)
+    if len(rows) == 0:
+        return labels
+    graph = sparse.coo_matrix(
+        (np.concatenate([weights, weights]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+        shape=(n_nodes, n_nodes)
+    ).tocsr()
+    # 自环权重取极小值，只在邻居得票相同时保持原标签
+    graph = graph + sparse.identity(n_nodes, format="csr") * 1e-6
+
+    for _ in range(max_iter):
+        votes = graph @ sparse.csr_matrix(
+            (np.ones(n_nodes), (np.arange(n_nodes), labels)), shape=(n_nodes, n_nodes)
+        )
+        new_labels = _row_argmax(votes.tocsr())
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+    _, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    return rank[inverse]
+
+
+def _row_argmax(matrix):
+    """
+    每行最大值所在列（平局取较小列号）；每行至少有一个元素
+    """
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((matrix.indices, -matrix.data, rows))
+    return matrix.indices[order[matrix.indptr[:-1]]]
+
+
+def build_place_network(incidence, tables, excluded_ids=(), top_k=10, min_count=2, top_poets=10):
+    """
+    地名共现网络：地名 × 诗歌矩阵自乘得到共同被提及次数，附每个地名的高频诗人
+    """
+    places = tables.places
+    totals = incidence.place_totals()
+    keep = np.flatnonzero(totals > 0)
+    if len(excluded_ids):
+        keep = keep[~np.isin(keep, np.fromiter(excluded_ids, dtype=np.int64))]
+
+    place_poems = incidence.matrix.T.tocsr()[keep]
+    rows, cols, counts, pmi = cooccurrence_edges(place_poems, top_k=top_k, min_count=min_count)
+    communities = label_propagation(len(keep), rows, cols, counts.astype(np.float64))
+
+    place_authors = incidence.place_author_counts()
+    nodes = []
+    for node_index, place_id in enumerate(keep.tolist()):
+        start, end = place_authors.indptr[place_id], place_authors.indptr[place_id + 1]
+        author_ids = place_authors.indices[start:end]
+        author_counts = place_authors.data[start:end]
+        top = np.argsort(-author_counts, kind="stable")[:top_poets]
+        nodes.append(
+            {
+                "名称": places.name(place_id),
+                "类型": places.type_name(place_id),
+                "出现次数": int(totals[place_id]),
+                "社区": int(communities[node_index]),
+                "诗人": [
+                    [tables.authors.name(int(author_ids[i])), int(author_counts[i])]
+                    for i in top.tolist()
+                ]
+            }
+        )
+
+    return {
+        "节点": nodes,
+        "边字段": PLACE_EDGE_FIELDS,
+        "边": _edge_list(rows, cols, counts, pmi)
+    }
+
+
+def build_poet_network(incidence, tables, excluded_ids=(), top_k=10, min_shared=2, max_place_share=0.2):
+    """
+    诗人共享地名网络：诗人 × 地名 0/1 矩阵自乘得到共同吟咏的地名数；
+    被超过 max_place_share 比例诗人提及的泛用地名不参与计算
+    """
+    poet_places = (incidence.author_matrix().T.tocsr() @ incidence.matrix).tocsr()
+    poet_places.data[:] = 1
+    if len(excluded_ids):
+        mask = np.ones(poet_places.shape[1])
+        mask[np.fromiter(excluded_ids, dtype=np.int64)] = 0
+        poet_places = (poet_places @ sparse.diags(mask)).tocsr()
+        poet_places.eliminate_zeros()
+
+    poets_per_place = np.bincount(poet_places.indices, minlength=poet_places.shape[1])
+    n_poets_active = max(int(np.count_nonzero(np.diff(poet_places.indptr))), 1)
+    common = poets_per_place > max_place_share * n_poets_active
+    if common.any():
+        poet_places = (poet_places @ sparse.diags((~common).astype(np.float64))).tocsr()
+        poet_places.eliminate_zeros()
+
+    place_counts = np.diff(poet_places.indptr)
+    keep = np.flatnonzero(place_counts > 0)
+    rows, cols, counts, pmi = cooccurrence_edges(
+        poet_places[keep], top_k=top_k, min_count=min_shared
+    )
+    communities = label_propagation(len(keep), rows, cols, counts.astype(np.float64))
+
+    nodes = [
+        {
+            "名称": tables.authors.name(author_id),
+            "地点数": int(place_counts[author_id]),
+            "社区": int(communities[node_index])
+        }
+        for node_index, author_id in enumerate(keep.tolist())
+    ]
+    return {
+        "节点": nodes,
+        "边字段": POET_EDGE_FIELDS,
+        "边": _edge_list(rows, cols, counts, pmi)
+    }
+
+
+def _edge_list(rows, cols, counts, pmi):
+    return [
+        [source, target, count, round(score, 4)]
+        for source, target, count, score in zip(
+            rows.tolist(), cols.tolist(), counts.tolist(), pmi.tolist()
+        )
+    ]
@@ -0,0 +1,319 @@
+import argparse
+import os
+import pickle
+import time
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+
+from analyzer_snapshot import CACHE_DIR
+from poetry_interning import NO_ID, UNKNOWN
+from poetry_lexicon import EXCLUDED_NAMES, build_alias_map, load_geo_entities
+
+EXTRACTION_STATE_PATH = os.path.join(CACHE_DIR, "extraction_state.pkl")
+
+# 提取状态的格式版本，结构变化时递增
+STATE_VERSION = 1
+
+# 拼接诗文时的分隔符，不会出现在别名中
+TEXT_SEPARATOR = "\0"
+
+
+class CandidateIndex:
+    """
+    候选索引：逐诗地名提及中的原文写法（词典别名、后缀正则候选、结巴 ns 词）-> 诗的下标。
+    对上次词典中生效（标准名未被排除）的别名是完整的——词典环节在每个分级都会运行，
+    诗文含该别名则必然记入；其余字符串可能漏记，需回到诗文中查找（见 find_in_texts）
+    """
+
+    def __init__(self):
+        self.postings = {}
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for position, record in enumerate(records):
+            for mention in record.mentions:
+                for surface in mention.surfaces:
+                    posting = index.postings.setdefault(surface, array("i"))
+                    if not posting or posting[-1] != position:
+                        posting.append(position)
+        return index
+
+    def lookup(self, surface):
+        return self.postings.get(surface, ())
+
+
+def find_in_texts(records, strings):
+    """
+    诗文（标题 + 正文，与提取时的拼接相同）中含任一字符串的诗的下标集合；
+    全部诗文拼成一个字符串后用 str.find 查找，每首诗命中一次即跳到下一首
+    """
+    strings = [s for s in strings if s and TEXT_SEPARATOR not in s]
+    if not strings or not records:
+        return set()
+    texts = [f"{record.title} {record.content or ''}" for record in records]
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + len(TEXT_SEPARATOR)
+    joined = TEXT_SEPARATOR.join(texts)
+
+    found = set()
+    for string in strings:
+        start = joined.find(string)
+        while start != -1:
+            poem = bisect_right(starts, start) - 1
+            found.add(poem)
+            if poem + 1 >= len(starts):
+                break
+            start = joined.find(string, starts[poem + 1])
+    return found
+
+
+class DictionaryDelta:
+    """
+    新旧地理词典与排除名单（EXCLUDED_NAMES）的差异
+    """
+
+    def __init__(self, old_entities, old_excluded, new_entities, new_excluded):
+        self.old_entities = old_entities
+        self.new_entities = new_entities
+        self.old_excluded = set(old_excluded)
+        self.new_excluded = set(new_excluded)
+        self.old_aliases = build_alias_map(old_entities)
+        self.new_aliases = build_alias_map(new_entities)
+
+        # 新增、删除或改归其他标准名的别名（标准名本身也是别名）
+        self.changed_aliases = sorted(
+            alias for alias in self.old_aliases.keys() | self.new_aliases.keys()
+            if alias and _canonical(self.old_aliases, alias) != _canonical(self.new_aliases, alias)
+        )
+        self.excluded_added = sorted(self.new_excluded - self.old_excluded)
+        self.excluded_removed = sorted(self.old_excluded - self.new_excluded)
+        # 只改了类型或现代对应的标准名：改写符号表即可，无需重新提取
+        self.retyped = sorted(
+            canonical for canonical in old_entities.keys() & new_entities.keys()
+            if _metadata(old_entities[canonical], canonical) != _metadata(new_entities[canonical], canonical)
+        )
+
+    @property
+    def empty(self):
+        return not (self.changed_aliases or self.excluded_added or self.excluded_removed or self.retyped)
+
+    def strings(self):
+        """
+        需要重新提取的诗所含的字符串：归属变化的别名，以及排除名单增删的地名及其新旧别名
+        """
+        strings = set(self.changed_aliases)
+        for name in self.excluded_added + self.excluded_removed:
+            strings.add(name)
+            for aliases in (self.old_aliases, self.new_aliases):
+                strings.update(alias for alias, info in aliases.items() if info["canonical"] == name)
+        strings.discard("")
+        return strings
+
+    def indexed(self, string):
+        """
+        候选索引对该字符串是否完整：上次词典中的别名，且其标准名当时未被排除
+        """
+        info = self.old_aliases.get(string)
+        return info is not None and info["canonical"] not in self.old_excluded
+
+    def format(self):
+        return (
+            f"词典变化：{len(self.changed_aliases)} 个别名增删或改归，"
+            f"排除名单 +{len(self.excluded_added)} / -{len(self.excluded_removed)}，"
+            f"{len(self.retyped)} 个地名改了类型或现代对应"
+        )
+
+
+def _canonical(aliases, alias):
+    info = aliases.get(alias)
+    return info["canonical"] if info else None
+
+
+def _metadata(info, canonical):
+    return info.get("type", UNKNOWN), info.get("modern_name", canonical)
+
+
+def affected_poems(records, index, delta):
+    """
+    受词典变化影响的诗的下标（升序）：索引完整的字符串直接查候选索引，其余回到诗文中查找
+    """
+    positions = set()
+    unindexed = []
+    for string in delta.strings():
+        if delta.indexed(string):
+            positions.update(index.lookup(string))
+        else:
+            unindexed.append(string)
+    positions |= find_in_texts(records, unindexed)
+    return sorted(positions)
+
+
+def adopt_tables(analyzer, tables, old_entities):
+    """
+    让按新词典构建的分析器沿用旧符号表（逐诗结果中的 ID 保持有效）：新增的标准名追加登记，
+    已登记的地名（含此前按“未知”登记的词典外地名）改写为新词典中的类型与现代对应，
+    移出词典的标准名恢复为“未知”
+    """
+    places = tables.places
+    for canonical in old_entities.keys() - analyzer.geo_entities.keys():
+        place_id = places.lookup(canonical)
+        if place_id is not None:
+            places.update(place_id)
+    for canonical, info in analyzer.geo_entities.items():
+        geo_type, modern_name = _metadata(info, canonical)
+        places.update(places.intern(canonical, geo_type, modern_name), geo_type, modern_name)
+    analyzer.tables = tables
+    analyzer.alias_place_ids = {
+        alias: places.lookup(info["canonical"]) for alias, info in analyzer.geo_alias_map.items()
+    }
+
+
+def reextract(analyzer, records, positions):
+    """
+    重新提取 positions 中各诗的地名，原地替换其提及；返回新旧提及涉及的地名 ID
+    （这些地名的诗集合或分词可能变化，关键词需重新提取）
+    """
+    touched = set()
+    for position in positions:
+        record = records[position]
+        mentions = analyzer.extract_geo_mentions(record.content, record.title)
+        touched.update(mention.place_id for mention in record.mentions)
+        touched.update(mention.place_id for mention in mentions)
+        record.mentions = mentions
+    return touched
+
+
+def compact_places(tables, records, places):
+    """
+    把逐诗结果中的地名 ID 换成 places（按新词典新建的地名表）中的 ID，并以 places 取代 tables.places：
+    词典外地名按诗的顺序重新登记，不再被任何诗提及的地名（孤立地名）随之去掉，
+    地名 ID 因而与按新词典从头分析时相同
+    """
+    old = tables.places
+    remap = {}
+    for record in records:
+        for mention in record.mentions:
+            place_id = remap.get(mention.place_id)
+            if place_id is None:
+                place_id = remap[mention.place_id] = places.intern(
+                    old.name(mention.place_id), old.type_name(mention.place_id), old.modern_name(mention.place_id)
+                )
+            mention.place_id = place_id
+    tables.places = places
+
+
+def author_mentions_of(records):
+    author_mentions = defaultdict(list)
+    for record in records:
+        if record.author_id != NO_ID and record.mentions:
+            author_mentions[record.author_id].append(record)
+    return author_mentions
+
+
+def save_extraction_state(path, analyzer, records, keyword_clouds, options):
+    """
+    保存提取状态：逐诗结果、符号表、候选索引、已提取的关键词，以及当时的词典与排除名单
+    """
+    state = {
+        "version": STATE_VERSION,
+        "options": {"extraction_tier": options["extraction_tier"], "tokenizer": options["tokenizer"]},
+        "geo_entities": analyzer.geo_entities,
+        "excluded_names": sorted(EXCLUDED_NAMES),
+        "tables": analyzer.tables,
+        "records": list(records),
+        "index": CandidateIndex.from_records(records),
+        "keyword_clouds": keyword_clouds
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return state
+
+
+def load_extraction_state(path=EXTRACTION_STATE_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到提取状态 {path}，请先运行 poetey_analysis.py --extraction-state")
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != STATE_VERSION:
+        raise ValueError(f"提取状态 {path} 的格式版本不符，请重新运行 poetey_analysis.py --extraction-state")
+    return state
+
+
+def update_outputs(state, path=EXTRACTION_STATE_PATH, dry_run=False):
+    """
+    按当前词典与排除名单更新分析结果：只重新提取受影响的诗，其余诗沿用上次的提及；
+    关键词只为涉及变化的地名重新提取，其余沿用上次结果。
+    关联矩阵由全部逐诗结果整体重建（只遍历已有的提及，不重新分析），汇总再由矩阵向量化地重算；
+    重建前按新词典重排地名表，去掉孤立地名
+    """
+    from geo_matrix import IncidenceBuilder
+    from poetey_analysis import PoetryAnalyzer, export_analysis_outputs
+
+    new_entities, _ = load_geo_entities()
+    delta = DictionaryDelta(state["geo_entities"], state["excluded_names"], new_entities, EXCLUDED_NAMES)
+    print(delta.format())
+    if delta.empty:
+        print("词典与排除名单均未变化，无需更新")
+        return None
+
+    records = state["records"]
+    positions = affected_poems(records, state["index"], delta)
+    print(f"受影响的诗：{len(positions)} / {len(records)} 首")
+    if dry_run:
+        return positions
+
+    analyzer = PoetryAnalyzer(audit_every=0, **state["options"])
+    fresh_places, fresh_alias_ids = analyzer.tables.places, analyzer.alias_place_ids
+    adopt_tables(analyzer, state["tables"], state["geo_entities"])
+    touched = reextract(analyzer, records, positions)
+
+    places = analyzer.tables.places
+    touched_names = {places.name(place_id) for place_id in touched}
+    compact_places(analyzer.tables, records, fresh_places)
+    analyzer.alias_place_ids = fresh_alias_ids
+    keyword_cache = {
+        entry["名称"]: entry["关键词"] for entry in state["keyword_clouds"] if entry["名称"] not in touched_names
+    }
+    incidence = IncidenceBuilder.from_records(records).build(analyzer.tables)
+    trajectories = analyzer.build_author_trajectories(author_mentions_of(records))
+    outputs = export_analysis_outputs(
+        records,
+        analyzer.export_author_trajectories(trajectories),
+        analyzer.geo_coordinates,
+        analyzer.tables,
+        incidence,
+        analyzer.author_profiles,
+        analyzer.segmenter,
+        keyword_cache
+    )
+    save_extraction_state(path, analyzer, records, outputs["keyword_clouds.json"], state["options"])
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="地理词典或排除名单修订后，只重新提取受影响的诗并更新 output/ 中的分析结果"
+    )
+    parser.add_argument("--state", default=EXTRACTION_STATE_PATH, help="提取状态文件（poetey_analysis.py --extraction-state 写出）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出词典变化与受影响的诗数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        state = load_extraction_state(args.state)
+    except (FileNotFoundError, ValueError) as exc:
+        parser.error(str(exc))
+    update_outputs(state, args.state, args.dry_run)
+    print(f"用时 {time.perf_counter() - started:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import copy
+import hashlib
+import heapq
+import json
+import math
+import pickle
+
+import numpy as np
+
+
+def hash64(value, seed=b""):
+    """
+    字符串的稳定 64 位哈希（不受 PYTHONHASHSEED 影响，便于跨进程、跨分片合并）
+    """
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8, salt=seed.ljust(16, b"\0")).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 基数估计，2^p 个寄存器，相对标准误差约 1.04 / sqrt(2^p)。
+    基数较小时以稀疏字典保存寄存器，超过 m/32 个（此时稀疏表已不比稠密数组省）再转为稠密数组
+    """
+    __slots__ = ("p", "m", "_sparse", "_dense")
+
+    def __init__(self, p=10):
+        self.p = p
+        self.m = 1 << p
+        self._sparse = {}
+        self._dense = None
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        h = hash64(value)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        self._set(index, rank)
+
+    def _set(self, index, rank):
+        if self._dense is not None:
+            if rank > self._dense[index]:
+                self._dense[index] = rank
+            return
+        if rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+            if len(self._sparse) > self.m // 32:
+                self._densify()
+
+    def _densify(self):
+        self._dense = bytearray(self.m)
+        for index, rank in self._sparse.items():
+            self._dense[index] = rank
+        self._sparse = None
+
+    def registers(self):
+        if self._dense is not None:
+            return np.frombuffer(bytes(self._dense), dtype=np.uint8)
+        registers = np.zeros(self.m, dtype=np.uint8)
+        if self._sparse:
+            registers[list(self._sparse)] = list(self._sparse.values())
+        return registers
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("HyperLogLog 精度不同，无法合并")
+        if other._dense is not None:
+            if self._dense is None:
+                self._densify()
+            merged = np.maximum(self.registers(), other.registers())
+            self._dense = bytearray(merged.tobytes())
+        else:
+            for index, rank in other._sparse.items():
+                self._set(index, rank)
+        return self
+
+    def count(self):
+        registers = self.registers().astype(np.float64)
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.exp2(-registers))
+        zeros = int(np.count_nonzero(registers == 0))
+        # 小基数时改用线性计数
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def memory_bytes(self):
+        return self.m if self._dense is not None else 48 * len(self._sparse)
+
+
+class CountMinSketch:
+    """
+    Count-Min 计数草图：depth 行 × width 列。估计值不低于真实值，
+    以 1 - e^-depth 的概率高估不超过 (e / width) × 总计数
+    """
+    __slots__ = ("width", "depth", "table", "total")
+
+    def __init__(self, width=1 << 14, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.uint32)
+        self.total = 0
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def _columns(self, value):
+        h = hash64(value, b"cms")
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, value, count=1):
+        self.table[np.arange(self.depth), self._columns(value)] += count
+        self.total += count
+
+    def estimate(self, value):
+        return int(self.table[np.arange(self.depth), self._columns(value)].min())
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min 尺寸不同，无法合并")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def memory_bytes(self):
+        return self.table.nbytes
+
+
+class SpaceSaving:
+    """
+    SpaceSaving 热门项统计：最多保留 capacity 个计数器；
+    每项计数的高估量不超过其 error 值，且不超过 总计数 / capacity。
+    淘汰最小计数用惰性失效的小顶堆：每项在堆中恰有一条 (计数, 项)，计数增加时不更新堆，
+    弹出的条目计数已过时则按当前计数放回，因此每次淘汰为 O(log capacity)
+    """
+    __slots__ = ("capacity", "counters", "total", "_heap")
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        # 项 -> [计数, 高估量上界]
+        self.counters = {}
+        self.total = 0
+        self._heap = []
+
+    def add(self, item, count=1):
+        self.total += count
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            heapq.heappush(self._heap, (count, item))
+        else:
+            floor = self._pop_min()
+            self.counters[item] = [floor + count, floor]
+            heapq.heappush(self._heap, (floor + count, item))
+
+    def _pop_min(self):
+        """
+        移除计数最小的项，返回其计数
+        """
+        heap = self._heap
+        while True:
+            count, victim = heap[0]
+            current = self.counters[victim][0]
+            if current == count:
+                heapq.heappop(heap)
+                del self.counters[victim]
+                return count
+            heapq.heapreplace(heap, (current, victim))
+
+    def _rebuild_heap(self):
+        self._heap = [(counter[0], item) for item, counter in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def merge(self, other):
+        """
+        合并两份摘要（Agarwal 等的可合并 SpaceSaving）：缺失项按对方最小计数补足后保留前 capacity 项
+        """
+        own_floor = min((c[0] for c in self.counters.values()), default=0) if len(self.counters) >= self.capacity else 0
+        other_floor = min((c[0] for c in other.counters.values()), default=0) if len(other.counters) >= other.capacity else 0
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            count_a, error_a = self.counters.get(item, (own_floor, own_floor))
+            count_b, error_b = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count_a + count_b, error_a + error_b]
+        top = heapq.nlargest(self.capacity, merged.items(), key=lambda kv: kv[1][0])
+        self.counters = {item: counter for item, counter in top}
+        self._rebuild_heap()
+        self.total += other.total
+        return self
+
+    def top(self, n=None):
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return ranked[:n] if n else ranked
+
+    @property
+    def max_error(self):
+        return self.total / self.capacity if self.capacity else 0
+
+    def memory_bytes(self):
+        return 200 * len(self.counters)
+
+
+class GeoSketch:
+    """
+    近似统计模式的地名汇总：Count-Min 估计各地名提及次数，SpaceSaving 统计热门地名（总体与分朝代），
+    HyperLogLog 估计各地名、各朝代及地名 × 朝代的诗人数。以名称为键，可跨进程、跨分片 merge
+    """
+
+    def __init__(self, hll_precision=10, cms_width=1 << 14, cms_depth=4, top_capacity=256):
+        self.hll_precision = hll_precision
+        self.top_capacity = top_capacity
+        self.poems = 0
+        self.mentions = CountMinSketch(cms_width, cms_depth)
+        self.top_places = SpaceSaving(top_capacity)
+        self.dynasty_top_places = {}
+        self.place_poets = {}
+        self.dynasty_poets = {}
+        self.place_dynasty_poets = {}
+
+    def _hll(self, table, key):
+        sketch = table.get(key)
+        if sketch is None:
+            sketch = table[key] = HyperLogLog(self.hll_precision)
+        return sketch
+
+    def add(self, place_names, author, dynasty):
+        """
+        登记一首诗：提及的地名（已去除泛指词）、作者与朝代
+        """
+        self.poems += 1
+        if author:
+            self._hll(self.dynasty_poets, dynasty).add(author)
+        if not place_names:
+            return
+        dynasty_top = self.dynasty_top_places.get(dynasty)
+        if dynasty_top is None:
+            dynasty_top = self.dynasty_top_places[dynasty] = SpaceSaving(self.top_capacity)
+        for name in place_names:
+            self.mentions.add(name)
+            self.top_places.add(name)
+            dynasty_top.add(name)
+            if author:
+                self._hll(self.place_poets, name).add(author)
+                self._hll(self.place_dynasty_poets, (name, dynasty)).add(author)
+
+    def merge(self, other):
+        """
+        并入另一份草图；对方独有的摘要复制后再保存，之后继续 add 或 merge 不会改动 other
+        """
+        self.poems += other.poems
+        self.mentions.merge(other.mentions)
+        self.top_places.merge(other.top_places)
+        for dynasty, summary in other.dynasty_top_places.items():
+            if dynasty in self.dynasty_top_places:
+                self.dynasty_top_places[dynasty].merge(summary)
+            else:
+                self.dynasty_top_places[dynasty] = copy.deepcopy(summary)
+        for table, other_table in (
+            (self.place_poets, other.place_poets),
+            (self.dynasty_poets, other.dynasty_poets),
+            (self.place_dynasty_poets, other.place_dynasty_poets)
+        ):
+            for key, sketch in other_table.items():
+                if key in table:
+                    table[key].merge(sketch)
+                else:
+                    table[key] = copy.deepcopy(sketch)
+        return self
+
+    def memory_bytes(self):
+        total = self.mentions.memory_bytes() + self.top_places.memory_bytes()
+        total += sum(s.memory_bytes() for s in self.dynasty_top_places.values())
+        for table in (self.place_poets, self.dynasty_poets, self.place_dynasty_poets):
+            total += sum(s.memory_bytes() for s in table.values())
+        return total
+
+    def metadata(self):
+        return {
+            "模式": "近似统计",
+            "诗歌数": self.poems,
+            "地名提及总数": self.mentions.total,
+            "诗人数误差": f"HyperLogLog p={self.hll_precision}，相对标准误差约 {1.04 / math.sqrt(1 << self.hll_precision):.2%}",
+            "出现次数误差": (
+                f"Count-Min {self.mentions.depth}×{self.mentions.width}，估计值不低于真实值，"
+                f"以 {1 - self.mentions.delta:.1%} 的概率高估不超过 {self.mentions.epsilon * self.mentions.total:.1f} 次"
+            ),
+            "热门地名误差": (
+                f"SpaceSaving 容量 {self.top_capacity}，每项高估不超过其“计数误差上界”，"
+                f"且不超过 {self.top_places.max_error:.1f} 次"
+            ),
+            "草图内存（字节）": self.memory_bytes()
+        }
+
+    def _place_rows(self, summary, n):
+        return [
+            {
+                "名称": name,
+                "估计出现次数": self.mentions.estimate(name),
+                "热门计数": count,
+                "计数误差上界": error,
+                "估计诗人数": self.place_poets[name].count() if name in self.place_poets else 0
+            }
+            for name, (count, error) in summary.top(n)
+        ]
+
+    def summary(self, top_n=50):
+        return {
+            "元数据": self.metadata(),
+            "热门地名": self._place_rows(self.top_places, top_n),
+            "朝代": [
+                {
+                    "朝代": dynasty,
+                    "估计诗人数": self.dynasty_poets[dynasty].count() if dynasty in self.dynasty_poets else 0,
+                    "热门地名": [
+                        dict(row, 估计诗人数=(
+                            self.place_dynasty_poets[(row["名称"], dynasty)].count()
+                            if (row["名称"], dynasty) in self.place_dynasty_poets else 0
+                        ))
+                        for row in self._place_rows(summary, min(top_n, 20))
+                    ]
+                }
+                for dynasty, summary in sorted(
+                    self.dynasty_top_places.items(), key=lambda item: -item[1].total
+                )
+            ]
+        }
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合并多个分片的近似统计草图并输出汇总")
+    parser.add_argument("sketches", nargs="+", help="GeoSketch.save 保存的草图文件")
+    parser.add_argument("-o", "--output", help="汇总 JSON 输出路径，默认打印")
+    parser.add_argument("--top", type=int, default=50)
+    args = parser.parse_args()
+
+    merged = GeoSketch.load(args.sketches[0])
+    for path in args.sketches[1:]:
+        merged.merge(GeoSketch.load(path))
+    summary = merged.summary(args.top)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+from array import array
+
+from poetry_lexicon import BASE_DIR, OUTPUT_DIR
+from spill_store import current_rss_bytes
+
+MEMORY_REPORT_PATH = os.path.join(OUTPUT_DIR, "memory_report.json")
+
+# 每个阶段列出的新增分配最多的位置数
+DEFAULT_TOP_SITES = 10
+# 估计大容器时抽样的元素数，超过则按样本均值外推
+SAMPLE_SIZE = 200
+
+# 不计入热点的分配（tracemalloc 自身与导入机制）
+TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None), array, range)
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    对象及其引用对象的字节数（同一对象只计一次）：展开字典、列表、元组、集合、__slots__ 与 __dict__；
+    numpy 数组按 getsizeof（含自有数据）计，类、模块与函数不展开
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, _ATOMIC) or hasattr(item, "dtype"):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            for cls in type(item).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    value = getattr(item, name, None)
+                    if value is not None:
+                        stack.append(value)
+            if hasattr(item, "__dict__"):
+                stack.append(item.__dict__)
+    return total
+
+
+def estimate_size(container, sample=SAMPLE_SIZE):
+    """
+    容器及其元素的字节数：元素不超过 sample 个时逐个计算，否则等距抽样 sample 个按均值外推；
+    字典的元素为键与值
+    """
+    if isinstance(container, dict):
+        items = container.items()
+        item_size = lambda item, seen: deep_sizeof(item[0], seen) + deep_sizeof(item[1], seen)
+    elif isinstance(container, (list, tuple, set, frozenset)):
+        items = container
+        item_size = deep_sizeof
+    else:
+        return deep_sizeof(container)
+    count = len(container)
+    shallow = sys.getsizeof(container)
+    seen = {id(container)}
+    if count <= sample:
+        return shallow + sum(item_size(item, seen) for item in items)
+    picks = {int(i * count / sample) for i in range(sample)}
+    sampled = sum(item_size(item, seen) for index, item in enumerate(items) if index in picks)
+    return shallow + int(sampled / len(picks) * count)
+
+
+def shallow_mapping_sizeof(mapping):
+    """
+    映射本身与其各个值容器（如作者 -> 逐诗结果列表）的字节数，不含值中引用的共享对象
+    """
+    return sys.getsizeof(mapping) + sum(sys.getsizeof(value) for value in mapping.values())
+
+
+def place_text_sizes(records):
+    """
+    关键词提取时各地名拼接的“文本集合”：返回 (最大一个地名的字节数, 全部地名合计)。
+    提取时逐个地名拼接、用完即弃，峰值约为最大的一个
+    """
+    sizes = {}
+    for record in records:
+        if not record.content:
+            continue
+        size = sys.getsizeof(record.content)
+        for mention in record.mentions:
+            sizes[mention.place_id] = sizes.get(mention.place_id, 0) + size
+    return max(sizes.values(), default=0), sum(sizes.values())
+
+
+def jieba_dictionary_size():
+    """
+    已载入的结巴前缀词典与词性表的字节数（结巴未载入时返回 None）
+    """
+    jieba = sys.modules.get("jieba")
+    if jieba is None or not getattr(jieba.dt, "initialized", False):
+        return None
+    size = estimate_size(jieba.dt.FREQ)
+    posseg = sys.modules.get("jieba.posseg")
+    if posseg is not None:
+        size += estimate_size(posseg.dt.word_tag_tab)
+    return size
+
+
+def _site(frame):
+    path = os.path.abspath(frame.filename)
+    if path.startswith(BASE_DIR + os.sep):
+        path = os.path.relpath(path, BASE_DIR).replace(os.sep, "/")
+    return f"{path}:{frame.lineno}"
+
+
+def _mb(size):
+    return "-" if size is None else f"{size / 1024 / 1024:.1f} MB"
+
+
+class MemoryProfiler:
+    """
+    可选的内存剖析：enabled 时启动 tracemalloc，mark(stage) 在阶段边界取快照，
+    记录该阶段新增的分配、阶段内峰值、RSS 与新增最多的分配位置；measure 记录主要数据结构的估计大小。
+    未启用时各方法均不做任何事，调用处无需判断
+    """
+
+    def __init__(self, enabled=True, top=DEFAULT_TOP_SITES, frames=1):
+        self.enabled = enabled
+        self.top = top
+        self.stages = []
+        self.structures = {}
+        self._snapshot = None
+        if enabled:
+            tracemalloc.start(frames)
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+            self._stage_started = time.perf_counter()
+
+    def mark(self, stage):
+        """
+        结束名为 stage 的阶段（从上一次 mark 或启动开始计）
+        """
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(TRACE_FILTERS)
+        diff = snapshot.compare_to(self._snapshot, "lineno")
+        growth = sorted((stat for stat in diff if stat.size_diff > 0), key=lambda stat: stat.size_diff, reverse=True)
+        now = time.perf_counter()
+        self.stages.append(
+            {
+                "阶段": stage,
+                "新增分配（字节）": sum(stat.size_diff for stat in diff),
+                "阶段结束时（字节）": current,
+                "阶段内峰值（字节）": peak,
+                "RSS（字节）": current_rss_bytes(),
+                "耗时（秒）": round(now - self._stage_started, 3),
+                "新增最多的位置": [
+                    {"位置": _site(stat.traceback[0]), "新增（字节）": stat.size_diff, "新增块数": stat.count_diff}
+                    for stat in growth[:self.top]
+                ]
+            }
+        )
+        # 快照本身也占内存，先释放旧快照再重置峰值
+        self._snapshot = snapshot
+        tracemalloc.reset_peak()
+        self._stage_started = time.perf_counter()
+
+    def measure(self, name, size):
+        """
+        记录一个数据结构的估计字节数（size 为 None 时不记录）
+        """
+        if self.enabled and size is not None:
+            self.structures[name] = size
+
+    def measure_analysis(self, poems=None, analysis=None):
+        """
+        估计分析流程中的主要数据结构：原始诗词、逐诗结果、作者提及、关键词文本集合与结巴词典
+        """
+        if not self.enabled:
+            return
+        if poems is not None and isinstance(poems, list):
+            self.measure("poems（原始诗词）", estimate_size(poems))
+        if analysis is not None:
+            results = analysis["poems"]
+            if isinstance(results, list):
+                self.measure("analysis_results（逐诗结果）", estimate_size(results))
+                largest, total = place_text_sizes(results)
+                self.measure("文本集合（最大一个地名）", largest)
+                self.measure("文本集合（全部地名合计）", total)
+            author_mentions = analysis.get("author_mentions")
+            if isinstance(author_mentions, dict):
+                self.measure("author_mentions（不含共享的逐诗结果）", shallow_mapping_sizeof(author_mentions))
+            self.measure("符号表", deep_sizeof(analysis["tables"]))
+        self.measure("结巴词典", jieba_dictionary_size())
+
+    def report(self):
+        peak = max((stage["阶段内峰值（字节）"] for stage in self.stages), default=0)
+        return {
+            "峰值（字节）": peak,
+            "峰值 RSS（字节）": max((stage["RSS（字节）"] or 0 for stage in self.stages), default=0) or None,
+            "各阶段": self.stages,
+            "数据结构估计（字节）": self.structures
+        }
+
+    def format(self):
+        report = self.report()
+        lines = [f"内存剖析：tracemalloc 峰值 {_mb(report['峰值（字节）'])}，RSS 峰值 {_mb(report['峰值 RSS（字节）'])}"]
+        for stage in self.stages:
+            lines.append(
+                f"  {stage['阶段']:<10} 新增 {_mb(stage['新增分配（字节）']):>10}  "
+                f"阶段峰值 {_mb(stage['阶段内峰值（字节）']):>10}  {stage['耗时（秒）']} 秒"
+            )
+            for site in stage["新增最多的位置"][:3]:
+                lines.append(f"      {site['位置']}  +{_mb(site['新增（字节）'])}")
+        if self.structures:
+            lines.append("  数据结构估计：")
+            for name, size in sorted(self.structures.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"    {name:<28} {_mb(size)}")
+        return "\n".join(lines)
+
+    def save(self, path=MEMORY_REPORT_PATH):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def stop(self):
+        if self.enabled:
+            self._snapshot = None
+            tracemalloc.stop()
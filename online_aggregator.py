@@ -0,0 +1,279 @@
+import os
+from collections import Counter
+from operator import itemgetter
+
+from poetey_analysis import build_poet_paths, make_poem_record, write_json_outputs
+from poetry_interning import NO_ID, SENTIMENT_LABELS
+from poetry_lexicon import EXCLUDED_NAMES, OUTPUT_DIR
+
+# 关键词云中每个地名列出的关键词数（与 _extract_place_keywords 相同）
+TOP_KEYWORDS = 30
+
+
+def jieba_keyword_counts(text):
+    """
+    与 jieba.analyse.extract_tags 相同的关键词候选词频（去掉单字与停用词），按首次出现的顺序排列
+    """
+    import jieba.analyse
+
+    tfidf = jieba.analyse.default_tfidf
+    counts = {}
+    for word in tfidf.tokenizer.cut(text):
+        if len(word.strip()) < 2 or word.lower() in tfidf.stop_words:
+            continue
+        counts[word] = counts.get(word, 0) + 1
+    return counts
+
+
+def jieba_tags_from_counts(counts, top_k=TOP_KEYWORDS):
+    """
+    由词频计算结巴的 TF-IDF 权重，返回权重最高的 top_k 个 (词, 权重)。
+    与 extract_tags 逐位一致：权重按 count * (idf / total) 计算，同权重的词保持 counts 中的先后（首次出现的顺序）
+    """
+    import jieba.analyse
+
+    tfidf = jieba.analyse.default_tfidf
+    total = sum(counts.values())
+    if not total:
+        return []
+    weights = {word: count * (tfidf.idf_freq.get(word, tfidf.median_idf) / total) for word, count in counts.items()}
+    return sorted(weights.items(), key=itemgetter(1), reverse=True)[:top_k]
+
+
+class OnlineAggregator:
+    """
+    可追加、可撤回的在线汇总。按（地名, 朝代）格子保存每首诗的贡献 {序号: (提及位置, 得分, 情感类型)}，
+    另有地名下的诗人计数、每首诗的关键词词频与各作者的诗；add / remove 只改动该诗涉及的格子，代价与诗的大小成正比。
+    snapshot() 随时由这些状态生成与批量导出（aggregate_geo_statistics、作者轨迹）相同结构的结果，
+    其中地名、朝代与作者的先后按首次出现的诗排列；得分每次按诗的顺序重新求和（与 place_score_sums 的
+    bincount 顺序相同），各地名的关键词词频也按诗的顺序合并（与拼接正文后提取相同，同权重的词按首次出现排列），
+    结果与批量导出逐位一致，也不随增删累积误差
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.records = {}
+        # place_id -> dynasty_id -> {order: (提及位置, 得分, 情感类型 ID)}
+        self.cells = {}
+        self.place_authors = {}
+        # order -> 该诗的关键词词频（按首次出现的顺序），只保存提及地名的诗
+        self.record_words = {}
+        # author_id -> {order: PoemRecord}
+        self.author_records = {}
+
+    @classmethod
+    def from_records(cls, analyzer, records):
+        aggregator = cls(analyzer)
+        for record in records:
+            aggregator.add(record)
+        return aggregator
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, order):
+        return order in self.records
+
+    @property
+    def next_order(self):
+        return max(self.records) + 1 if self.records else 0
+
+    def _keyword_counts(self, record):
+        if not record.content:
+            return {}
+        segmenter = self.analyzer.segmenter
+        if segmenter is not None:
+            return segmenter.keyword_counts(record.content)
+        return jieba_keyword_counts(record.content)
+
+    def _top_keywords(self, counts):
+        segmenter = self.analyzer.segmenter
+        if segmenter is not None:
+            return segmenter.tags_from_counts(counts, TOP_KEYWORDS)
+        return jieba_tags_from_counts(counts, TOP_KEYWORDS)
+
+    def ingest(self, poem):
+        """
+        分析一首新诗（字典，同语料格式）并追加，返回其 PoemRecord
+        """
+        record = make_poem_record(self.analyzer.tables, self.next_order, poem, *self.analyzer.analyze_poem(poem))
+        self.add(record)
+        return record
+
+    def add(self, record):
+        if record.order in self.records:
+            raise ValueError(f"第 {record.order} 首诗已在汇总中，更正请先 remove 再 add")
+        self.records[record.order] = record
+        if record.author_id != NO_ID and record.mentions:
+            self.author_records.setdefault(record.author_id, {})[record.order] = record
+        words = self._keyword_counts(record) if record.mentions else {}
+        if words:
+            self.record_words[record.order] = words
+
+        for position, mention in enumerate(record.mentions):
+            place_id = mention.place_id
+            dynasties = self.cells.setdefault(place_id, {})
+            dynasties.setdefault(record.dynasty_id, {})[record.order] = (position, record.score, record.label_id)
+            if record.author_id != NO_ID:
+                self.place_authors.setdefault(place_id, Counter())[record.author_id] += 1
+
+    def remove(self, record):
+        """
+        撤回一首诗（按序号找到加入时的版本，撤回其全部贡献），返回被撤回的 PoemRecord
+        """
+        stored = self.records.pop(record.order, None)
+        if stored is None:
+            raise KeyError(f"第 {record.order} 首诗不在汇总中")
+        record = stored
+        author_records = self.author_records.get(record.author_id)
+        if author_records is not None:
+            author_records.pop(record.order, None)
+            if not author_records:
+                del self.author_records[record.author_id]
+        self.record_words.pop(record.order, None)
+
+        for mention in record.mentions:
+            place_id = mention.place_id
+            dynasties = self.cells[place_id]
+            cell = dynasties[record.dynasty_id]
+            del cell[record.order]
+            if not cell:
+                del dynasties[record.dynasty_id]
+            if not dynasties:
+                del self.cells[place_id]
+            if record.author_id != NO_ID:
+                _subtract(self.place_authors, place_id, {record.author_id: 1})
+        return record
+
+    def replace(self, record):
+        """
+        用更正后的结果替换同序号的诗
+        """
+        self.remove(record)
+        self.add(record)
+
+    def snapshot(self):
+        """
+        生成当前的汇总结果 {文件名: 数据}：geo_stats、sentiment_trend、keyword_clouds、poet_paths
+        """
+        analyzer = self.analyzer
+        tables = analyzer.tables
+        places = tables.places
+        coordinate_map = analyzer.geo_coordinates
+
+        first_seen = {
+            place_id: {
+                dynasty_id: min((order, entry[0]) for order, entry in cell.items())
+                for dynasty_id, cell in dynasties.items()
+            }
+            for place_id, dynasties in self.cells.items()
+        }
+
+        geo_stats = []
+        sentiment_trend = []
+        keyword_clouds = []
+        for place_id in sorted(first_seen, key=lambda p: min(first_seen[p].values())):
+            name = places.name(place_id)
+            if name in EXCLUDED_NAMES:
+                continue
+            dynasties = self.cells[place_id]
+            dynasty_data = []
+            place_scores = {}
+            labels = Counter()
+            for dynasty_id in sorted(dynasties, key=first_seen[place_id].get):
+                cell = dynasties[dynasty_id]
+                cell_scores = {order: score for order, (_, score, _) in cell.items()}
+                cell_labels = Counter(label_id for _, _, label_id in cell.values())
+                place_scores.update(cell_scores)
+                labels.update(cell_labels)
+                dynasty_data.append(
+                    {
+                        "朝代": tables.dynasties.name(dynasty_id),
+                        "出现次数": len(cell_scores),
+                        "平均情感得分": _ordered_sum(cell_scores) / len(cell_scores),
+                        "情感统计": _label_counts_to_dict(cell_labels)
+                    }
+                )
+
+            modern_name = places.modern_name(place_id)
+            geo_stats.append(
+                {
+                    "名称": name,
+                    "类型": places.type_name(place_id),
+                    "现代对应": modern_name,
+                    "总出现次数": len(place_scores),
+                    "情感统计": _label_counts_to_dict(labels),
+                    "平均情感得分": _ordered_sum(place_scores) / len(place_scores),
+                    "出现诗人": sorted(tables.authors.name(a) for a in self.place_authors.get(place_id, ())),
+                    "坐标": coordinate_map.get(name) or coordinate_map.get(modern_name),
+                    "朝代统计": dynasty_data
+                }
+            )
+            sentiment_trend.append({"名称": name, "数据": dynasty_data})
+            keyword_clouds.append(
+                {
+                    "名称": name,
+                    "关键词": [
+                        {"word": word, "weight": weight}
+                        for word, weight in self._top_keywords(self._place_word_counts(dynasties))
+                    ]
+                }
+            )
+
+        # 与 PoemCollection.author_mentions 相同，作者按其第一首诗的顺序排列
+        authors = sorted(self.author_records, key=lambda a: min(self.author_records[a]))
+        trajectories = analyzer.build_author_trajectories(
+            {author_id: list(self.author_records[author_id].values()) for author_id in authors}
+        )
+        poet_paths = build_poet_paths(analyzer.export_author_trajectories(trajectories), coordinate_map)
+        return {
+            "geo_stats.json": geo_stats,
+            "sentiment_trend.json": sentiment_trend,
+            "keyword_clouds.json": keyword_clouds,
+            "poet_paths.json": poet_paths
+        }
+
+    def _place_word_counts(self, dynasties):
+        """
+        按诗的顺序合并提及该地名的各诗词频，词的先后为在拼接正文中首次出现的顺序
+        """
+        counts = {}
+        for order in sorted(order for cell in dynasties.values() for order in cell):
+            for word, count in self.record_words.get(order, {}).items():
+                counts[word] = counts.get(word, 0) + count
+        return counts
+
+    def write(self, output_dir=OUTPUT_DIR):
+        """
+        把当前汇总写到 output_dir（默认 output/），覆盖同名文件；返回写出的数据
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = self.snapshot()
+        write_json_outputs(outputs, output_dir)
+        return outputs
+
+
+def _subtract(counters, place_id, counts):
+    counter = counters[place_id]
+    for key, count in counts.items():
+        remaining = counter[key] - count
+        if remaining > 0:
+            counter[key] = remaining
+        else:
+            del counter[key]
+    if not counter:
+        del counters[place_id]
+
+
+def _ordered_sum(scores_by_order):
+    """
+    按诗的顺序逐个相加（{序号: 得分}）
+    """
+    total = 0.0
+    for order in sorted(scores_by_order):
+        total += scores_by_order[order]
+    return total
+
+
+def _label_counts_to_dict(counts):
+    return {label: counts[label_id] for label_id, label in enumerate(SENTIMENT_LABELS) if counts[label_id]}
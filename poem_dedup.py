@@ -0,0 +1,159 @@
+import re
+
+import numpy as np
+
+# 归一化时只保留汉字（含扩展 A 区与兼容区），去掉标点、空白与注释符号
+NON_HAN_PATTERN = re.compile(r"[^㐀-䶿一-鿿豈-﫿]")
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def normalize_text(text):
+    """
+    归一化诗文：去掉标点、空白与非汉字字符
+    """
+    if not isinstance(text, str):
+        text = "".join(text)
+    return NON_HAN_PATTERN.sub("", text)
+
+
+def shingle_keys(text, size=SHINGLE_SIZE):
+    """
+    字符 n-gram 编码为 64 位整数（每个码位 21 位），不足 size 个字时整段作为一个 shingle
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return codes
+    if len(codes) < size:
+        size = len(codes)
+    keys = np.zeros(len(codes) - size + 1, dtype=np.uint64)
+    for offset in range(size):
+        keys = (keys << np.uint64(21)) | codes[offset:len(codes) - size + 1 + offset]
+    return np.unique(keys)
+
+
+class MinHasher:
+    """
+    multiply-shift 哈希族的 MinHash：h_i(x) = (a_i * x + b_i) mod 2^64 的高 32 位
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, keys):
+        if len(keys) == 0:
+            return np.zeros(self.num_perm, dtype=np.uint32)
+        with np.errstate(over="ignore"):
+            hashed = (keys[:, None] * self.a[None, :] + self.b[None, :]) & _MASK64
+        return (hashed >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateFilter:
+    """
+    流式近重复过滤：每首诗归一化后做 MinHash 签名，按 LSH 分段分桶；
+    与已保留的诗同桶且签名估计 Jaccard >= threshold 者视为重复，只保留首次出现的一份。
+    每首诗只查询自身所在的 bands 个桶，整体近似线性
+    """
+
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, seed)
+        self._buckets = [{} for _ in range(bands)]
+        # 已保留诗歌的签名，按保留顺序逐行存放，容量不足时倍增
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self.kept = 0
+        self.skipped = 0
+        # 保留序号 -> 被并入的重复数
+        self.duplicate_counts = {}
+
+    def find_duplicate(self, text):
+        """
+        返回与 text 近重复的已保留诗歌序号；没有则登记 text 并返回 None。
+        归一化后没有汉字的文本（空文本、只有标点或注释符号）不参与去重，也不登记：
+        它们的签名全为零，否则会互相判为重复而被丢弃
+        """
+        keys = shingle_keys(normalize_text(text))
+        if len(keys) == 0:
+            return None
+        signature = self.hasher.signature(keys)
+        band_keys = [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+        checked = set()
+        for buckets, key in zip(self._buckets, band_keys):
+            for candidate in buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    self.skipped += 1
+                    self.duplicate_counts[candidate] = self.duplicate_counts.get(candidate, 0) + 1
+                    return candidate
+
+        index = self.kept
+        if index == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+        self._signatures[index] = signature
+        for buckets, key in zip(self._buckets, band_keys):
+            buckets.setdefault(key, []).append(index)
+        self.kept += 1
+        return None
+
+    def __getstate__(self):
+        # 只保存已保留诗歌的签名行（用于检查点），载入时再补足容量
+        state = self.__dict__.copy()
+        state["_signatures"] = self._signatures[:self.kept].copy()
+        return state
+
+    def __setstate__(self, state):
+        signatures = state["_signatures"]
+        capacity = max(1024, len(signatures))
+        state["_signatures"] = np.zeros((capacity, signatures.shape[1]), dtype=np.uint32)
+        state["_signatures"][:len(signatures)] = signatures
+        self.__dict__.update(state)
+
+    def filter(self, poems):
+        """
+        逐首过滤诗词字典（读取 content 字段），只产出每个近重复簇中首次出现的一首
+        """
+        for poem in poems:
+            if self.find_duplicate(poem.get("content", "")) is None:
+                yield poem
+
+    @property
+    def cluster_count(self):
+        """
+        含重复副本的簇数
+        """
+        return len(self.duplicate_counts)
+
+
+def find_duplicate_clusters(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    """
+    批量版本：返回 {首次出现的下标: [重复下标, ...]}
+    """
+    dedup = NearDuplicateFilter(threshold, num_perm, bands)
+    kept_positions = []
+    clusters = {}
+    for position, text in enumerate(texts):
+        canonical = dedup.find_duplicate(text)
+        if canonical is not None:
+            clusters.setdefault(kept_positions[canonical], []).append(position)
+        elif dedup.kept > len(kept_positions):
+            # 没有汉字的文本不登记，不占保留序号
+            kept_positions.append(position)
+    return clusters
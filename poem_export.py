@@ -0,0 +1,188 @@
+import bz2
+import gzip
+import json
+import lzma
+import os
+
+# 可选字段：ids（标识信息）、entities（地理实体及原文位置）、sentiment（情感）、
+# themes（主题得分）、content（原文）
+POEM_FIELDS = ("ids", "entities", "sentiment", "themes", "content")
+DEFAULT_POEM_FIELDS = ("ids", "entities", "sentiment", "themes")
+
+COMPRESSORS = {
+    "none": (open, ""),
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+
+def parse_fields(value):
+    """
+    解析逗号分隔的字段列表，如 "ids,entities"；"all" 表示全部字段
+    """
+    if not value:
+        return DEFAULT_POEM_FIELDS
+    if value == "all":
+        return POEM_FIELDS
+    fields = tuple(field.strip() for field in value.split(",") if field.strip())
+    unknown = [field for field in fields if field not in POEM_FIELDS]
+    if unknown:
+        raise ValueError(f"未知的导出字段：{','.join(unknown)}（可选：{','.join(POEM_FIELDS)}）")
+    return fields
+
+
+def find_offsets(text, surface):
+    """
+    原文写法在文本中的全部出现位置（起止下标，不重叠）
+    """
+    offsets = []
+    if not surface:
+        return offsets
+    start = text.find(surface)
+    while start >= 0:
+        offsets.append([start, start + len(surface)])
+        start = text.find(surface, start + len(surface))
+    return offsets
+
+
+class PoemResultWriter:
+    """
+    逐首写出分析结果的 NDJSON 文件：每行一首诗，按 chunk_size 行切分文件，
+    可选压缩；分析过程中每得到一首诗即写出，不在内存中累积
+    """
+
+    def __init__(self, output_dir, tables, theme_names, fields=DEFAULT_POEM_FIELDS,
+                 compression="none", chunk_size=50000, prefix="poems"):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"不支持的压缩方式：{compression}（可选：{','.join(COMPRESSORS)}）")
+        self.output_dir = output_dir
+        self.tables = tables
+        self.theme_names = set(theme_names)
+        self.fields = tuple(fields)
+        self.compression = compression
+        self.chunk_size = max(int(chunk_size), 1)
+        self.prefix = prefix
+        self.files = []
+        self.count = 0
+        self._handle = None
+        self._chunk_count = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _chunk_filename(self, index):
+        suffix = COMPRESSORS[self.compression][1]
+        return f"{self.prefix}-{index:05d}.ndjson{suffix}"
+
+    def _open_chunk(self):
+        opener = COMPRESSORS[self.compression][0]
+        filename = self._chunk_filename(len(self.files))
+        self._handle = opener(os.path.join(self.output_dir, filename), "wt", encoding="utf-8")
+        self.files.append({"文件": filename, "诗数": 0})
+        self._chunk_count = 0
+
+    def _close_chunk(self):
+        if self._handle is not None:
+            self._handle.close()
+            self.files[-1]["诗数"] = self._chunk_count
+            self._handle = None
+
+    def project(self, record):
+        """
+        按所选字段把 PoemRecord 投影为导出字典
+        """
+        tables = self.tables
+        row = {}
+        if "ids" in self.fields:
+            row["order"] = record.order
+            row["title"] = record.title
+            row["author"] = tables.authors.name(record.author_id)
+            row["author_id"] = record.author_id
+            row["dynasty"] = tables.dynasties.name(record.dynasty_id)
+            row["source_path"] = record.source_path
+        if "entities" in self.fields:
+            title = record.title or ""
+            content = record.content or ""
+            entities = []
+            for mention in record.mentions:
+                entity = tables.mention_to_dict(mention)
+                entity["地名ID"] = mention.place_id
+                # 位置：[原文写法, 所在字段, 起, 止]
+                entity["位置"] = [
+                    [surface, field, start, end]
+                    for surface in mention.surfaces
+                    for field, text in (("title", title), ("content", content))
+                    for start, end in find_offsets(text, surface)
+                ]
+                entities.append(entity)
+            row["geo_entities"] = entities
+        dimensions = record.dimensions or {}
+        if "sentiment" in self.fields:
+            sentiment = record.sentiment_dict()
+            sentiment["情感维度"] = {
+                key: value for key, value in dimensions.items() if key not in self.theme_names
+            }
+            row["sentiment"] = sentiment
+        if "themes" in self.fields:
+            row["themes"] = {
+                key: value for key, value in dimensions.items() if key in self.theme_names
+            }
+        if "content" in self.fields:
+            row["content"] = record.content
+        return row
+
+    def write(self, record):
+        if self._handle is None or self._chunk_count >= self.chunk_size:
+            self._close_chunk()
+            self._open_chunk()
+        self._handle.write(json.dumps(self.project(record), ensure_ascii=False))
+        self._handle.write("\n")
+        self._chunk_count += 1
+        self.count += 1
+
+    def resume(self, records):
+        """
+        从检查点续写：records 为检查点中已分析的全部逐诗结果（按顺序）。
+        之前的分块保留；最后一个分块中断时可能未写完或未关闭，按 records 重写
+        """
+        kept_chunks = max(len(records) - 1, 0) // self.chunk_size
+        self.files = [
+            {"文件": self._chunk_filename(index), "诗数": self.chunk_size}
+            for index in range(kept_chunks)
+        ]
+        self.count = kept_chunks * self.chunk_size
+        for record in records[self.count:]:
+            self.write(record)
+
+    def close(self):
+        """
+        关闭当前分块并写出清单 manifest.json
+        """
+        self._close_chunk()
+        manifest = {
+            "字段": list(self.fields),
+            "压缩": self.compression,
+            "每块诗数": self.chunk_size,
+            "总诗数": self.count,
+            "文件": self.files
+        }
+        with open(os.path.join(self.output_dir, f"{self.prefix}_manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def iter_poem_results(output_dir, prefix="poems"):
+    """
+    按清单顺序逐行读取导出的逐诗结果
+    """
+    with open(os.path.join(output_dir, f"{prefix}_manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    opener, _ = COMPRESSORS[manifest["压缩"]]
+    for entry in manifest["文件"]:
+        with opener(os.path.join(output_dir, entry["文件"]), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
@@ -1,118 +1,288 @@
 import os
+import copy
 import json
 import re
 import random
-import jieba
-import jieba.posseg as pseg
-import jieba.analyse as jieba_analyse
-from snownlp import SnowNLP
-from collections import defaultdict, Counter
-from tqdm import tqdm
+import argparse
+from collections import defaultdict
+
+from analysis_checkpoint import (
+    CHECKPOINT_DIR,
+    DEFAULT_CHECKPOINT_EVERY,
+    DEFAULT_CHECKPOINT_MINUTES,
+    AnalysisCheckpoint,
+    run_key,
+)
+from analyzer_snapshot import (
+    GEO_WORD_TAG,
+    SNAPSHOT_PATH,
+    export_jieba_state,
+    load_snapshot,
+    restore_jieba_state,
+    save_snapshot,
+    snapshot_key,
+    write_jieba_userdict,
+)
+from classical_segmenter import ClassicalSegmenter, build_lexicon
+from geo_cube import GeoCube
+from geo_extraction import (
+    DEFAULT_AUDIT_EVERY,
+    DEFAULT_TIER,
+    EXTRACTION_TIERS,
+    TIER_PASSES,
+    TierRecallReport,
+    split_lines,
+)
+from geo_matrix import IncidenceBuilder
+from geo_reextract import EXTRACTION_STATE_PATH, save_extraction_state
+from geo_network import build_place_network, build_poet_network
+from geo_sketch import GeoSketch
+from memory_profile import MEMORY_REPORT_PATH, MemoryProfiler
+from poem_dedup import THRESHOLD as DEDUP_THRESHOLD, NearDuplicateFilter
+from poem_export import COMPRESSORS, PoemResultWriter, parse_fields
+from poetry_datasets import InputCursor, iter_dataset_files, poem_content, resolve_datasets
+from poetry_db import DB_PATH, export_sqlite
+from poetry_interning import (
+    NO_ID,
+    SENTIMENT_LABELS,
+    SENTIMENT_LABEL_IDS,
+    AuthorTrajectory,
+    GeoMention,
+    PoemRecord,
+    PoetryTables,
+)
+from poetry_lexicon import (
+    BASE_DIR,
+    EXCLUDED_NAMES,
+    SENTIMENT_DICTIONARY,
+    THEME_KEYWORDS,
+    load_author_profiles,
+    load_geo_coordinates,
+    load_geo_entities,
+)
+from poetry_pipeline import DEFAULT_BATCH_SIZE, run_pipeline
+from preview_snapshots import DEFAULT_PREVIEW_EVERY, PREVIEW_DIR, PreviewWriter
+from spill_store import SpillStore
+
+NETWORK_OUTPUTS = {"place_network.json", "poet_network.json"}
+TOKENIZERS = ("jieba", "classical")
+# adaptive 分级检查结巴 ns 词的最大长度
+MAX_NS_WORD = 4
+
+
+# jieba、SnowNLP 与 tqdm 导入较慢（SnowNLP 约 1 秒），只在用到的阶段才导入
+def _jieba():
+    import jieba
+    return jieba
+
+
+def _pseg():
+    import jieba.posseg
+    return jieba.posseg
+
+
+def _jieba_analyse():
+    import jieba.analyse
+    return jieba.analyse
+
+
+def _snownlp(text):
+    from snownlp import SnowNLP
+    return SnowNLP(text)
+
+
+def _snownlp_word_sentiment(words):
+    """
+    用 SnowNLP 的情感分类器给已分好的词打分（与 SnowNLP(text).sentiments 相同，只是跳过其内置分词）
+    """
+    from snownlp import normal, sentiment
+    label, prob = sentiment.classifier.classifier.classify(normal.filter_stop(words))
+    return prob if label == "pos" else 1 - prob
+
+
+def _tqdm(iterable, **kwargs):
+    from tqdm import tqdm
+    return tqdm(iterable, **kwargs)
+
+
+def make_poem_record(tables, order, poem, content, mentions, sentiment_details):
+    """
+    由 analyze_poem 的结果生成第 order 首诗的 PoemRecord（作者、朝代登记到 tables）
+    """
+    return PoemRecord(
+        order=order,
+        title=poem.get("title", "未知"),
+        author_id=tables.intern_author(poem.get("author", "未知")),
+        dynasty_id=tables.intern_dynasty(poem.get("dynasty")),
+        mentions=mentions,
+        score=sentiment_details["基础得分"],
+        label_id=SENTIMENT_LABEL_IDS[sentiment_details["情感类型"]],
+        dimensions=sentiment_details["情感维度"],
+        content=content,
+        source_path=poem.get("source_path")
+    )
+
+
+class PoemCollection:
+    """
+    按顺序接收逐首分析结果，累积逐诗记录、作者提及与地名关联矩阵；
+    analyze_poetry_collection 与流水线（poetry_pipeline）共用
+    """
+
+    def __init__(self, analyzer, memory_budget_mb=None, spill_dir=None, poem_writer=None):
+        self.analyzer = analyzer
+        self.poem_writer = poem_writer
+        self.results = []
+        self.author_mentions = defaultdict(list)
+        self.incidence = IncidenceBuilder()
+        self.store = SpillStore(int(memory_budget_mb * 1024 * 1024), spill_dir) if memory_budget_mb else None
+        self.count = 0
+
+    def add(self, poem, content, mentions, sentiment_details):
+        author = poem.get("author", "未知")
+        record = make_poem_record(self.analyzer.tables, self.count, poem, content, mentions, sentiment_details)
+        self.count += 1
+        self.incidence.add(record)
+        if self.poem_writer is not None:
+            self.poem_writer.write(record)
+
+        if self.store is not None:
+            self.store.add(record, bool(author))
+        else:
+            self.results.append(record)
+            if author and mentions:
+                self.author_mentions[record.author_id].append(record)
+        return record
+
+    def restore(self, records):
+        """
+        载入检查点中的逐诗结果（不重复导出），关联矩阵与作者提及按原顺序重建
+        """
+        for record in records:
+            self.count += 1
+            self.incidence.add(record)
+            self.results.append(record)
+            if record.author_id != NO_ID and record.mentions:
+                self.author_mentions[record.author_id].append(record)
+
+    def preview_outputs(self):
+        """
+        由当前累积的关联矩阵与作者提及生成阶段性汇总（geo_stats、sentiment_trend、poet_paths）；
+        不提取关键词、不计算网络，代价与已分析的诗数成线性。内存预算模式下作者提及已溢写，诗人轨迹为空
+        """
+        analyzer = self.analyzer
+        incidence = self.incidence.build(analyzer.tables)
+        geo_stats, sentiment_trend, keyword_clouds = aggregate_geo_statistics(
+            self.results, analyzer.geo_coordinates, analyzer.tables, incidence, with_keywords=False
+        )
+        trajectories = analyzer.build_author_trajectories(self.author_mentions)
+        return {
+            "geo_stats.json": geo_stats,
+            "sentiment_trend.json": sentiment_trend,
+            "keyword_clouds.json": keyword_clouds,
+            "poet_paths.json": build_poet_paths(
+                analyzer.export_author_trajectories(trajectories), analyzer.geo_coordinates
+            )
+        }
+
+    def finish(self):
+        analysis_results, author_mentions = self.results, self.author_mentions
+        if self.store is not None:
+            analysis_results, author_mentions = self.store.finish()
+
+        return {
+            "poems": analysis_results,
+            "author_mentions": author_mentions,
+            "author_trajectories": self.analyzer.build_author_trajectories(author_mentions),
+            "incidence": self.incidence.build(self.analyzer.tables),
+            "tables": self.analyzer.tables,
+            "spill_store": self.store
+        }
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-EXCLUDED_NAMES = {"千山","江山","山林","青山", "四海", "江湖", "山川","山河","西山","东山","天下", "九州", "五湖", "六合", "八荒", "九域", "四方", "宇内", "寰中", "江表", "河朔", "塞北", "岭南", "漠北", "中原", "南疆", "北疆", "关内", "关外", "河东", "河西", "山南", "山北", "淮左", "淮右", "山水", "四面山", "山河大地", "山阜", "峽山", "峡山", "河明", "浮川", "居海", "如海", "福海", "海陽", "海國", "海霧江", "湖江", "北湖", "青草湖", "柳邊湖", "明河", "陂湖", "好山", "山開南國", "莫指雲山", "中峰", "中台", "陽洲", "花洲", "四海九州"}
 
 class PoetryAnalyzer:
-    def __init__(self):
-        # 加载地理名词词典
-        self.geo_entities, self.geo_alias_map = self._load_geo_entities()
-        self.geo_patterns = self._build_geo_patterns()
-        self.geo_coordinates = self._load_geo_coordinates()
-        
-        # 情感词典（多维度）
-        self.sentiment_dict = self._build_sentiment_dictionary()
-        
-        # 诗歌主题关键词
-        self.theme_keywords = self._build_theme_keywords()
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, rebuild=False, extraction_tier=DEFAULT_TIER, audit_every=0,
+                 tokenizer="jieba"):
+        """
+        已构建的词典、匹配表与结巴前缀词典（含地名用户词典）保存在 snapshot_path 中，
+        输入文件未变时直接载入；snapshot_path 为 None 时不读写快照，rebuild 强制重建。
+        extraction_tier 为地名提取分级（见 geo_extraction.EXTRACTION_TIERS）；
+        audit_every > 0 时每隔 audit_every 首诗运行全部分级，统计相对 full 的召回率（self.tier_report）。
+        tokenizer 为 "classical" 时，地名分词、情感打分与关键词提取都改用 ClassicalSegmenter
+        """
+        if extraction_tier not in TIER_PASSES:
+            raise ValueError(f"未知的提取分级：{extraction_tier}（可选：{','.join(EXTRACTION_TIERS)}）")
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"未知的分词器：{tokenizer}（可选：{','.join(TOKENIZERS)}）")
+        self.extraction_tier = extraction_tier
+        self.tier_report = TierRecallReport(audit_every) if audit_every else None
+        self.tokenizer = tokenizer
+
+        key = snapshot_key() if snapshot_path else None
+        snapshot = load_snapshot(snapshot_path, key) if snapshot_path and not rebuild else None
+        if snapshot is not None:
+            restore_jieba_state(snapshot["jieba"])
+            self.__dict__.update(snapshot["state"])
+        else:
+            state = self._build_state()
+            self.__dict__.update(state)
+            jieba_state = self._register_geo_words(export=bool(snapshot_path))
+            if snapshot_path:
+                save_snapshot(state, jieba_state, snapshot_path, key)
 
-        # 作者资料
-        self.author_profiles = self._load_author_profiles()
+        self.segmenter = None
+        if tokenizer == "classical":
+            self.segmenter = ClassicalSegmenter(build_lexicon(self.geo_alias_map, self.author_profiles))
 
-    def _load_geo_entities(self):
+    def _posseg(self, text):
         """
-        从 data/geo_entities.json 加载地理词典，如果不存在则使用内置基础词表
+        带词性分词：结巴 posseg 或古汉语最大匹配分词
         """
-        default_entities = {
-            "长安": {
-                "type": "城市",
-                "aliases": ["京兆", "镐京", "大兴城"],
-                "modern_name": "西安"
-            },
-            "洛阳": {
-                "type": "城市",
-                "aliases": ["东都"],
-                "modern_name": "洛阳"
-            },
-            "会稽山": {
-                "type": "山脉",
-                "aliases": ["会稽"],
-                "modern_name": "浙江绍兴会稽山"
-            },
-            "洞庭湖": {
-                "type": "湖泊",
-                "aliases": ["洞庭", "八百里洞庭"],
-                "modern_name": "湖南岳阳洞庭湖"
-            },
-            "黄河": {
-                "type": "河流",
-                "aliases": ["河", "大河"],
-                "modern_name": "黄河"
-            },
-            "长江": {
-                "type": "河流",
-                "aliases": ["江", "大江", "扬子江"],
-                "modern_name": "长江"
-            },
-            "巴蜀": {
-                "type": "地区",
-                "aliases": ["蜀中", "成都府"],
-                "modern_name": "四川盆地"
-            },
-            "江南": {
-                "type": "地区",
-                "aliases": ["吴地", "三吴", "江东"],
-                "modern_name": "长江中下游南岸"
-            },
-            "潼关": {
-                "type": "关隘",
-                "aliases": ["潼闕"],
-                "modern_name": "陕西潼关县"
-            },
-            "终南山": {
-                "type": "山脉",
-                "aliases": ["太乙山"],
-                "modern_name": "陕西西安终南山"
-            }
+        if self.segmenter is not None:
+            return self.segmenter.posseg(text)
+        return _pseg().cut(text)
+
+    def _build_state(self):
+        """
+        从词典文件构建分析器状态（即快照内容）
+        """
+        # 加载地理名词词典
+        geo_entities, geo_alias_map = self._load_geo_entities()
+        tables = PoetryTables.from_geo_entities(geo_entities)
+        alias_place_ids = {
+            alias: tables.places.intern(info["canonical"], info["type"], info["modern_name"])
+            for alias, info in geo_alias_map.items()
+        }
+        return {
+            "geo_entities": geo_entities,
+            "geo_alias_map": geo_alias_map,
+            "tables": tables,
+            "alias_place_ids": alias_place_ids,
+            "geo_patterns": self._build_geo_patterns(),
+            "geo_coordinates": self._load_geo_coordinates(),
+            # 情感词典（多维度）
+            "sentiment_dict": self._build_sentiment_dictionary(),
+            # 诗歌主题关键词
+            "theme_keywords": self._build_theme_keywords(),
+            # 作者资料
+            "author_profiles": self._load_author_profiles()
         }
 
-        path = os.path.join(DATA_DIR, "geo_entities.json")
-        entities = default_entities
-
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    loaded = json.load(f)
-                    if isinstance(loaded, dict):
-                        entities = loaded
-            except Exception as exc:
-                print(f"读取地理词典失败，使用内置词表。错误：{exc}")
-
-        alias_map = {}
-        for canonical, info in entities.items():
-            alias_map[canonical] = {
-                "canonical": canonical,
-                "type": info.get("type", "未知"),
-                "modern_name": info.get("modern_name", canonical)
-            }
-            for alias in info.get("aliases", []):
-                alias_map[alias] = {
-                    "canonical": canonical,
-                    "type": info.get("type", "未知"),
-                    "modern_name": info.get("modern_name", canonical)
-                }
+    def _register_geo_words(self, export=True):
+        """
+        把地理词典（含别名）作为 ns 词登记到结巴，使分词能整体切出并标注地名；
+        export 时返回结巴状态供快照保存
+        """
+        _jieba().load_userdict(write_jieba_userdict(self.geo_alias_map))
+        if export:
+            return export_jieba_state({name: GEO_WORD_TAG for name in self.geo_alias_map if name})
+        return None
 
-        return entities, alias_map
+    def _load_geo_entities(self):
+        """
+        从 data/geo_entities.json 加载地理词典，如果不存在则使用内置基础词表
+        """
+        return load_geo_entities()
 
     def _build_geo_patterns(self):
         """
@@ -126,248 +296,154 @@ class PoetryAnalyzer:
         """
         加载地理坐标信息，返回名称到经纬度的映射
         """
-        default_coords = {
-            "长安": {"lat": 34.3416, "lng": 108.9398},
-            "洛阳": {"lat": 34.6167, "lng": 112.4537},
-            "扬州": {"lat": 32.3942, "lng": 119.4127},
-            "苏州": {"lat": 31.2989, "lng": 120.5853},
-            "杭州": {"lat": 30.2741, "lng": 120.1551},
-            "成都": {"lat": 30.5728, "lng": 104.0668},
-            "重庆": {"lat": 29.563, "lng": 106.5516},
-            "南京": {"lat": 32.0603, "lng": 118.7969},
-            "北京": {"lat": 39.9042, "lng": 116.4074},
-            "潼关": {"lat": 34.5442, "lng": 110.2467},
-            "终南山": {"lat": 34.0165, "lng": 108.7514},
-            "华山": {"lat": 34.4826, "lng": 110.1001},
-            "泰山": {"lat": 36.2699, "lng": 117.1046},
-            "衡山": {"lat": 27.2503, "lng": 112.7083},
-            "嵩山": {"lat": 34.5123, "lng": 112.9403},
-            "会稽山": {"lat": 30.04, "lng": 120.64},
-            "庐山": {"lat": 29.5649, "lng": 115.9859},
-            "长江": {"lat": 30.6, "lng": 114.0},
-            "黄河": {"lat": 35.0, "lng": 111.0},
-            "洞庭湖": {"lat": 29.22, "lng": 112.88},
-            "太湖": {"lat": 31.15, "lng": 120.1},
-            "鄱阳湖": {"lat": 29.0833, "lng": 116.2333},
-            "青海湖": {"lat": 36.8833, "lng": 99.1},
-            "江南": {"lat": 31.0, "lng": 118.0},
-            "关中": {"lat": 34.2667, "lng": 108.9},
-            "巴蜀": {"lat": 30.6667, "lng": 103.9667},
-            "岭南": {"lat": 23.1291, "lng": 113.2644},
-            "襄阳": {"lat": 32.0089, "lng": 112.1229},
-            "荆州": {"lat": 30.3527, "lng": 112.19},
-            "长沙": {"lat": 28.2282, "lng": 112.9388},
-            "桂林": {"lat": 25.2736, "lng": 110.29},
-            "泉州": {"lat": 24.8741, "lng": 118.6759},
-            "广州": {"lat": 23.1291, "lng": 113.2644},
-            "福州": {"lat": 26.0745, "lng": 119.2965},
-            "开封": {"lat": 34.7973, "lng": 114.3076},
-            "太原": {"lat": 37.8706, "lng": 112.5489},
-            "玉门关": {"lat": 40.35, "lng": 94.87},
-            "嘉峪关": {"lat": 39.802, "lng": 98.294},
-            "雁门关": {"lat": 39.2284, "lng": 112.8939},
-            "兰亭": {"lat": 29.997, "lng": 120.582},
-            "桃花源": {"lat": 28.9025, "lng": 110.9429},
-            "岳阳楼": {"lat": 29.3746, "lng": 113.0975},
-            "石鼓": {"lat": 26.9018, "lng": 112.614},
-            "宣州": {"lat": 30.9449, "lng": 118.7587},
-            "池州": {"lat": 30.664, "lng": 117.4914},
-            "建昌": {"lat": 27.9187, "lng": 116.3318},
-            "齐云山": {"lat": 29.7844, "lng": 117.7937},
-            "泗州": {"lat": 33.483, "lng": 118.7034},
-            "奉节": {"lat": 31.0185, "lng": 109.4648},
-            "庐陵": {"lat": 27.11, "lng": 114.98},
-            "眉山": {"lat": 30.075, "lng": 103.85},
-            "济南": {"lat": 36.6512, "lng": 117.1201},
-            "夔州": {"lat": 31.05, "lng": 109.6333},
-            "惠州": {"lat": 23.1115, "lng": 114.4158},
-            "鄱阳": {"lat": 29.0, "lng": 116.667},
-            "上饶": {"lat": 28.4546, "lng": 117.9434},
-            "金华": {"lat": 29.0792, "lng": 119.6474}
-        }
-
-        path = os.path.join(DATA_DIR, "geo_coordinates.json")
-        coords = default_coords
-
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    loaded = json.load(f)
-                    if isinstance(loaded, dict):
-                        coords = loaded
-            except Exception as exc:
-                print(f"读取坐标文件失败，使用默认坐标。错误：{exc}")
-
-        return coords
+        return load_geo_coordinates()
 
     def _load_author_profiles(self):
         """
         加载作者资料，包含籍贯与主要行迹
         """
-        default_profiles = {
-            "李白": {
-                "籍贯": "绵州昌隆县（今四川江油）",
-                "主要行迹": [
-                    {"地点": "长安", "时期": "开元二十三年"},
-                    {"地点": "扬州", "时期": "天宝三载"},
-                    {"地点": "庐山", "时期": "天宝十四载"}
-                ]
-            },
-            "杜甫": {
-                "籍贯": "河南巩县（今河南巩义）",
-                "主要行迹": [
-                    {"地点": "长安", "时期": "开元二十九年"},
-                    {"地点": "奉节", "时期": "广德二年"},
-                    {"地点": "成都", "时期": "宝应元年"}
-                ]
-            }
-        }
-
-        path = os.path.join(DATA_DIR, "author_profiles.json")
-        profiles = default_profiles
-
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    loaded = json.load(f)
-                    if isinstance(loaded, dict):
-                        profiles = loaded
-            except Exception as exc:
-                print(f"读取作者资料失败，使用内置资料。错误：{exc}")
-
-        return profiles
+        return load_author_profiles()
 
     def _build_sentiment_dictionary(self):
         """
         构建多维度、更细致的情感词典
         """
-        return {
-            # 豪放词
-            '豪放': {
-                'keywords': ['壮志', '豪情', '激昂', '雄心', '豪迈', '气吞万里', '气势磅礴', '英雄', '慷慨'],
-                'score': 0.8
-            },
-            
-            # 婉约词
-            '婉约': {
-                'keywords': ['柔情', '细腻', '温柔', '轻盈', '娇羞', '纤细', '温婉', '含蓄', '委婉'],
-                'score': 0.6
-            },
-            
-            # 忧愁词
-            '忧愁': {
-                'keywords': ['哀愁', '悲伤', '惆怅', '凄凉', '寂寞', '孤独', '伤感', '悲凉', '萧瑟'],
-                'score': 0.2
-            },
-            
-            # 积极词
-            '积极': {
-                'keywords': ['希望', '光明', '美好', '温暖', '快乐', '喜悦', '激动', '振奋', '欢欣'],
-                'score': 0.9
-            },
-            
-            # 消极词
-            '消极': {
-                'keywords': ['绝望', '黑暗', '痛苦', '悲观', '失落', '压抑', '无助', '哀叹', '绝望'],
-                'score': 0.1
-            }
-        }
+        return copy.deepcopy(SENTIMENT_DICTIONARY)
 
     def _build_theme_keywords(self):
         """
         构建诗歌主题关键词
         """
-        return {
-            '战争': ['战', '战地', '战亡', '征', '破', '军', '兵', '将'],
-            '自然': ['山', '水', '云', '雨', '雪', '风', '月', '天', '地'],
-            '季节': ['春', '夏', '秋', '冬', '初春', '初夏', '晚秋'],
-            '情感': ['思', '怀', '志', '感', '意', '心', '情'],
-            '历史': ['汉', '唐', '宋', '志', '续', '古', '今']
-        }
+        return copy.deepcopy(THEME_KEYWORDS)
 
-    def _normalize_geo_name(self, name):
+    def _place_key(self, name):
         """
-        地名标准化，返回统一信息
+        候选地名的键：词典内或已登记的地名为地名表 ID，其余为名称本身，
+        保留时才登记（见 _kept_places），被排除的候选因此不占用 ID
         """
-        info = self.geo_alias_map.get(name)
-        if info:
-            return {
-                "名称": info["canonical"],
-                "类型": info.get("type", "未知"),
-                "现代对应": info.get("modern_name", info["canonical"]),
-                "原文名称": name
-            }
-        return {
-            "名称": name,
-            "类型": "未知",
-            "现代对应": name,
-            "原文名称": name
-        }
+        place_id = self.alias_place_ids.get(name)
+        if place_id is None:
+            place_id = self.tables.places.lookup(name)
+        return name if place_id is None else place_id
 
-    def extract_geo_entities(self, text, title=""):
+    def _key_name(self, key):
+        return key if isinstance(key, str) else self.tables.places.name(key)
+
+    def extract_geo_mentions(self, text, title="", tier=None):
         """
-        提取地理实体（增强版）
+        提取地理实体，返回 GeoMention 列表（地名以 ID 表示）；tier 默认为 self.extraction_tier
         """
         # 合并文本和标题
         content = text if isinstance(text, str) else "".join(text)
         full_text = f"{title} {content}"
+        tier = tier or self.extraction_tier
+
+        report = self.tier_report
+        if report is not None and report.should_sample():
+            found_by_tier = {}
 
-        entities = {}
+            def extract(audited_tier):
+                found_by_tier[audited_tier] = self._find_places(full_text, audited_tier)
+                # 按名称比较，抽检其他分级时不登记地名
+                names = (self._key_name(key) for key in found_by_tier[audited_tier])
+                return {name for name in names if name not in EXCLUDED_NAMES}
+
+            report.audit(extract)
+            found = found_by_tier[tier]
+        else:
+            found = self._find_places(full_text, tier)
+
+        return [
+            GeoMention(place_id, tuple(sorted(surfaces)))
+            for place_id, surfaces in self._kept_places(found).items()
+        ]
+
+    def _kept_places(self, found):
+        """
+        去掉 EXCLUDED_NAMES，按出现顺序登记词典外地名（“未知”类型），返回 place_id -> 原文写法集合。
+        流水线主进程按同样顺序登记工作进程返回的名称，两条路径的地名 ID 因此相同
+        """
+        places = self.tables.places
+        kept = {}
+        for key, surfaces in found.items():
+            if self._key_name(key) in EXCLUDED_NAMES:
+                continue
+            place_id = places.intern(key) if isinstance(key, str) else key
+            kept.setdefault(place_id, set()).update(surfaces)
+        return kept
+
+    def _find_places(self, full_text, tier):
+        """
+        按分级执行各环节，返回地名键（见 _place_key）-> 原文写法集合
+        """
+        passes = TIER_PASSES[tier]
+        found = {}
 
         # 通过词典匹配（包含别名）
-        for name in self.geo_alias_map.keys():
+        for name, place_id in self.alias_place_ids.items():
             if name and name in full_text:
-                normalized = self._normalize_geo_name(name)
-                entry = entities.setdefault(
-                    normalized["名称"],
-                    {
-                        "名称": normalized["名称"],
-                        "类型": normalized["类型"],
-                        "现代对应": normalized["现代对应"],
-                        "原文出现": set()
-                    }
-                )
-                entry["原文出现"].add(normalized["原文名称"])
+                found.setdefault(place_id, set()).add(name)
 
         # 正则补充常见地名模式
-        for match in self.geo_patterns.findall(full_text):
-            normalized = self._normalize_geo_name(match)
-            entry = entities.setdefault(
-                normalized["名称"],
-                {
-                    "名称": normalized["名称"],
-                    "类型": normalized["类型"],
-                    "现代对应": normalized["现代对应"],
-                    "原文出现": set()
-                }
+        if "regex" in passes:
+            for match in self.geo_patterns.findall(full_text):
+                found.setdefault(self._place_key(match), set()).add(match)
+
+        # 结巴分词补充：full 处理全文，adaptive 只处理含词典外后缀候选的诗句
+        if "pseg" in passes:
+            segments = [full_text]
+        elif "pseg_lines" in passes:
+            segments = [line for line in split_lines(full_text) if self._has_unknown_candidate(line)]
+        else:
+            segments = []
+        for segment in segments:
+            for word, flag in self._posseg(segment):
+                if flag == "ns":
+                    found.setdefault(self._place_key(word), set()).add(word)
+
+        return found
+
+    def _has_unknown_candidate(self, line):
+        """
+        诗句中是否有词典匹配范围之外的地名候选：后缀候选（如“某某山”），或结巴词典中标为 ns 的词
+        """
+        covered = [False] * len(line)
+        for name in self.alias_place_ids:
+            if not name:
+                continue
+            start = line.find(name)
+            while start != -1:
+                covered[start:start + len(name)] = [True] * len(name)
+                start = line.find(name, start + 1)
+        if any(not covered[match.end() - 1] for match in self.geo_patterns.finditer(line)):
+            return True
+        # 古汉语分词器的 ns 词就是地理词典（已计入 covered），只需看后缀候选
+        ns_words = self._jieba_place_words() if self.segmenter is None else ()
+        for start in range(len(line)):
+            for end in range(start + 2, min(start + MAX_NS_WORD, len(line)) + 1):
+                if not covered[end - 1] and line[start:end] in ns_words:
+                    return True
+        return False
+
+    def _jieba_place_words(self):
+        """
+        结巴词典中标为 ns 的词（首次用到时从词性表生成）
+        """
+        words = self.__dict__.get("_ns_words")
+        if words is None:
+            words = self._ns_words = frozenset(
+                word for word, flag in _pseg().dt.word_tag_tab.items()
+                if flag == "ns" and 2 <= len(word) <= MAX_NS_WORD
             )
-            entry["原文出现"].add(normalized["原文名称"])
-
-        # 结巴分词补充
-        for word, flag in pseg.cut(full_text):
-            if flag == "ns":
-                normalized = self._normalize_geo_name(word)
-                entry = entities.setdefault(
-                    normalized["名称"],
-                    {
-                        "名称": normalized["名称"],
-                        "类型": normalized["类型"],
-                        "现代对应": normalized["现代对应"],
-                        "原文出现": set()
-                    }
-                )
-                entry["原文出现"].add(normalized["原文名称"])
+        return words
 
-        # 转换集合为列表
+    def extract_geo_entities(self, text, title=""):
+        """
+        提取地理实体（增强版），返回名称已还原的字典列表
+        """
         return [
-            {
-                "名称": data["名称"],
-                "类型": data["类型"],
-                "现代对应": data["现代对应"],
-                "原文出现": sorted(data["原文出现"])
-            }
-            for data in entities.values()
-            if data["名称"] not in EXCLUDED_NAMES
+            self.tables.mention_to_dict(mention)
+            for mention in self.extract_geo_mentions(text, title)
         ]
 
     def analyze_sentiment(self, text, title=""):
@@ -388,7 +464,12 @@ class PoetryAnalyzer:
         
         # 使用SnowNLP基础得分
         try:
-            base_sentiment = SnowNLP(full_text).sentiments
+            if self.segmenter is not None:
+                base_sentiment = _snownlp_word_sentiment(
+                    [word for word in self.segmenter.cut(full_text) if not word.isspace()]
+                )
+            else:
+                base_sentiment = _snownlp(full_text).sentiments
         except Exception:
             base_sentiment = 0.5
         
@@ -441,295 +522,224 @@ class PoetryAnalyzer:
         
         return sentiment_details
 
-    def analyze_poetry_collection(self, poems):
+    def analyze_poem(self, poem):
         """
-        分析诗词集合
+        分析单首诗，返回（正文, 地名提及, 情感结果）
         """
-        analysis_results = []
-        author_mentions = defaultdict(list)
-
-        for idx, poem in enumerate(tqdm(poems, desc="正在解析诗词")):
-            title = poem.get("title", "未知")
-            author = poem.get("author", "未知")
-            raw_content = poem.get("content", "")
-            content = raw_content if isinstance(raw_content, str) else "".join(raw_content)
+        title = poem.get("title", "未知")
+        content = poem_content(poem)
+        return content, self.extract_geo_mentions(content, title), self.analyze_sentiment(content, title)
 
-            geo_entities = self.extract_geo_entities(content, title)
-            sentiment_details = self.analyze_sentiment(content, title)
+    def analyze_poetry_collection(self, poems, memory_budget_mb=None, spill_dir=None, poem_writer=None,
+                                  collection=None, checkpoint=None, preview=None):
+        """
+        分析诗词集合，结果中的作者、朝代、地名均为整数 ID（见 self.tables）。
+        指定 memory_budget_mb 时启用内存预算模式：逐诗结果与作者提及序列超出预算即溢写到
+        spill_dir（默认系统临时目录），结束时外部归并；此时返回的 "spill_store" 需在导出后 close()。
+        指定 poem_writer（如 PoemResultWriter）时，每分析完一首诗即调用其 write(record)。
+        collection 为已载入检查点结果的 PoemCollection（续跑）；给定 checkpoint（AnalysisCheckpoint）时
+        按其间隔写检查点，poems 须是推进 checkpoint.cursor 的 iter_poetry_from_local。
+        给定 preview（PreviewWriter）时按其间隔写出阶段性预览（见 PoemCollection.preview_outputs）
+        """
+        if collection is None:
+            collection = PoemCollection(self, memory_budget_mb, spill_dir, poem_writer)
+        for poem in _tqdm(poems, desc="正在解析诗词", initial=collection.count):
+            collection.add(poem, *self.analyze_poem(poem))
+            if preview is not None and preview.due(collection.count):
+                preview.write(collection.preview_outputs(), collection.count)
+            if checkpoint is not None and checkpoint.due(collection.count):
+                checkpoint.save(collection.results, self.tables, self.tier_report)
+        if checkpoint is not None and collection.count > checkpoint.saved:
+            # 分析完成后不论间隔是否已到都补写剩余的诗，导出阶段中断时续跑无需重新分析
+            checkpoint.save(collection.results, self.tables, self.tier_report)
+        return collection.finish()
+
+    def summarize_approximately(self, poems, sketch=None):
+        """
+        近似统计模式：只提取地名，逐首写入 GeoSketch（提及次数、热门地名、诗人数），
+        不保留逐诗结果、不做情感分析，内存占用与语料规模无关。返回的草图可与其他分片 merge
+        """
+        sketch = sketch or GeoSketch()
+        places = self.tables.places
+        for poem in _tqdm(poems, desc="正在汇总地名（近似）"):
+            mentions = self.extract_geo_mentions(poem_content(poem), poem.get("title", "未知"))
+            author = poem.get("author")
+            sketch.add(
+                [places.name(mention.place_id) for mention in mentions],
+                author if author and author != "未知作者" else None,
+                poem.get("dynasty") or "未知"
+            )
+        return sketch
 
-            result = {
-                "title": title,
-                "author": author,
-                "geo_entities": geo_entities,
-                "sentiment": sentiment_details,
-                "content": content,
-                "dynasty": poem.get("dynasty", "未知"),
-                "source_path": poem.get("source_path")
-            }
-            analysis_results.append(result)
+    def build_author_trajectories(self, author_mentions):
+        """
+        根据诗歌出现的地名生成作者轨迹（author_id -> AuthorTrajectory）；
+        author_mentions 只需提供 items()，可以是字典或溢写段的归并结果
+        """
+        trajectories = {}
+        places = self.tables.places
 
-            if author and geo_entities:
-                author_mentions[author].append(
-                    {
-                        "title": title,
-                        "order": idx,
-                        "geo_entities": geo_entities,
-                        "dynasty": poem.get("dynasty", "未知")
-                    }
-                )
+        for author_id, records in author_mentions.items():
+            trajectory = AuthorTrajectory(author_id)
+            for record in sorted(records, key=lambda x: x.order):
+                for mention in record.mentions:
+                    if places.name(mention.place_id) in EXCLUDED_NAMES:
+                        continue
+                    trajectory.add(mention, record.title)
 
-        author_trajectories = self.build_author_trajectories(author_mentions)
+            if trajectory.place_counts:
+                trajectories[author_id] = trajectory
 
-        return {
-            "poems": analysis_results,
-            "author_trajectories": author_trajectories
-        }
+        return trajectories
 
-    def build_author_trajectories(self, author_mentions):
+    def export_author_trajectories(self, trajectories):
         """
-        根据诗歌出现的地名和作者资料生成简易轨迹
+        还原作者轨迹中的名称，并结合作者资料与坐标生成导出结构
         """
-        trajectories = {}
+        places = self.tables.places
+        exported = {}
 
-        for author, mentions in author_mentions.items():
+        for author_id, trajectory in trajectories.items():
+            author = self.tables.authors.name(author_id)
             profile = self.author_profiles.get(author, {})
-            geo_counter = Counter()
+
             occurrence_sequence = []
+            for place_id, surfaces, title in trajectory.sequence:
+                name = places.name(place_id)
+                modern_name = places.modern_name(place_id)
+                coords = self.geo_coordinates.get(name) or self.geo_coordinates.get(modern_name)
+                occurrence_sequence.append(
+                    {
+                        "地点": name,
+                        "原文出现": list(surfaces),
+                        "首次出现诗篇": title,
+                        "类型": places.type_name(place_id),
+                        "现代对应": modern_name,
+                        "经纬度": coords
+                    }
+                )
 
-            for item in sorted(mentions, key=lambda x: x["order"]):
-                for geo in item["geo_entities"]:
-                    if geo["名称"] in EXCLUDED_NAMES:
-                        continue
-                    name = geo["名称"]
-                    geo_counter[name] += 1
-                    coords = self.geo_coordinates.get(name) or self.geo_coordinates.get(geo["现代对应"])
-                    occurrence_sequence.append(
-                        {
-                            "地点": name,
-                            "原文出现": geo["原文出现"],
-                            "首次出现诗篇": item["title"],
-                            "类型": geo["类型"],
-                            "现代对应": geo["现代对应"],
-                            "经纬度": coords
-                        }
-                    )
-
-            if geo_counter:
-                profile_routes = []
-                for entry in profile.get("主要行迹", []):
-                    coords = self.geo_coordinates.get(entry.get("地点"))
-                    profile_routes.append(
-                        {
-                            "时期": entry.get("时期"),
-                            "地点": entry.get("地点"),
-                            "经纬度": coords
-                        }
-                    )
-
-                trajectories[author] = {
-                    "籍贯": profile.get("籍贯"),
-                    "主要行迹（资料）": profile_routes,
-                    "诗歌出现地统计": [
-                        {"地点": place, "出现次数": count}
-                        for place, count in geo_counter.most_common()
-                    ],
-                    "出现顺序": occurrence_sequence
-                }
+            profile_routes = []
+            for entry in profile.get("主要行迹", []):
+                coords = self.geo_coordinates.get(entry.get("地点"))
+                profile_routes.append(
+                    {
+                        "时期": entry.get("时期"),
+                        "地点": entry.get("地点"),
+                        "经纬度": coords
+                    }
+                )
 
-        return trajectories
+            exported[author] = {
+                "籍贯": profile.get("籍贯"),
+                "主要行迹（资料）": profile_routes,
+                "诗歌出现地统计": [
+                    {"地点": places.name(place_id), "出现次数": count}
+                    for place_id, count in trajectory.most_common()
+                ],
+                "出现顺序": occurrence_sequence
+            }
 
+        return exported
 
-def infer_dynasty_from_path(path):
+
+def iter_poetry_from_local(max_poems=10000, dedup=None, datasets=None, workers=None, cursor=None):
     """
-    根据文件路径推断朝代
+    逐首读取本地诗词数据（生成器）。数据集取自 chinese-poetry/loader/datas.json，
+    datasets 为数据集键列表或 "all"，默认全唐诗与宋词；文件由 workers 个进程并行解析。
+    给定 dedup（NearDuplicateFilter）时跳过与已读诗歌近重复的诗，不计入 max_poems。
+    给定 cursor（InputCursor）时从其位置开始读，并在产出每首诗前推进到该诗之后
     """
-    if not path:
-        return "未知"
-    if "全唐诗" in path:
-        return "唐"
-    if "五代" in path:
-        return "五代"
-    if "宋词" in path:
-        return "宋"
-    if "元曲" in path:
-        return "元"
-    return "未知"
+    specs = resolve_datasets(datasets)
+    for spec in specs:
+        if not spec.files():
+            print(f"警告：数据集 {spec.name} 未找到文件（{spec.path}）")
+
+    cursor = cursor or InputCursor()
+    if cursor.count >= max_poems:
+        return
+    start = cursor.file_index
+    for file_index, poems in enumerate(iter_dataset_files(specs, workers, start=start), start):
+        first = cursor.offset if file_index == start else 0
+        for offset in range(first, len(poems)):
+            poem = poems[offset]
+            cursor.file_index, cursor.offset = file_index, offset + 1
+            if dedup is not None and dedup.find_duplicate(poem["content"]) is not None:
+                continue
+            cursor.count += 1
+            yield poem
+            if cursor.count >= max_poems:
+                return
 
 
-def load_poetry_from_local(max_poems=10000):
+def load_poetry_from_local(max_poems=10000, dedup=None, datasets=None, workers=None):
     """
     从本地 JSON 文件加载诗词数据，并统一内容格式
     """
-    poems = []
-
-    poetry_folders = [
-        os.path.join(BASE_DIR, "chinese-poetry", "全唐诗"),
-        os.path.join(BASE_DIR, "chinese-poetry", "宋词")
-    ]
-
-    for folder in poetry_folders:
-        if not os.path.exists(folder):
-            print(f"警告：未找到目录 {folder}")
-            continue
-
-        for root, _, files in os.walk(folder):
-            for filename in files:
-                if filename.endswith(".json"):
-                    filepath = os.path.join(root, filename)
-                    try:
-                        with open(filepath, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-
-                        items = data if isinstance(data, list) else [data]
-
-                        for item in items:
-                            if not isinstance(item, dict):
-                                continue
-
-                            content = item.get(
-                                "content",
-                                item.get(
-                                    "text",
-                                    item.get(
-                                        "paragraphs",
-                                        item.get("poem", "")
-                                    )
-                                )
-                            )
-
-                            if isinstance(content, list):
-                                content = "".join(content)
-
-                            if content and len(content) > 10:
-                                poems.append(
-                                    {
-                                        "title": item.get("title", "未知标题"),
-                                        "author": item.get("author", "未知作者"),
-                                        "content": content,
-                                        "dynasty": item.get("dynasty")
-                                        or item.get("era")
-                                        or item.get("period")
-                                        or infer_dynasty_from_path(filepath),
-                                        "source_path": filepath
-                                    }
-                                )
-
-                                if len(poems) >= max_poems:
-                                    break
-                    except Exception as exc:
-                        print(f"读取文件错误：{filepath}")
-                        print(f"错误信息：{exc}")
-
-                if len(poems) >= max_poems:
-                    break
-            if len(poems) >= max_poems:
-                break
-
+    poems = list(iter_poetry_from_local(max_poems, dedup, datasets, workers))
     print(f"总共加载 {len(poems)} 首诗")
     return poems
 
 
-def aggregate_geo_statistics(poem_results, coordinate_map):
+def aggregate_geo_statistics(poem_results, coordinate_map, tables, incidence=None, segmenter=None,
+                             keyword_cache=None, with_keywords=True):
     """
-    汇总地理实体统计数据
+    汇总地理实体统计数据：在“诗歌 × 地名”稀疏矩阵上做向量化计数，输出时再还原名称。
+    keyword_cache 为 {地名: 关键词列表}，其中已有的地名沿用缓存，不再重新提取关键词；
+    with_keywords 为 False 时不提取关键词（返回的关键词云为空列表）
     """
-    stats = {}
-
-    for poem in poem_results:
-        dynasty = poem.get("dynasty", "未知")
-        author = poem.get("author", "未知")
-        sentiment_label = poem["sentiment"]["情感类型"]
-        base_score = poem["sentiment"]["基础得分"]
-        content = poem.get("content", "")
-
-        for geo in poem.get("geo_entities", []):
-            name = geo["名称"]
-            if name in EXCLUDED_NAMES:
-                continue
-            entry = stats.setdefault(
-                name,
-                {
-                    "名称": name,
-                    "类型": geo["类型"],
-                    "现代对应": geo["现代对应"],
-                    "总出现次数": 0,
-                    "情感统计": defaultdict(int),
-                    "出现诗人": set(),
-                    "情感分数累计": 0.0,
-                    "情感样本数": 0,
-                    "朝代统计": {},
-                    "文本集合": []
-                }
-            )
-
-            entry["总出现次数"] += 1
-            entry["情感统计"][sentiment_label] += 1
-            if author:
-                entry["出现诗人"].add(author)
-            if content:
-                entry["文本集合"].append(content)
-            entry["情感分数累计"] += base_score
-            entry["情感样本数"] += 1
-
-            dynasty_stat = entry["朝代统计"].setdefault(
-                dynasty,
-                {
-                    "出现次数": 0,
-                    "情感分数累计": 0.0,
-                    "情感样本数": 0,
-                    "情感统计": defaultdict(int)
-                }
-            )
-            dynasty_stat["出现次数"] += 1
-            dynasty_stat["情感分数累计"] += base_score
-            dynasty_stat["情感样本数"] += 1
-            dynasty_stat["情感统计"][sentiment_label] += 1
+    if incidence is None:
+        incidence = IncidenceBuilder.from_records(poem_results).build(tables)
+
+    places = tables.places
+    totals = incidence.place_totals()
+    score_sums = incidence.place_score_sums()
+    label_counts = incidence.place_label_counts()
+    dynasty_counts = incidence.place_dynasty_counts()
+    dynasty_score_sums = incidence.place_dynasty_score_sums()
+    dynasty_label_counts = incidence.place_dynasty_label_counts()
+    place_authors = incidence.place_author_counts()
+    dynasty_indptr, place_dynasties = incidence.first_seen_place_dynasties()
 
     geo_stats = []
     sentiment_trend = []
     keyword_clouds = []
 
-    for name, entry in stats.items():
-        coords = coordinate_map.get(name) or coordinate_map.get(entry["现代对应"])
-        avg_score = (
-            entry["情感分数累计"] / entry["情感样本数"]
-            if entry["情感样本数"]
-            else None
-        )
+    for place_id in incidence.first_seen_places().tolist():
+        name = places.name(place_id)
+        if name in EXCLUDED_NAMES:
+            continue
+        modern_name = places.modern_name(place_id)
+        coords = coordinate_map.get(name) or coordinate_map.get(modern_name)
+        total = int(totals[place_id])
 
         dynasty_data = []
-        for dynasty, data in entry["朝代统计"].items():
-            dynasty_avg = (
-                data["情感分数累计"] / data["情感样本数"]
-                if data["情感样本数"]
-                else None
-            )
+        for dynasty_id in place_dynasties[
+            dynasty_indptr[place_id]:dynasty_indptr[place_id + 1]
+        ].tolist():
+            count = int(dynasty_counts[place_id, dynasty_id])
             dynasty_data.append(
                 {
-                    "朝代": dynasty,
-                    "出现次数": data["出现次数"],
-                    "平均情感得分": dynasty_avg,
-                    "情感统计": dict(data["情感统计"])
+                    "朝代": tables.dynasties.name(dynasty_id),
+                    "出现次数": count,
+                    "平均情感得分": float(dynasty_score_sums[place_id, dynasty_id]) / count,
+                    "情感统计": _label_counts_to_dict(dynasty_label_counts[place_id, dynasty_id])
                 }
             )
 
-        text_corpus = "\n".join(entry["文本集合"])
-        keywords = []
-        if text_corpus.strip():
-            for word, weight in jieba_analyse.extract_tags(
-                text_corpus, topK=30, withWeight=True
-            ):
-                keywords.append({"word": word, "weight": weight})
+        author_ids = place_authors.indices[
+            place_authors.indptr[place_id]:place_authors.indptr[place_id + 1]
+        ]
 
         geo_stats.append(
             {
                 "名称": name,
-                "类型": entry["类型"],
-                "现代对应": entry["现代对应"],
-                "总出现次数": entry["总出现次数"],
-                "情感统计": dict(entry["情感统计"]),
-                "平均情感得分": avg_score,
-                "出现诗人": sorted(entry["出现诗人"]),
+                "类型": places.type_name(place_id),
+                "现代对应": modern_name,
+                "总出现次数": total,
+                "情感统计": _label_counts_to_dict(label_counts[place_id]),
+                "平均情感得分": float(score_sums[place_id]) / total,
+                "出现诗人": sorted(tables.authors.name(a) for a in author_ids.tolist()),
                 "坐标": coords,
                 "朝代统计": dynasty_data
             }
@@ -742,6 +752,11 @@ def aggregate_geo_statistics(poem_results, coordinate_map):
             }
         )
 
+        if not with_keywords:
+            continue
+        keywords = keyword_cache.get(name) if keyword_cache is not None else None
+        if keywords is None:
+            keywords = _extract_place_keywords(poem_results, incidence.place_poems(place_id), segmenter)
         keyword_clouds.append(
             {
                 "名称": name,
@@ -752,6 +767,35 @@ def aggregate_geo_statistics(poem_results, coordinate_map):
     return geo_stats, sentiment_trend, keyword_clouds
 
 
+def _extract_place_keywords(poem_results, poem_indices, segmenter=None):
+    """
+    合并提及某地名的诗歌正文，提取关键词；给定 segmenter（ClassicalSegmenter）时用其分词
+    """
+    text_corpus = "\n".join(
+        poem_results[i].content for i in poem_indices.tolist() if poem_results[i].content
+    )
+    keywords = []
+    if text_corpus.strip():
+        if segmenter is not None:
+            tags = segmenter.extract_tags(text_corpus, top_k=30)
+        else:
+            tags = _jieba_analyse().extract_tags(text_corpus, topK=30, withWeight=True)
+        for word, weight in tags:
+            keywords.append({"word": word, "weight": weight})
+    return keywords
+
+
+def _label_counts_to_dict(counts):
+    """
+    按情感类型 ID 计数的列表还原为 {情感类型: 次数}
+    """
+    return {
+        SENTIMENT_LABELS[label_id]: count
+        for label_id, count in enumerate(counts.tolist())
+        if count
+    }
+
+
 def build_poet_paths(author_trajectories, coordinate_map):
     """
     构建诗人轨迹数据
@@ -807,56 +851,465 @@ def build_poet_paths(author_trajectories, coordinate_map):
     return poet_paths
 
 
-def export_analysis_outputs(poem_results, author_trajectories, coordinate_map):
+def excluded_place_ids(tables):
+    """
+    EXCLUDED_NAMES 中已登记地名的 ID
+    """
+    return {tables.places.lookup(name) for name in EXCLUDED_NAMES} - {None}
+
+
+def write_json_outputs(outputs, output_dir):
+    """
+    把 {文件名: 数据} 逐个写成 JSON 文件
+    """
+    for filename, data in outputs.items():
+        path = os.path.join(output_dir, filename)
+        # 网络边表较长，紧凑写出
+        indent = None if filename in NETWORK_OUTPUTS else 2
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+        except Exception as exc:
+            print(f"写入 {filename} 时出错：{exc}")
+
+
+def export_analysis_outputs(poem_results, author_trajectories, coordinate_map, tables,
+                            incidence=None, author_profiles=None, segmenter=None, keyword_cache=None):
     """
-    导出分析结果到 JSON 文件
+    导出分析结果到 JSON 文件，返回 {文件名: 数据}（不含 geo_cube.npz）
     """
     output_dir = os.path.join(BASE_DIR, "output")
     os.makedirs(output_dir, exist_ok=True)
 
-    geo_stats, sentiment_trend, keyword_clouds = aggregate_geo_statistics(poem_results, coordinate_map)
+    if incidence is None:
+        incidence = IncidenceBuilder.from_records(poem_results).build(tables)
+
+    geo_stats, sentiment_trend, keyword_clouds = aggregate_geo_statistics(
+        poem_results, coordinate_map, tables, incidence, segmenter, keyword_cache
+    )
     poet_paths = build_poet_paths(author_trajectories, coordinate_map)
 
+    excluded_ids = excluded_place_ids(tables)
+    place_network = build_place_network(incidence, tables, excluded_ids)
+    poet_network = build_poet_network(incidence, tables, excluded_ids)
+
     outputs = {
         "geo_stats.json": geo_stats,
         "sentiment_trend.json": sentiment_trend,
         "keyword_clouds.json": keyword_clouds,
-        "poet_paths.json": poet_paths
+        "poet_paths.json": poet_paths,
+        "place_network.json": place_network,
+        "poet_network.json": poet_network
     }
 
-    for filename, data in outputs.items():
-        path = os.path.join(output_dir, filename)
-        try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as exc:
-            print(f"写入 {filename} 时出错：{exc}")
+    write_json_outputs(outputs, output_dir)
+
+    cube = GeoCube.from_incidence(incidence, tables, excluded_ids, author_profiles)
+    cube.save(os.path.join(output_dir, "geo_cube.npz"))
 
     print(f"已导出数据文件至 {output_dir}")
+    return outputs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="诗词地理意象与情感分析")
+    parser.add_argument("--max-poems", type=int, default=10000, help="最多分析的诗词数量")
+    parser.add_argument(
+        "--datasets",
+        help="逗号分隔的数据集键（见 chinese-poetry/loader/datas.json），all 表示全部；默认 tangsong,songci"
+    )
+    parser.add_argument("--load-workers", type=int, help="并行解析数据文件的进程数，默认 CPU 数，1 为串行")
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="流水线模式：读取、分析（进程池）与汇总导出同时进行，阶段间为有界队列；不做分级召回抽查"
+    )
+    parser.add_argument("--analyze-workers", type=int, help="流水线模式下分析诗词的进程数，默认 CPU 数")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="流水线模式下每批的诗数")
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        help="内存预算（MB）；指定后逐首流式读取，结果超出预算时溢写到磁盘"
+    )
+    parser.add_argument("--spill-dir", help="溢写目录，默认使用系统临时目录")
+    parser.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const=CHECKPOINT_DIR,
+        help="定期写检查点（逐诗结果、读取位置、去重索引），默认目录 output/cache/checkpoint；全部导出完成后删除"
+    )
+    parser.add_argument("--resume", action="store_true", help="从检查点续跑（参数须与写检查点时一致），结果与不中断运行相同")
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=DEFAULT_CHECKPOINT_EVERY,
+        help="每分析多少首诗写一次检查点"
+    )
+    parser.add_argument(
+        "--checkpoint-minutes",
+        type=float,
+        default=DEFAULT_CHECKPOINT_MINUTES,
+        help="每隔多少分钟写一次检查点（与 --checkpoint-every 先到者为准），0 为不按时间"
+    )
+    parser.add_argument(
+        "--preview",
+        nargs="?",
+        const=PREVIEW_DIR,
+        help="分析过程中定期写出阶段性预览（不含关键词与网络），visual_dashboard.py --preview 可据此生成带进度的看板；"
+             "默认目录 output/preview，完整结果导出后删除"
+    )
+    parser.add_argument(
+        "--preview-every",
+        type=int,
+        default=DEFAULT_PREVIEW_EVERY,
+        help="每分析多少首诗写一次预览"
+    )
+    parser.add_argument(
+        "--extraction-state",
+        nargs="?",
+        const=EXTRACTION_STATE_PATH,
+        help="保存提取状态（逐诗结果、符号表、候选索引与当时的词典），供 geo_reextract.py 在词典修订后只重提受影响的诗；"
+             "默认 output/cache/extraction_state.pkl"
+    )
+    parser.add_argument(
+        "--memory-profile",
+        nargs="?",
+        const=MEMORY_REPORT_PATH,
+        help="内存剖析：用 tracemalloc 在各阶段边界取快照，并估计主要数据结构的大小，"
+             "报告写到指定路径（默认 output/memory_report.json）；会明显拖慢运行"
+    )
+    parser.add_argument("--no-dedup", action="store_true", help="不做近重复去除，逐首分析所有副本")
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=DEDUP_THRESHOLD,
+        help="近重复判定的 Jaccard 相似度阈值（MinHash 估计）"
+    )
+    parser.add_argument(
+        "--export-poems",
+        nargs="?",
+        const=os.path.join(BASE_DIR, "output", "poems"),
+        help="逐首导出分析结果（NDJSON）的目录，默认 output/poems"
+    )
+    parser.add_argument(
+        "--poem-fields",
+        default="ids,entities,sentiment,themes",
+        help="逐诗导出字段，逗号分隔：ids,entities,sentiment,themes,content，或 all"
+    )
+    parser.add_argument("--compress", choices=sorted(COMPRESSORS), default="none", help="逐诗导出的压缩方式")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="逐诗导出每个文件的诗数")
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const=DB_PATH,
+        help="同时导出 SQLite 数据库（诗歌、地名、提及、朝代统计、作者轨迹），默认 output/poetry.db"
+    )
+    parser.add_argument(
+        "--approx",
+        nargs="?",
+        const=os.path.join(BASE_DIR, "output", "geo_sketch.json"),
+        help="近似统计模式：流式读取，仅输出草图汇总（含误差说明），默认 output/geo_sketch.json"
+    )
+    parser.add_argument("--sketch-out", help="近似统计模式下另存可合并的草图文件（见 geo_sketch.py）")
+    parser.add_argument("--top", type=int, default=50, help="近似统计汇总中列出的热门地名数")
+    parser.add_argument("--no-snapshot", action="store_true", help="不读写分析器快照，每次从词典文件构建")
+    parser.add_argument(
+        "--extraction-tier",
+        choices=EXTRACTION_TIERS,
+        default=DEFAULT_TIER,
+        help="地名提取分级：dict 仅词典，regex 词典+后缀正则，adaptive 仅对含词典外候选的诗句分词，full 全文分词"
+    )
+    parser.add_argument(
+        "--tokenizer",
+        choices=TOKENIZERS,
+        default="jieba",
+        help="分词器：jieba（现代汉语模型）或 classical（古汉语双向最大匹配，地名、情感、关键词各阶段通用）"
+    )
+    parser.add_argument(
+        "--audit-every",
+        type=int,
+        help=f"每隔多少首诗对比一次各分级的召回率，0 为不对比；非 full 分级默认 {DEFAULT_AUDIT_EVERY}"
+    )
+    args = parser.parse_args(argv)
+    if (args.checkpoint or args.resume) and (args.memory_budget or args.pipeline or args.approx):
+        parser.error("检查点与续跑不能与 --memory-budget、--pipeline 或 --approx 同时使用")
+    if args.preview and (args.pipeline or args.approx):
+        parser.error("--preview 不能与 --pipeline 或 --approx 同时使用")
+    if args.extraction_state and (args.memory_budget or args.approx):
+        parser.error("--extraction-state 需要完整的逐诗结果，不能与 --memory-budget 或 --approx 同时使用")
+    try:
+        parse_fields(args.poem_fields)
+    except ValueError as exc:
+        parser.error(str(exc))
+    return args
+
+
+def analyzer_options(args):
+    """
+    按命令行参数生成 PoetryAnalyzer 的构造参数（快照、地名提取分级、召回抽查与分词器）
+    """
+    audit_every = args.audit_every
+    if audit_every is None:
+        audit_every = 0 if args.extraction_tier == "full" else DEFAULT_AUDIT_EVERY
+    return {
+        "snapshot_path": None if args.no_snapshot else SNAPSHOT_PATH,
+        "extraction_tier": args.extraction_tier,
+        "audit_every": audit_every,
+        "tokenizer": args.tokenizer
+    }
 
 
-def main():
-    # 加载诗词数据
-    poems = load_poetry_from_local(max_poems=10000)
+def build_analyzer(args):
+    """
+    按命令行参数构建分析器
+    """
+    return PoetryAnalyzer(**analyzer_options(args))
 
-    if not poems:
-        print("未找到诗词数据，请确认数据集是否已下载。")
+
+def report_extraction_tiers(analyzer):
+    """
+    打印各提取分级相对 full 的召回率，并写出 output/extraction_report.json
+    """
+    report = analyzer.tier_report
+    if report is None or not report.sampled:
         return
+    print(report.format())
+    output_dir = os.path.join(BASE_DIR, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    summary = dict(report.summary(), 当前分级=analyzer.extraction_tier)
+    with open(os.path.join(output_dir, "extraction_report.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
 
-    analyzer = PoetryAnalyzer()
 
-    # 分析全部诗词
-    analysis = analyzer.analyze_poetry_collection(poems)
+def run_approximate(args, dedup):
+    """
+    近似统计模式：边读边汇总，只写出草图汇总 JSON（及可选的草图文件）
+    """
+    poems = iter_poetry_from_local(args.max_poems, dedup, args.datasets, args.load_workers)
+    analyzer = build_analyzer(args)
+    sketch = analyzer.summarize_approximately(poems)
+    report_extraction_tiers(analyzer)
+    if dedup is not None:
+        print(f"近重复去除：跳过 {dedup.skipped} 首重复诗词（{dedup.cluster_count} 个重复簇）")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.approx)), exist_ok=True)
+    with open(args.approx, "w", encoding="utf-8") as f:
+        json.dump(sketch.summary(args.top), f, ensure_ascii=False, indent=2)
+    if args.sketch_out:
+        sketch.save(args.sketch_out)
+    print(
+        f"近似统计：{sketch.poems} 首诗，{sketch.mentions.total} 次地名提及，"
+        f"草图约 {sketch.memory_bytes() / 1024 / 1024:.1f} MB，已写出 {args.approx}"
+    )
+
+
+def run_analysis_pipeline(args, analyzer, dedup, poem_writer):
+    """
+    流水线模式：边读边分析边汇总（见 poetry_pipeline），返回与 analyze_poetry_collection 相同的结构。
+    工作进程从快照构建各自的分析器，因此先在主进程构建（并写出快照）再启动进程池
+    """
+    jobs = [(spec, path) for spec in resolve_datasets(args.datasets) for path in spec.files()]
+    if not jobs:
+        print("警告：所选数据集未找到文件")
+    collection = PoemCollection(analyzer, args.memory_budget, args.spill_dir, poem_writer)
+    progress = _tqdm(None, desc="正在解析诗词（流水线）", total=args.max_poems)
+    try:
+        analysis, stats = run_pipeline(
+            jobs,
+            collection,
+            dict(analyzer_options(args), audit_every=0),
+            max_poems=args.max_poems,
+            dedup=dedup,
+            workers=args.analyze_workers,
+            batch_size=args.batch_size,
+            progress=progress
+        )
+    finally:
+        progress.close()
+    print(stats.format())
+    return analysis
+
+
+def checkpoint_options(args):
+    """
+    写入检查点键的运行参数：改变这些参数后不能从旧检查点续跑（max_poems 除外，可续跑到更大的数量）
+    """
+    return {
+        "datasets": args.datasets,
+        "dedup": None if args.no_dedup else args.dedup_threshold,
+        "analyzer": dict(analyzer_options(args), snapshot_path=None),
+        "export_poems": args.export_poems and {
+            "fields": args.poem_fields,
+            "compress": args.compress,
+            "chunk_size": args.chunk_size
+        }
+    }
+
+
+def open_checkpoint(args, analyzer, dedup):
+    """
+    创建检查点；--resume 时载入最近的检查点，恢复符号表与分级抽查统计，返回 (checkpoint, 已分析的逐诗结果)
+    """
+    checkpoint = AnalysisCheckpoint(
+        args.checkpoint or CHECKPOINT_DIR,
+        run_key(checkpoint_options(args)),
+        cursor=InputCursor(),
+        dedup=dedup,
+        every=args.checkpoint_every,
+        minutes=args.checkpoint_minutes
+    )
+    if not args.resume:
+        checkpoint.clear()
+        return checkpoint, []
+
+    loaded = checkpoint.load()
+    if loaded is None:
+        print(f"未找到检查点（{checkpoint.directory}），从头开始分析")
+        return checkpoint, []
+    state, records = loaded
+    if state["count"] > args.max_poems:
+        raise ValueError(f"检查点已分析 {state['count']} 首，超过 --max-poems {args.max_poems}")
+    analyzer.tables = state["tables"]
+    analyzer.tier_report = state["tier_report"]
+    cursor = checkpoint.cursor
+    print(f"从检查点续跑：已分析 {state['count']} 首，从第 {cursor.file_index + 1} 个文件的第 {cursor.offset + 1} 条继续")
+    return checkpoint, records
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # 全唐诗与其 error 目录、重出的诗与“句”存在大量副本，每个近重复簇只分析首次出现的一首
+    dedup = None if args.no_dedup else NearDuplicateFilter(threshold=args.dedup_threshold)
+
+    if args.approx:
+        run_approximate(args, dedup)
+        return
+
+    profiler = MemoryProfiler(enabled=bool(args.memory_profile))
+    analyzer = build_analyzer(args)
+    profiler.mark("构建分析器")
+
+    checkpoint, restored = None, []
+    if args.checkpoint or args.resume:
+        checkpoint, restored = open_checkpoint(args, analyzer, dedup)
+        dedup = checkpoint.dedup
+
+    preview = None
+    if args.preview:
+        preview = PreviewWriter(args.preview, args.preview_every, total=args.max_poems)
+        preview.clear()
+
+    poem_writer = None
+    if args.export_poems:
+        poem_writer = PoemResultWriter(
+            args.export_poems,
+            analyzer.tables,
+            analyzer.theme_keywords,
+            fields=parse_fields(args.poem_fields),
+            compression=args.compress,
+            chunk_size=args.chunk_size
+        )
+        if restored:
+            poem_writer.resume(restored)
+
+    poems = None
+    if args.pipeline:
+        analysis = run_analysis_pipeline(args, analyzer, dedup, poem_writer)
+    elif checkpoint is not None:
+        # 检查点模式逐首流式读取，读取位置随检查点保存
+        collection = PoemCollection(analyzer, poem_writer=poem_writer)
+        collection.restore(restored)
+        poems = iter_poetry_from_local(
+            args.max_poems, dedup, args.datasets, args.load_workers, checkpoint.cursor
+        )
+        analysis = analyzer.analyze_poetry_collection(
+            poems, poem_writer=poem_writer, collection=collection, checkpoint=checkpoint, preview=preview
+        )
+        print(f"检查点：本次写出 {checkpoint.saves} 次，位于 {checkpoint.directory}")
+    else:
+        # 加载诗词数据；内存预算模式下边读边分析，不在内存中保留全部原文
+        if args.memory_budget:
+            poems = iter_poetry_from_local(args.max_poems, dedup, args.datasets, args.load_workers)
+        else:
+            poems = load_poetry_from_local(args.max_poems, dedup, args.datasets, args.load_workers)
+            profiler.mark("读取诗词")
+
+        # 分析全部诗词
+        analysis = analyzer.analyze_poetry_collection(
+            poems, memory_budget_mb=args.memory_budget, spill_dir=args.spill_dir, poem_writer=poem_writer,
+            preview=preview
+        )
+    profiler.mark("分析")
+    profiler.measure_analysis(poems, analysis)
+    profiler.mark("估计数据结构")
+    if poem_writer is not None:
+        poem_writer.close()
+        print(f"已逐首导出 {poem_writer.count} 首诗的分析结果至 {args.export_poems}（{len(poem_writer.files)} 个文件）")
 
     poem_results = analysis["poems"]
-    author_trajectories = analysis["author_trajectories"]
+    store = analysis["spill_store"]
+    report_extraction_tiers(analyzer)
+    if dedup is not None:
+        print(f"近重复去除：跳过 {dedup.skipped} 首重复诗词（{dedup.cluster_count} 个重复簇）")
+    if not len(poem_results):
+        print("未找到诗词数据，请确认数据集是否已下载。")
+        if store is not None:
+            store.close()
+        profiler.stop()
+        return
+    author_trajectories = analyzer.export_author_trajectories(analysis["author_trajectories"])
 
     # 导出数据文件
-    export_analysis_outputs(poem_results, author_trajectories, analyzer.geo_coordinates)
+    outputs = export_analysis_outputs(
+        poem_results,
+        author_trajectories,
+        analyzer.geo_coordinates,
+        analyzer.tables,
+        analysis["incidence"],
+        analyzer.author_profiles,
+        analyzer.segmenter
+    )
+
+    if args.extraction_state:
+        save_extraction_state(
+            args.extraction_state, analyzer, poem_results, outputs["keyword_clouds.json"], analyzer_options(args)
+        )
+        print(f"已保存提取状态至 {args.extraction_state}")
+
+    if args.sqlite:
+        export_sqlite(
+            poem_results,
+            analysis["author_trajectories"],
+            analyzer.geo_coordinates,
+            analyzer.tables,
+            analysis["incidence"],
+            path=args.sqlite,
+            excluded_ids=excluded_place_ids(analyzer.tables)
+        )
+        print(f"已导出 SQLite 数据库至 {args.sqlite}")
+
+    profiler.mark("导出")
+    if profiler.enabled:
+        print(profiler.format())
+        profiler.save(args.memory_profile)
+        profiler.stop()
+        print(f"内存剖析报告：{args.memory_profile}")
+
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    if preview is not None:
+        print(f"阶段性预览：写出 {preview.version} 个版本，共用时 {preview.seconds:.2f} 秒；完整结果已导出，预览已删除")
+        preview.clear()
+
+    if store is not None:
+        print(f"内存预算模式：溢写 {len(store.run_paths)} 段，峰值 RSS 约 {store.peak_rss / 1024 / 1024:.1f} MB")
 
     print("=== 诗词分析示例（随机5首） ===")
     sample_display = random.sample(poem_results, min(5, len(poem_results)))
-    for result in sample_display:
+    for record in sample_display:
+        result = record.to_dict(analyzer.tables)
         print(f"标题：{result['title']}")
         print(f"作者：{result['author']}")
         print("地理实体：")
@@ -895,6 +1348,9 @@ def main():
                 )
             print("-" * 60)
 
+    if store is not None:
+        store.close()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_DIR = os.path.join(BASE_DIR, "chinese-poetry")
+REGISTRY_PATH = os.path.join(CORPUS_DIR, "loader", "datas.json")
+
+# datas.json 的读取与数据集文件列表沿用语料库自带的 loader/data_loader.py
+sys.path.append(os.path.dirname(REGISTRY_PATH))
+from data_loader import DYNASTY_CODES, dataset_files, file_dynasty, load_config  # noqa: E402
+
+# 默认只读取全唐诗（含全宋诗）与宋词，与早期版本的取数范围一致
+DEFAULT_DATASETS = ("tangsong", "songci")
+
+# datas.json 记录路径、正文字段与朝代（按文件名推断朝代的规则见 data_loader.file_dynasty），
+# 这里补充各数据集的作者与标题字段
+DATASET_META = {
+    "wudai-huajianji": {"title_keys": ("title", "rhythmic")},
+    "wudai-nantang": {"title_keys": ("title", "rhythmic")},
+    "mengzi": {"author": "孟子", "title_keys": ("chapter",)},
+    "songci": {"title_keys": ("rhythmic", "title")},
+    "youmengying": {"author": "张潮", "title": "幽梦影"},
+    "caocao": {"author": "曹操"},
+    "nalanxingde": {"author": "纳兰性德"},
+    "lunyu": {"author": "孔子弟子", "title_keys": ("chapter",)},
+    "shijing": {"title_keys": ("title",)},
+}
+
+# 数据集未登记正文字段时依次尝试
+CONTENT_KEYS = ("content", "text", "paragraphs", "para", "poem")
+TITLE_KEYS = ("title", "rhythmic", "chapter")
+MIN_CONTENT_LENGTH = 10
+
+
+class DatasetSpec:
+    """
+    一个数据集的读取方式：文件列表、正文字段、标题字段、默认作者与朝代
+    """
+    __slots__ = ("key", "name", "path", "tag", "config", "corpus_dir", "dynasty", "author", "title", "title_keys")
+
+    def __init__(self, key, config, corpus_dir=CORPUS_DIR):
+        meta = DATASET_META.get(key, {})
+        self.key = key
+        self.name = config.get("name", key)
+        self.path = os.path.join(corpus_dir, config["path"])
+        self.tag = config.get("tag")
+        self.config = config
+        self.corpus_dir = corpus_dir
+        self.dynasty = config.get("dynasty")
+        self.author = meta.get("author")
+        self.title = meta.get("title")
+        self.title_keys = meta.get("title_keys", TITLE_KEYS)
+
+    def files(self):
+        """
+        数据集包含的 JSON 文件（自然顺序）；子目录（如 全唐诗/error）与 excludes 中的文件不读取
+        """
+        return dataset_files(self.corpus_dir, self.config)
+
+    def file_dynasty(self, path):
+        return file_dynasty(path, self.config)
+
+    def adapt(self, item, file_dynasty, source_path):
+        """
+        把一条原始记录转换为统一结构；不是诗词正文的记录（如作者表）返回 None
+        """
+        content = item.get(self.tag) if self.tag else None
+        if content is None:
+            content = next((item[key] for key in CONTENT_KEYS if key in item), None)
+        if not content:
+            return None
+        if isinstance(content, list):
+            content = "".join(content)
+        if len(content) <= MIN_CONTENT_LENGTH:
+            return None
+
+        dynasty = item.get("dynasty") or item.get("era") or item.get("period") or file_dynasty
+        return {
+            "title": next((item[key] for key in self.title_keys if item.get(key)), self.title or "未知标题"),
+            "author": item.get("author") or self.author or "未知作者",
+            "content": content,
+            "dynasty": DYNASTY_CODES.get(dynasty, dynasty) or "未知",
+            "source_path": source_path
+        }
+
+
+def poem_content(poem):
+    """
+    诗歌正文统一为字符串（外部传入的诗可能是逐句列表）
+    """
+    raw_content = poem.get("content", "")
+    return raw_content if isinstance(raw_content, str) else "".join(raw_content)
+
+
+def load_registry(path=REGISTRY_PATH, corpus_dir=CORPUS_DIR):
+    """
+    读取 datas.json，返回 {数据集键: DatasetSpec}（按 id 排序）
+    """
+    datasets = load_config(path)["datasets"]
+    ordered = sorted(datasets.items(), key=lambda item: item[1].get("id", 0))
+    return {key: DatasetSpec(key, config, corpus_dir) for key, config in ordered}
+
+
+def resolve_datasets(names=None, registry=None):
+    """
+    names 为数据集键列表，"all" 表示全部，None 表示默认数据集
+    """
+    registry = registry or load_registry()
+    if names is None:
+        names = DEFAULT_DATASETS
+    elif isinstance(names, str):
+        names = [name.strip() for name in names.split(",") if name.strip()]
+    if "all" in names:
+        return list(registry.values())
+    unknown = [name for name in names if name not in registry]
+    if unknown:
+        raise ValueError(f"未知的数据集：{','.join(unknown)}（可选：{','.join(registry)}）")
+    return [registry[name] for name in names]
+
+
+class InputCursor:
+    """
+    读取位置：第 file_index 个文件（按 iter_dataset_files 的顺序）中已读过 offset 首，
+    count 为已产出（去重后）的诗数；随读取推进，可随检查点保存
+    """
+
+    def __init__(self, file_index=0, offset=0, count=0):
+        self.file_index = file_index
+        self.offset = offset
+        self.count = count
+
+    def copy(self):
+        return InputCursor(self.file_index, self.offset, self.count)
+
+
+def parse_dataset_file(job):
+    """
+    解析单个文件，返回统一结构的诗词列表（在工作进程中执行）
+    """
+    spec, path = job
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as exc:
+        print(f"读取文件错误：{path}")
+        print(f"错误信息：{exc}")
+        return []
+
+    items = data if isinstance(data, list) else [data]
+    file_dynasty = spec.file_dynasty(path)
+    poems = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        poem = spec.adapt(item, file_dynasty, path)
+        if poem is not None:
+            poems.append(poem)
+    return poems
+
+
+def iter_dataset_files(specs, workers=None, prefetch=None, start=0):
+    """
+    按数据集与文件顺序逐个产出各文件解析结果。workers > 1（默认 CPU 数）时用进程池并行解析，
+    最多预取 prefetch 个文件，消费方较慢时内存不随语料规模增长；start 为跳过的文件数（断点续跑）
+    """
+    jobs = [(spec, path) for spec in specs for path in spec.files()][start:]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield parse_dataset_file(job)
+        return
+
+    prefetch = prefetch or workers * 2
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        jobs = iter(jobs)
+        for job in jobs:
+            pending.append(pool.submit(parse_dataset_file, job))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            poems = pending.popleft().result()
+            job = next(jobs, None)
+            if job is not None:
+                pending.append(pool.submit(parse_dataset_file, job))
+            yield poems
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_poems(datasets=None, workers=None):
+    """
+    逐首产出所选数据集中的诗词（统一结构：title/author/content/dynasty/source_path）
+    """
+    for poems in iter_dataset_files(resolve_datasets(datasets), workers):
+        yield from poems
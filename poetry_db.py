@@ -0,0 +1,333 @@
+import argparse
+import json
+import os
+import sqlite3
+from contextlib import closing
+from itertools import islice
+
+from poetry_interning import SENTIMENT_LABELS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+DB_PATH = os.path.join(OUTPUT_DIR, "poetry.db")
+
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE places (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    modern_name TEXT,
+    lat REAL,
+    lng REAL
+);
+CREATE TABLE authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE dynasties (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE poems (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    author_id INTEGER,
+    dynasty_id INTEGER NOT NULL,
+    score REAL,
+    label TEXT,
+    source_path TEXT
+);
+CREATE TABLE mentions (
+    poem_id INTEGER NOT NULL,
+    place_id INTEGER NOT NULL,
+    surfaces TEXT
+);
+CREATE TABLE place_stats (
+    place_id INTEGER PRIMARY KEY,
+    total INTEGER NOT NULL,
+    mean_score REAL,
+    first_seen INTEGER NOT NULL
+);
+CREATE TABLE place_label_stats (
+    place_id INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (place_id, label)
+);
+CREATE TABLE place_dynasty_stats (
+    place_id INTEGER NOT NULL,
+    dynasty_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    mean_score REAL,
+    PRIMARY KEY (place_id, dynasty_id)
+);
+CREATE TABLE place_authors (
+    place_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (place_id, author_id)
+);
+CREATE TABLE trajectories (
+    author_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    place_id INTEGER NOT NULL,
+    surfaces TEXT,
+    title TEXT,
+    PRIMARY KEY (author_id, seq)
+);
+"""
+
+# 索引在批量写入之后再建，比边写边维护快得多
+INDEXES = """
+CREATE INDEX idx_places_name ON places (name);
+CREATE INDEX idx_places_type ON places (type);
+CREATE INDEX idx_authors_name ON authors (name);
+CREATE INDEX idx_dynasties_name ON dynasties (name);
+CREATE INDEX idx_poems_author ON poems (author_id);
+CREATE INDEX idx_poems_dynasty ON poems (dynasty_id);
+CREATE INDEX idx_mentions_place ON mentions (place_id, poem_id);
+CREATE INDEX idx_mentions_poem ON mentions (poem_id);
+CREATE INDEX idx_place_stats_total ON place_stats (total DESC);
+CREATE INDEX idx_place_dynasty_count ON place_dynasty_stats (dynasty_id, count DESC);
+CREATE INDEX idx_place_authors_author ON place_authors (author_id);
+CREATE INDEX idx_trajectories_place ON trajectories (place_id);
+"""
+
+
+def _batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(conn, sql, rows):
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+
+
+def export_sqlite(poem_results, author_trajectories, coordinate_map, tables, incidence,
+                  path=DB_PATH, excluded_ids=()):
+    """
+    把逐诗结果、地名、提及关系、朝代统计与作者轨迹批量写入规范化的 SQLite 数据库；
+    每次导出重建数据库，全部写入在同一事务内完成，写完后再建索引。
+    统计表（place_*）与 geo_stats.json 一致，不含 excluded_ids 中的泛指地名
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    places = tables.places
+    excluded = set(excluded_ids)
+
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+
+            place_rows = []
+            for place_id, name in enumerate(places):
+                modern_name = places.modern_name(place_id)
+                coords = coordinate_map.get(name) or coordinate_map.get(modern_name) or {}
+                place_rows.append(
+                    (place_id, name, places.type_name(place_id), modern_name,
+                     coords.get("lat"), coords.get("lng"))
+                )
+            _insert(conn, "INSERT INTO places VALUES (?, ?, ?, ?, ?, ?)", place_rows)
+            _insert(conn, "INSERT INTO authors VALUES (?, ?)", enumerate(tables.authors))
+            _insert(conn, "INSERT INTO dynasties VALUES (?, ?)", enumerate(tables.dynasties))
+
+            _insert(
+                conn,
+                "INSERT INTO poems VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (record.order, record.title,
+                     record.author_id if record.author_id >= 0 else None,
+                     record.dynasty_id, record.score, SENTIMENT_LABELS[record.label_id],
+                     record.source_path)
+                    for record in poem_results
+                )
+            )
+            _insert(
+                conn,
+                "INSERT INTO mentions VALUES (?, ?, ?)",
+                (
+                    (record.order, mention.place_id, ",".join(mention.surfaces))
+                    for record in poem_results
+                    for mention in record.mentions
+                )
+            )
+
+            _insert_place_stats(conn, incidence, excluded)
+
+            _insert(
+                conn,
+                "INSERT INTO trajectories VALUES (?, ?, ?, ?, ?)",
+                (
+                    (author_id, seq, place_id, ",".join(surfaces), title)
+                    for author_id, trajectory in author_trajectories.items()
+                    for seq, (place_id, surfaces, title) in enumerate(trajectory.sequence)
+                )
+            )
+
+            conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def _insert_place_stats(conn, incidence, excluded):
+    # 只在导出时用到 numpy，读取统计（load_geo_stats）的脚本不必导入
+    import numpy as np
+
+    totals = incidence.place_totals()
+    score_sums = incidence.place_score_sums()
+    label_counts = incidence.place_label_counts()
+    dynasty_counts = incidence.place_dynasty_counts()
+    dynasty_score_sums = incidence.place_dynasty_score_sums()
+    place_authors = incidence.place_author_counts().tocoo()
+
+    first_seen = [
+        place_id for place_id in incidence.first_seen_places().tolist()
+        if place_id not in excluded
+    ]
+    _insert(
+        conn,
+        "INSERT INTO place_stats VALUES (?, ?, ?, ?)",
+        (
+            (place_id, int(totals[place_id]), float(score_sums[place_id]) / int(totals[place_id]), rank)
+            for rank, place_id in enumerate(first_seen)
+        )
+    )
+
+    keep = np.zeros(len(totals), dtype=bool)
+    keep[first_seen] = True
+
+    place_ids, label_ids = np.nonzero(label_counts * keep[:, None])
+    _insert(
+        conn,
+        "INSERT INTO place_label_stats VALUES (?, ?, ?)",
+        (
+            (place_id, SENTIMENT_LABELS[label_id], int(label_counts[place_id, label_id]))
+            for place_id, label_id in zip(place_ids.tolist(), label_ids.tolist())
+        )
+    )
+
+    place_ids, dynasty_ids = np.nonzero(dynasty_counts * keep[:, None])
+    counts = dynasty_counts[place_ids, dynasty_ids]
+    means = dynasty_score_sums[place_ids, dynasty_ids] / counts
+    _insert(
+        conn,
+        "INSERT INTO place_dynasty_stats VALUES (?, ?, ?, ?)",
+        zip(place_ids.tolist(), dynasty_ids.tolist(), counts.tolist(), means.tolist())
+    )
+
+    mask = keep[place_authors.row]
+    _insert(
+        conn,
+        "INSERT INTO place_authors VALUES (?, ?, ?)",
+        zip(
+            place_authors.row[mask].tolist(),
+            place_authors.col[mask].tolist(),
+            place_authors.data[mask].tolist()
+        )
+    )
+
+
+def connect(path=DB_PATH):
+    """
+    以只读方式打开导出的数据库
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"未找到数据库文件，路径：{path}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def top_places(conn, geo_type=None, dynasty=None, limit=20):
+    """
+    热门地名：可按类型（如“湖泊”）与朝代（如“唐”）筛选，按出现次数降序；
+    返回 [{"名称", "类型", "现代对应", "出现次数", "平均情感得分"}]
+    """
+    params = []
+    if dynasty is None:
+        sql = (
+            "SELECT p.name, p.type, p.modern_name, s.total AS count, s.mean_score "
+            "FROM place_stats s JOIN places p ON p.id = s.place_id WHERE 1 = 1"
+        )
+    else:
+        sql = (
+            "SELECT p.name, p.type, p.modern_name, s.count, s.mean_score "
+            "FROM place_dynasty_stats s JOIN places p ON p.id = s.place_id "
+            "WHERE s.dynasty_id = (SELECT id FROM dynasties WHERE name = ?)"
+        )
+        params.append(dynasty)
+    if geo_type is not None:
+        sql += " AND p.type = ?"
+        params.append(geo_type)
+    sql += " ORDER BY count DESC, s.place_id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    return [
+        {
+            "名称": row["name"],
+            "类型": row["type"],
+            "现代对应": row["modern_name"],
+            "出现次数": row["count"],
+            "平均情感得分": row["mean_score"]
+        }
+        for row in conn.execute(sql, params)
+    ]
+
+
+def load_geo_stats(path=DB_PATH, json_path=None):
+    """
+    读取地名汇总（名称、类型、现代对应、总出现次数、平均情感得分），按 geo_stats.json 的顺序排列；
+    数据库不存在或比 geo_stats.json 旧（之后又有一次未加 --sqlite 的导出）时读取 geo_stats.json
+    """
+    json_path = json_path or os.path.join(os.path.dirname(path), "geo_stats.json")
+    if not os.path.exists(path) or (
+        os.path.exists(json_path) and os.path.getmtime(path) < os.path.getmtime(json_path)
+    ):
+        with open(json_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            "SELECT p.name, p.type, p.modern_name, s.total, s.mean_score "
+            "FROM place_stats s JOIN places p ON p.id = s.place_id ORDER BY s.first_seen"
+        )
+        return [
+            {
+                "名称": row["name"],
+                "类型": row["type"],
+                "现代对应": row["modern_name"],
+                "总出现次数": row["total"],
+                "平均情感得分": row["mean_score"]
+            }
+            for row in rows
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询 poetry.db 中的热门地名")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--type", dest="geo_type", help="地名类型，如 湖泊")
+    parser.add_argument("--dynasty", help="朝代，如 唐")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with closing(connect(args.db)) as conn:
+        for row in top_places(conn, args.geo_type, args.dynasty, args.limit):
+            print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import sys
+from array import array
+
+UNKNOWN = "未知"
+NO_ID = -1
+
+# 朝代表预置常见朝代，保证同一标签在不同运行之间拿到相同的 ID
+KNOWN_DYNASTIES = ["先秦", "汉", "魏晋", "南北朝", "隋", "唐", "五代", "宋", "元", "明", "清", UNKNOWN]
+
+# 情感类型与 analyze_sentiment 的判定顺序一致（由正到负）
+SENTIMENT_LABELS = ("非常正面", "中性偏正面", "中性", "中性偏负面", "非常负面")
+SENTIMENT_LABEL_IDS = {label: idx for idx, label in enumerate(SENTIMENT_LABELS)}
+
+
+class SymbolTable:
+    """
+    字符串与整数 ID 的双向映射，ID 按首次登记顺序分配
+    """
+    __slots__ = ("_ids", "_names")
+
+    def __init__(self, names=()):
+        self._ids = {}
+        self._names = []
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        idx = self._ids.get(name)
+        if idx is None:
+            name = sys.intern(name)
+            idx = len(self._names)
+            self._ids[name] = idx
+            self._names.append(name)
+        return idx
+
+    def lookup(self, name, default=None):
+        return self._ids.get(name, default)
+
+    def name(self, idx):
+        """
+        ID 还原为名称，NO_ID 还原为 None
+        """
+        if idx < 0:
+            return None
+        return self._names[idx]
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __iter__(self):
+        return iter(self._names)
+
+
+class PlaceTable(SymbolTable):
+    """
+    地名表：除名称外，按 ID 记录类型与现代对应（同样以整数 ID 存放）
+    """
+    __slots__ = ("type_table", "modern_table", "_types", "_moderns")
+
+    def __init__(self):
+        self.type_table = SymbolTable([UNKNOWN])
+        self.modern_table = SymbolTable()
+        self._types = array("i")
+        self._moderns = array("i")
+        super().__init__()
+
+    def intern(self, name, geo_type=UNKNOWN, modern_name=None):
+        idx = self._ids.get(name)
+        if idx is None:
+            idx = super().intern(name)
+            self._types.append(self.type_table.intern(geo_type or UNKNOWN))
+            self._moderns.append(self.modern_table.intern(modern_name or name))
+        return idx
+
+    def update(self, idx, geo_type=UNKNOWN, modern_name=None):
+        """
+        改写已登记地名的类型与现代对应（词典修订后沿用原 ID）
+        """
+        self._types[idx] = self.type_table.intern(geo_type or UNKNOWN)
+        self._moderns[idx] = self.modern_table.intern(modern_name or self._names[idx])
+
+    def type_name(self, idx):
+        return self.type_table.name(self._types[idx])
+
+    def modern_name(self, idx):
+        return self.modern_table.name(self._moderns[idx])
+
+
+class PoetryTables:
+    """
+    地名、作者、朝代三张符号表；地名 ID 先按地理词典顺序分配，保证稳定
+    """
+    __slots__ = ("places", "authors", "dynasties")
+
+    def __init__(self):
+        self.places = PlaceTable()
+        self.authors = SymbolTable()
+        self.dynasties = SymbolTable(KNOWN_DYNASTIES)
+
+    @classmethod
+    def from_geo_entities(cls, geo_entities):
+        tables = cls()
+        for canonical, info in geo_entities.items():
+            tables.places.intern(
+                canonical,
+                info.get("type", UNKNOWN),
+                info.get("modern_name", canonical)
+            )
+        return tables
+
+    def intern_author(self, author):
+        return self.authors.intern(author) if author else NO_ID
+
+    def intern_dynasty(self, dynasty):
+        return self.dynasties.intern(dynasty or UNKNOWN)
+
+    def mention_to_dict(self, mention):
+        pid = mention.place_id
+        return {
+            "名称": self.places.name(pid),
+            "类型": self.places.type_name(pid),
+            "现代对应": self.places.modern_name(pid),
+            "原文出现": list(mention.surfaces)
+        }
+
+
+class GeoMention:
+    """
+    单首诗中的一个地理实体：地名 ID 与原文写法
+    """
+    __slots__ = ("place_id", "surfaces")
+
+    def __init__(self, place_id, surfaces):
+        self.place_id = place_id
+        self.surfaces = surfaces
+
+
+class PoemRecord:
+    """
+    单首诗的分析结果，作者、朝代、地名、情感类型均以整数 ID 保存
+    """
+    __slots__ = (
+        "order", "title", "author_id", "dynasty_id", "mentions",
+        "score", "label_id", "dimensions", "content", "source_path"
+    )
+
+    def __init__(self, order, title, author_id, dynasty_id, mentions,
+                 score, label_id, dimensions, content, source_path):
+        self.order = order
+        self.title = title
+        self.author_id = author_id
+        self.dynasty_id = dynasty_id
+        self.mentions = mentions
+        self.score = score
+        self.label_id = label_id
+        self.dimensions = dimensions
+        self.content = content
+        self.source_path = source_path
+
+    def sentiment_dict(self):
+        return {
+            "基础得分": self.score,
+            "情感类型": SENTIMENT_LABELS[self.label_id],
+            "情感维度": self.dimensions
+        }
+
+    def to_dict(self, tables):
+        """
+        还原为导出用的字典结构
+        """
+        return {
+            "title": self.title,
+            "author": tables.authors.name(self.author_id),
+            "geo_entities": [tables.mention_to_dict(m) for m in self.mentions],
+            "sentiment": self.sentiment_dict(),
+            "content": self.content,
+            "dynasty": tables.dynasties.name(self.dynasty_id),
+            "source_path": self.source_path
+        }
+
+
+class AuthorTrajectory:
+    """
+    作者的地名出现统计与出现顺序，地名均为 ID
+    """
+    __slots__ = ("author_id", "place_counts", "sequence")
+
+    def __init__(self, author_id):
+        self.author_id = author_id
+        # place_id -> 次数
+        self.place_counts = {}
+        # (place_id, 原文写法, 首次出现诗篇)
+        self.sequence = []
+
+    def add(self, mention, title):
+        pid = mention.place_id
+        self.place_counts[pid] = self.place_counts.get(pid, 0) + 1
+        self.sequence.append((pid, mention.surfaces, title))
+
+    def most_common(self):
+        # 与 Counter.most_common 一致：次数降序，同次数保持首次出现顺序
+        return sorted(self.place_counts.items(), key=lambda item: item[1], reverse=True)
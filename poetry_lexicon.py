@@ -0,0 +1,244 @@
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+GEO_ENTITIES_PATH = os.path.join(DATA_DIR, "geo_entities.json")
+GEO_COORDINATES_PATH = os.path.join(DATA_DIR, "geo_coordinates.json")
+AUTHOR_PROFILES_PATH = os.path.join(DATA_DIR, "author_profiles.json")
+
+# 泛指或误识别的“地名”，统计与展示时一律排除
+EXCLUDED_NAMES = {"千山","江山","山林","青山", "四海", "江湖", "山川","山河","西山","东山","天下", "九州", "五湖", "六合", "八荒", "九域", "四方", "宇内", "寰中", "江表", "河朔", "塞北", "岭南", "漠北", "中原", "南疆", "北疆", "关内", "关外", "河东", "河西", "山南", "山北", "淮左", "淮右", "山水", "四面山", "山河大地", "山阜", "峽山", "峡山", "河明", "浮川", "居海", "如海", "福海", "海陽", "海國", "海霧江", "湖江", "北湖", "青草湖", "柳邊湖", "明河", "陂湖", "好山", "山開南國", "莫指雲山", "中峰", "中台", "陽洲", "花洲", "四海九州"}
+
+# data/geo_entities.json 不存在时使用的内置基础词表
+DEFAULT_GEO_ENTITIES = {
+    "长安": {
+        "type": "城市",
+        "aliases": ["京兆", "镐京", "大兴城"],
+        "modern_name": "西安"
+    },
+    "洛阳": {
+        "type": "城市",
+        "aliases": ["东都"],
+        "modern_name": "洛阳"
+    },
+    "会稽山": {
+        "type": "山脉",
+        "aliases": ["会稽"],
+        "modern_name": "浙江绍兴会稽山"
+    },
+    "洞庭湖": {
+        "type": "湖泊",
+        "aliases": ["洞庭", "八百里洞庭"],
+        "modern_name": "湖南岳阳洞庭湖"
+    },
+    "黄河": {
+        "type": "河流",
+        "aliases": ["河", "大河"],
+        "modern_name": "黄河"
+    },
+    "长江": {
+        "type": "河流",
+        "aliases": ["江", "大江", "扬子江"],
+        "modern_name": "长江"
+    },
+    "巴蜀": {
+        "type": "地区",
+        "aliases": ["蜀中", "成都府"],
+        "modern_name": "四川盆地"
+    },
+    "江南": {
+        "type": "地区",
+        "aliases": ["吴地", "三吴", "江东"],
+        "modern_name": "长江中下游南岸"
+    },
+    "潼关": {
+        "type": "关隘",
+        "aliases": ["潼闕"],
+        "modern_name": "陕西潼关县"
+    },
+    "终南山": {
+        "type": "山脉",
+        "aliases": ["太乙山"],
+        "modern_name": "陕西西安终南山"
+    }
+}
+
+# data/geo_coordinates.json 不存在时使用的默认坐标
+DEFAULT_GEO_COORDINATES = {
+    "长安": {"lat": 34.3416, "lng": 108.9398},
+    "洛阳": {"lat": 34.6167, "lng": 112.4537},
+    "扬州": {"lat": 32.3942, "lng": 119.4127},
+    "苏州": {"lat": 31.2989, "lng": 120.5853},
+    "杭州": {"lat": 30.2741, "lng": 120.1551},
+    "成都": {"lat": 30.5728, "lng": 104.0668},
+    "重庆": {"lat": 29.563, "lng": 106.5516},
+    "南京": {"lat": 32.0603, "lng": 118.7969},
+    "北京": {"lat": 39.9042, "lng": 116.4074},
+    "潼关": {"lat": 34.5442, "lng": 110.2467},
+    "终南山": {"lat": 34.0165, "lng": 108.7514},
+    "华山": {"lat": 34.4826, "lng": 110.1001},
+    "泰山": {"lat": 36.2699, "lng": 117.1046},
+    "衡山": {"lat": 27.2503, "lng": 112.7083},
+    "嵩山": {"lat": 34.5123, "lng": 112.9403},
+    "会稽山": {"lat": 30.04, "lng": 120.64},
+    "庐山": {"lat": 29.5649, "lng": 115.9859},
+    "长江": {"lat": 30.6, "lng": 114.0},
+    "黄河": {"lat": 35.0, "lng": 111.0},
+    "洞庭湖": {"lat": 29.22, "lng": 112.88},
+    "太湖": {"lat": 31.15, "lng": 120.1},
+    "鄱阳湖": {"lat": 29.0833, "lng": 116.2333},
+    "青海湖": {"lat": 36.8833, "lng": 99.1},
+    "江南": {"lat": 31.0, "lng": 118.0},
+    "关中": {"lat": 34.2667, "lng": 108.9},
+    "巴蜀": {"lat": 30.6667, "lng": 103.9667},
+    "岭南": {"lat": 23.1291, "lng": 113.2644},
+    "襄阳": {"lat": 32.0089, "lng": 112.1229},
+    "荆州": {"lat": 30.3527, "lng": 112.19},
+    "长沙": {"lat": 28.2282, "lng": 112.9388},
+    "桂林": {"lat": 25.2736, "lng": 110.29},
+    "泉州": {"lat": 24.8741, "lng": 118.6759},
+    "广州": {"lat": 23.1291, "lng": 113.2644},
+    "福州": {"lat": 26.0745, "lng": 119.2965},
+    "开封": {"lat": 34.7973, "lng": 114.3076},
+    "太原": {"lat": 37.8706, "lng": 112.5489},
+    "玉门关": {"lat": 40.35, "lng": 94.87},
+    "嘉峪关": {"lat": 39.802, "lng": 98.294},
+    "雁门关": {"lat": 39.2284, "lng": 112.8939},
+    "兰亭": {"lat": 29.997, "lng": 120.582},
+    "桃花源": {"lat": 28.9025, "lng": 110.9429},
+    "岳阳楼": {"lat": 29.3746, "lng": 113.0975},
+    "石鼓": {"lat": 26.9018, "lng": 112.614},
+    "宣州": {"lat": 30.9449, "lng": 118.7587},
+    "池州": {"lat": 30.664, "lng": 117.4914},
+    "建昌": {"lat": 27.9187, "lng": 116.3318},
+    "齐云山": {"lat": 29.7844, "lng": 117.7937},
+    "泗州": {"lat": 33.483, "lng": 118.7034},
+    "奉节": {"lat": 31.0185, "lng": 109.4648},
+    "庐陵": {"lat": 27.11, "lng": 114.98},
+    "眉山": {"lat": 30.075, "lng": 103.85},
+    "济南": {"lat": 36.6512, "lng": 117.1201},
+    "夔州": {"lat": 31.05, "lng": 109.6333},
+    "惠州": {"lat": 23.1115, "lng": 114.4158},
+    "鄱阳": {"lat": 29.0, "lng": 116.667},
+    "上饶": {"lat": 28.4546, "lng": 117.9434},
+    "金华": {"lat": 29.0792, "lng": 119.6474}
+}
+
+# data/author_profiles.json 不存在时使用的内置资料
+DEFAULT_AUTHOR_PROFILES = {
+    "李白": {
+        "籍贯": "绵州昌隆县（今四川江油）",
+        "主要行迹": [
+            {"地点": "长安", "时期": "开元二十三年"},
+            {"地点": "扬州", "时期": "天宝三载"},
+            {"地点": "庐山", "时期": "天宝十四载"}
+        ]
+    },
+    "杜甫": {
+        "籍贯": "河南巩县（今河南巩义）",
+        "主要行迹": [
+            {"地点": "长安", "时期": "开元二十九年"},
+            {"地点": "奉节", "时期": "广德二年"},
+            {"地点": "成都", "时期": "宝应元年"}
+        ]
+    }
+}
+
+# 多维度情感词典
+SENTIMENT_DICTIONARY = {
+    # 豪放词
+    '豪放': {
+        'keywords': ['壮志', '豪情', '激昂', '雄心', '豪迈', '气吞万里', '气势磅礴', '英雄', '慷慨'],
+        'score': 0.8
+    },
+    
+    # 婉约词
+    '婉约': {
+        'keywords': ['柔情', '细腻', '温柔', '轻盈', '娇羞', '纤细', '温婉', '含蓄', '委婉'],
+        'score': 0.6
+    },
+    
+    # 忧愁词
+    '忧愁': {
+        'keywords': ['哀愁', '悲伤', '惆怅', '凄凉', '寂寞', '孤独', '伤感', '悲凉', '萧瑟'],
+        'score': 0.2
+    },
+    
+    # 积极词
+    '积极': {
+        'keywords': ['希望', '光明', '美好', '温暖', '快乐', '喜悦', '激动', '振奋', '欢欣'],
+        'score': 0.9
+    },
+    
+    # 消极词
+    '消极': {
+        'keywords': ['绝望', '黑暗', '痛苦', '悲观', '失落', '压抑', '无助', '哀叹', '绝望'],
+        'score': 0.1
+    }
+}
+
+# 诗歌主题关键词
+THEME_KEYWORDS = {
+    '战争': ['战', '战地', '战亡', '征', '破', '军', '兵', '将'],
+    '自然': ['山', '水', '云', '雨', '雪', '风', '月', '天', '地'],
+    '季节': ['春', '夏', '秋', '冬', '初春', '初夏', '晚秋'],
+    '情感': ['思', '怀', '志', '感', '意', '心', '情'],
+    '历史': ['汉', '唐', '宋', '志', '续', '古', '今']
+}
+
+
+def _load_json_dict(path, default, error_message):
+    """
+    读取 JSON 对象文件；文件不存在、解析失败或不是对象时返回 default
+    """
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+                if isinstance(loaded, dict):
+                    return loaded
+        except Exception as exc:
+            print(f"{error_message}错误：{exc}")
+    return default
+
+
+def build_alias_map(entities):
+    """
+    标准名与别名 -> {canonical, type, modern_name}
+    """
+    alias_map = {}
+    for canonical, info in entities.items():
+        entry = {
+            "canonical": canonical,
+            "type": info.get("type", "未知"),
+            "modern_name": info.get("modern_name", canonical)
+        }
+        alias_map[canonical] = dict(entry)
+        for alias in info.get("aliases", []):
+            alias_map[alias] = dict(entry)
+    return alias_map
+
+
+def load_geo_entities(path=GEO_ENTITIES_PATH):
+    """
+    从 data/geo_entities.json 加载地理词典，如果不存在则使用内置基础词表；返回 (词典, 别名表)
+    """
+    entities = _load_json_dict(path, DEFAULT_GEO_ENTITIES, "读取地理词典失败，使用内置词表。")
+    return entities, build_alias_map(entities)
+
+
+def load_geo_coordinates(path=GEO_COORDINATES_PATH):
+    """
+    加载地理坐标信息，返回名称到经纬度的映射
+    """
+    return _load_json_dict(path, DEFAULT_GEO_COORDINATES, "读取坐标文件失败，使用默认坐标。")
+
+
+def load_author_profiles(path=AUTHOR_PROFILES_PATH):
+    """
+    加载作者资料，包含籍贯与主要行迹
+    """
+    return _load_json_dict(path, DEFAULT_AUTHOR_PROFILES, "读取作者资料失败，使用内置资料。")
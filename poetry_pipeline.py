@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from poetry_datasets import parse_dataset_file, poem_content
+from poetry_interning import GeoMention
+
+# 每批诗数：批次是进程间传递的单位，太小则序列化开销占比高，太大则首批结果来得慢
+DEFAULT_BATCH_SIZE = 200
+# 每个队列最多缓存的批次数；队列满时上游等待（背压），内存占用与语料规模无关
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+# 工作进程内的分析器（由 _init_worker 构建，快照存在时只需载入）
+_worker_analyzer = None
+
+
+def _init_worker(analyzer_options):
+    global _worker_analyzer
+    from poetey_analysis import PoetryAnalyzer
+
+    _worker_analyzer = PoetryAnalyzer(**analyzer_options)
+
+
+def analyze_batch(poems):
+    """
+    在工作进程中分析一批诗。词典外地名在各进程中 ID 不同，因此以名称返回，
+    由主进程按顺序重新登记；返回（[(地名提及, 情感结果)], 耗时秒数）
+    """
+    started = time.perf_counter()
+    analyzer = _worker_analyzer
+    places = analyzer.tables.places
+    results = []
+    for poem in poems:
+        _, mentions, sentiment_details = analyzer.analyze_poem(poem)
+        results.append(
+            ([(places.name(mention.place_id), mention.surfaces) for mention in mentions], sentiment_details)
+        )
+    return results, time.perf_counter() - started
+
+
+def _timed_parse(job):
+    started = time.perf_counter()
+    return parse_dataset_file(job), time.perf_counter() - started
+
+
+class PipelineStats:
+    """
+    各阶段的忙碌时间与端到端耗时；流水线充分重叠时，总耗时接近最慢阶段的耗时
+    """
+
+    def __init__(self):
+        self.poems = 0
+        self.batches = 0
+        self.load_seconds = 0.0
+        self.analyze_seconds = 0.0
+        self.collect_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def format(self):
+        stages = {"读取": self.load_seconds, "分析": self.analyze_seconds, "汇总": self.collect_seconds}
+        slowest = max(stages, key=stages.get)
+        return (
+            f"流水线：{self.poems} 首诗 / {self.batches} 批，总耗时 {self.wall_seconds:.2f} 秒；"
+            + "，".join(f"{name} {seconds:.2f} 秒" for name, seconds in stages.items())
+            + f"（最慢阶段：{slowest}）"
+        )
+
+
+async def _load_stage(jobs, load_queue, io_pool, max_poems, dedup, batch_size, stats):
+    """
+    在线程中读取、解析数据文件（预读下一个文件），去重后按批放入 load_queue
+    """
+    loop = asyncio.get_running_loop()
+    jobs = iter(jobs)
+    job = next(jobs, None)
+    pending = loop.run_in_executor(io_pool, _timed_parse, job) if job else None
+    count = 0
+    batch = []
+    while pending is not None:
+        poems, seconds = await pending
+        stats.load_seconds += seconds
+        job = next(jobs, None)
+        pending = loop.run_in_executor(io_pool, _timed_parse, job) if job else None
+
+        started = time.perf_counter()
+        for poem in poems:
+            if dedup is not None and dedup.find_duplicate(poem["content"]) is not None:
+                continue
+            batch.append(poem)
+            count += 1
+            if len(batch) >= batch_size or count >= max_poems:
+                stats.load_seconds += time.perf_counter() - started
+                await load_queue.put(batch)
+                started = time.perf_counter()
+                batch = []
+            if count >= max_poems:
+                break
+        stats.load_seconds += time.perf_counter() - started
+        if count >= max_poems:
+            break
+    if batch:
+        await load_queue.put(batch)
+    await load_queue.put(_DONE)
+
+
+async def _analyze_stage(load_queue, result_queue, process_pool):
+    """
+    把批次提交给进程池，按提交顺序把（批次, future）放入 result_queue；
+    result_queue 有界，同时在途的批次数因此受限
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await load_queue.get()
+        if batch is _DONE:
+            await result_queue.put(_DONE)
+            return
+        future = loop.run_in_executor(process_pool, analyze_batch, batch)
+        await result_queue.put((batch, future))
+
+
+async def _collect_stage(result_queue, collection, stats, progress):
+    """
+    按原顺序取回分析结果，登记地名后交给 collection（逐诗导出、溢写在此完成）
+    """
+    places = collection.analyzer.tables.places
+    while True:
+        item = await result_queue.get()
+        if item is _DONE:
+            return
+        batch, future = item
+        results, seconds = await future
+        stats.analyze_seconds += seconds
+
+        started = time.perf_counter()
+        for poem, (mentions, sentiment_details) in zip(batch, results):
+            collection.add(
+                poem,
+                poem_content(poem),
+                [GeoMention(places.intern(name), surfaces) for name, surfaces in mentions],
+                sentiment_details
+            )
+        stats.collect_seconds += time.perf_counter() - started
+        stats.poems += len(batch)
+        stats.batches += 1
+        if progress is not None:
+            progress.update(len(batch))
+
+
+async def _run(jobs, collection, analyzer_options, max_poems, dedup, workers, batch_size, queue_size,
+               progress, stats):
+    load_queue = asyncio.Queue(maxsize=queue_size)
+    result_queue = asyncio.Queue(maxsize=max(queue_size, workers * 2))
+    io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="poetry-load")
+    process_pool = ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(analyzer_options,)
+    )
+    tasks = [
+        asyncio.create_task(_load_stage(jobs, load_queue, io_pool, max_poems, dedup, batch_size, stats)),
+        asyncio.create_task(_analyze_stage(load_queue, result_queue, process_pool)),
+        asyncio.create_task(_collect_stage(result_queue, collection, stats, progress)),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        process_pool.shutdown(wait=True, cancel_futures=True)
+        io_pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_pipeline(jobs, collection, analyzer_options, max_poems=10000, dedup=None, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE, progress=None):
+    """
+    流式分析：读取（线程）→ 分析（进程池，workers 个进程）→ 汇总与逐诗导出（主进程协程），
+    阶段之间是有界队列。jobs 为 [(DatasetSpec, 文件路径)]，collection 为 PoemCollection，
+    analyzer_options 为工作进程构建 PoetryAnalyzer 的参数。返回（collection.finish() 的结果, PipelineStats）
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = PipelineStats()
+    started = time.perf_counter()
+    asyncio.run(
+        _run(jobs, collection, analyzer_options, max_poems, dedup, workers, batch_size, queue_size,
+             progress, stats)
+    )
+    analysis = collection.finish()
+    stats.wall_seconds = time.perf_counter() - started
+    return analysis, stats
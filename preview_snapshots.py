@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import time
+
+from poetry_lexicon import OUTPUT_DIR
+
+PREVIEW_DIR = os.path.join(OUTPUT_DIR, "preview")
+LATEST_FILENAME = "latest.json"
+
+# 默认每分析多少首诗写一次预览
+DEFAULT_PREVIEW_EVERY = 5000
+# 保留的预览版本数：latest.json 换到新版本后，正在读旧版本的看板仍能读完
+KEEP_VERSIONS = 3
+
+
+def _write_json(data, path, indent=None):
+    """
+    先写临时文件再替换，读者不会读到半个文件
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+
+class PreviewWriter:
+    """
+    长时间分析中的阶段性预览。每 every 首诗把当前汇总写到新的版本目录（v00001、v00002……），
+    全部文件写完后才原子地改写 latest.json 指向该目录，因此读者看到的总是一个完整、一致的版本；
+    只保留最近 KEEP_VERSIONS 个版本
+    """
+
+    def __init__(self, directory=PREVIEW_DIR, every=DEFAULT_PREVIEW_EVERY, total=None):
+        self.directory = directory
+        self.every = max(1, every)
+        self.total = total
+        self.version = 0
+        self.written = 0
+        self.seconds = 0.0
+        self._started = time.time()
+
+    def due(self, count):
+        return count - self.written >= self.every
+
+    def write(self, outputs, count):
+        """
+        outputs 为 {文件名: 数据}；count 为已分析的诗数
+        """
+        started = time.perf_counter()
+        self.version += 1
+        name = f"v{self.version:05d}"
+        version_dir = os.path.join(self.directory, name)
+        os.makedirs(version_dir, exist_ok=True)
+        for filename, data in outputs.items():
+            _write_json(data, os.path.join(version_dir, filename))
+
+        info = {
+            "version": self.version,
+            "dir": name,
+            "poems": count,
+            "total": self.total,
+            "files": sorted(outputs),
+            "started_at": self._started,
+            "written_at": time.time()
+        }
+        _write_json(info, os.path.join(self.directory, LATEST_FILENAME), indent=2)
+        self.written = count
+        self._prune()
+        self.seconds += time.perf_counter() - started
+        return info
+
+    def _prune(self):
+        stale = self.version - KEEP_VERSIONS
+        if stale > 0:
+            shutil.rmtree(os.path.join(self.directory, f"v{stale:05d}"), ignore_errors=True)
+
+    def clear(self):
+        """
+        删除全部预览（新的一次运行开始时与完整结果导出之后）
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.version = 0
+        self.written = 0
+
+
+def latest_preview(directory=PREVIEW_DIR):
+    """
+    最新一个完整预览：返回 (版本目录, latest.json 内容)，没有预览时返回 None
+    """
+    path = os.path.join(directory, LATEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        info = json.load(f)
+    version_dir = os.path.join(directory, info["dir"])
+    if not os.path.isdir(version_dir):
+        return None
+    return version_dir, info
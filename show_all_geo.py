@@ -1,13 +1,8 @@
-import json
-import os
-from poetey_analysis import EXCLUDED_NAMES
+from poetry_lexicon import EXCLUDED_NAMES
+from poetry_db import load_geo_stats
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-
-path = os.path.join(OUTPUT_DIR, "geo_stats.json")
-with open(path, encoding="utf-8") as f:
-    data = json.load(f)
+# 优先读取 output/poetry.db，不存在时退回 geo_stats.json
+data = load_geo_stats()
 
 print("=" * 80)
 print("所有山河意象统计（已排除通用词汇）")
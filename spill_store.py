@@ -0,0 +1,260 @@
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+
+from poetry_interning import GeoMention, PoemRecord
+
+# 每登记多少首诗检查一次进程 RSS
+RSS_CHECK_INTERVAL = 256
+
+
+def current_rss_bytes():
+    """
+    当前进程常驻内存（Linux 读取 /proc/self/statm，其他平台返回 None）
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def estimate_record_size(record):
+    """
+    粗略估计单条 PoemRecord 占用的字节数
+    """
+    size = 400 + sys.getsizeof(record.content or "") + sys.getsizeof(record.title or "")
+    size += 120 * len(record.mentions)
+    size += 100 * len(record.dimensions or ())
+    return size
+
+
+def _encode_mentions(mentions):
+    return [[mention.place_id, list(mention.surfaces)] for mention in mentions]
+
+
+def _decode_mentions(items):
+    return [GeoMention(place_id, tuple(surfaces)) for place_id, surfaces in items]
+
+
+def encode_record(record):
+    return json.dumps(
+        [
+            record.order, record.title, record.author_id, record.dynasty_id,
+            _encode_mentions(record.mentions), record.score, record.label_id,
+            record.dimensions, record.content, record.source_path
+        ],
+        ensure_ascii=False
+    )
+
+
+def decode_record(line):
+    (order, title, author_id, dynasty_id, mentions, score,
+     label_id, dimensions, content, source_path) = json.loads(line)
+    return PoemRecord(
+        order, title, author_id, dynasty_id, _decode_mentions(mentions),
+        score, label_id, dimensions, content, source_path
+    )
+
+
+class SpilledPoems(Sequence):
+    """
+    落盘的逐诗结果：按 order 顺序追加写入，按偏移量随机读取，
+    可像列表一样 len()、下标访问与遍历
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array("q")
+        self._writer = open(path, "ab")
+        self._reader = None
+
+    def extend(self, records):
+        for record in records:
+            self.offsets.append(self._writer.tell())
+            self._writer.write(encode_record(record).encode("utf-8") + b"\n")
+
+    def finish(self):
+        self._writer.close()
+        self._reader = open(self.path, "rb")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        self._reader.seek(self.offsets[index])
+        return decode_record(self._reader.readline().decode("utf-8"))
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                yield decode_record(line.decode("utf-8"))
+
+    def close(self):
+        if not self._writer.closed:
+            self._writer.close()
+        if self._reader is not None:
+            self._reader.close()
+
+
+class MergedAuthorMentions:
+    """
+    多个有序溢写段的外部归并结果，items() 逐个作者产出 (author_id, 记录列表)；
+    段内按（作者首次提及的序号, order）排序，因此作者的先后与内存模式的字典插入顺序一致
+    """
+
+    def __init__(self, run_paths):
+        self.run_paths = run_paths
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                first_order, author_id, order, title, mentions = json.loads(line)
+                yield first_order, author_id, order, title, mentions
+
+    def items(self):
+        merged = heapq.merge(*(self._read_run(path) for path in self.run_paths))
+        current_author = None
+        records = []
+        for _, author_id, order, title, mentions in merged:
+            if author_id != current_author and records:
+                yield current_author, records
+                records = []
+            current_author = author_id
+            records.append(
+                PoemRecord(order, title, author_id, None, _decode_mentions(mentions),
+                           None, None, None, None, None)
+            )
+        if records:
+            yield current_author, records
+
+
+class SpillStore:
+    """
+    内存预算模式下的结果存储：缓冲区超出预算时，把逐诗结果追加到磁盘，
+    并把作者提及序列按（作者首次提及的序号, order）排序写成一个溢写段；结束时外部归并
+    """
+
+    def __init__(self, budget_bytes, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        # 缓冲区上限取预算的四分之一，其余留给词典、模型与关联矩阵
+        self.buffer_limit = max(budget_bytes // 4, 1)
+        self._tmpdir = tempfile.mkdtemp(prefix="poetry_spill_", dir=spill_dir)
+        self.poems = SpilledPoems(os.path.join(self._tmpdir, "poems.jsonl"))
+        self.run_paths = []
+        self._buffer = []
+        self._author_buffer = []
+        # author_id -> 该作者第一首有地名提及的诗的序号（作者数远小于诗数，常驻内存）
+        self._author_first = {}
+        self._buffer_bytes = 0
+        self._added = 0
+        self.peak_rss = current_rss_bytes() or 0
+        if self.peak_rss >= budget_bytes:
+            print(
+                f"警告：当前进程已占用 {self.peak_rss / 1024 / 1024:.1f} MB，超出内存预算，"
+                "结果将逐批溢写到磁盘"
+            )
+
+    def add(self, record, has_author):
+        self._buffer.append(record)
+        self._buffer_bytes += estimate_record_size(record)
+        if has_author and record.mentions:
+            first_order = self._author_first.setdefault(record.author_id, record.order)
+            self._author_buffer.append(
+                (first_order, record.author_id, record.order, record.title, _encode_mentions(record.mentions))
+            )
+        self._added += 1
+
+        if self._buffer_bytes >= self.buffer_limit:
+            self.spill()
+        elif self._added % RSS_CHECK_INTERVAL == 0:
+            rss = current_rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+                if rss >= self.budget_bytes:
+                    self.spill()
+
+    def spill(self):
+        if self._buffer:
+            self.poems.extend(self._buffer)
+            self._buffer = []
+            self._buffer_bytes = 0
+        if self._author_buffer:
+            self._author_buffer.sort(key=lambda item: (item[0], item[2]))
+            path = os.path.join(self._tmpdir, f"authors-{len(self.run_paths):05d}.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for item in self._author_buffer:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self.run_paths.append(path)
+            self._author_buffer = []
+
+    def finish(self):
+        """
+        写出剩余缓冲，返回 (逐诗结果序列, 归并后的作者提及)
+        """
+        self.spill()
+        self.poems.finish()
+        return self.poems, MergedAuthorMentions(self.run_paths)
+
+    def close(self):
+        self.poems.close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+def main():
+    """
+    自检：同一组逐诗结果分别在内存中与以小预算分段溢写后归并，比较逐诗结果与作者提及（含作者先后）是否一致。
+    python spill_store.py，不一致时以非零状态退出
+    """
+    from collections import defaultdict
+
+    # 作者 ID 顺序与首次提及顺序相反：作者 0 的第一首诗没有地名
+    specs = [(0, []), (1, [3]), (0, [5]), (1, [3, 7]), (2, [5]), (0, [7])] * 50
+    records = [
+        PoemRecord(order, f"诗{order}", author_id, 0, [GeoMention(pid, (f"地{pid}",)) for pid in place_ids],
+                   0.5, 2, {}, "正文", None)
+        for order, (author_id, place_ids) in enumerate(specs)
+    ]
+
+    expected = defaultdict(list)
+    for record in records:
+        if record.mentions:
+            expected[record.author_id].append(record)
+
+    # 每段约十首诗，段内排序与段间归并都会用到
+    store = SpillStore(24 * 1024)
+    try:
+        for record in records:
+            store.add(record, True)
+        poems, merged = store.finish()
+        problems = []
+        if [record.order for record in poems] != [record.order for record in records]:
+            problems.append("逐诗结果顺序不一致")
+        actual = list(merged.items())
+        if [author_id for author_id, _ in actual] != list(expected):
+            problems.append(f"作者先后不一致：{[a for a, _ in actual]} != {list(expected)}")
+        for author_id, author_records in actual:
+            if [r.order for r in author_records] != [r.order for r in expected[author_id]]:
+                problems.append(f"作者 {author_id} 的诗不一致")
+    finally:
+        store.close()
+
+    for problem in problems:
+        print(problem)
+    print("溢写与内存模式一致" if not problems else "溢写与内存模式不一致")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("jieba")
+pytest.importorskip("snownlp")
+
+from bench_memory import MEMORY_BUDGETS_PER_POEM, measure
+
+# 固定语料（花间集）的前若干首，足以覆盖逐诗结果与关联矩阵，又不至于让 tracemalloc 下的分析太慢
+TEST_POEMS = 100
+
+
+@pytest.fixture(scope="module")
+def per_poem():
+    results, count = measure(max_poems=TEST_POEMS)
+    assert count == TEST_POEMS
+    return results
+
+
+@pytest.mark.parametrize("item", sorted(MEMORY_BUDGETS_PER_POEM))
+def test_memory_per_poem_within_budget(per_poem, item):
+    """每首诗的内存（读入、分析后保留、PoemRecord 的 deep_sizeof、tracemalloc 峰值）不超过上限"""
+    budget = MEMORY_BUDGETS_PER_POEM[item]
+    assert per_poem[item] <= budget, f"{item}：每首 {per_poem[item]:.0f} 字节，超过上限 {budget} 字节"
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("jieba")
+pytest.importorskip("snownlp")
+
+from bench_memory import FIXTURE_DATASET
+from online_aggregator import OnlineAggregator
+from poetey_analysis import PoetryAnalyzer, aggregate_geo_statistics, build_poet_paths, load_poetry_from_local
+
+TEST_POEMS = 150
+# 撤回后按打乱的顺序重新加入的诗数
+CHURN = 50
+
+
+@pytest.fixture(scope="module", params=["jieba", "classical"])
+def batch(request):
+    analyzer = PoetryAnalyzer(tokenizer=request.param)
+    poems = load_poetry_from_local(TEST_POEMS, datasets=FIXTURE_DATASET, workers=1)
+    analysis = analyzer.analyze_poetry_collection(poems)
+    geo_stats, sentiment_trend, keyword_clouds = aggregate_geo_statistics(
+        analysis["poems"], analyzer.geo_coordinates, analyzer.tables, analysis["incidence"], analyzer.segmenter
+    )
+    outputs = {
+        "geo_stats.json": geo_stats,
+        "sentiment_trend.json": sentiment_trend,
+        "keyword_clouds.json": keyword_clouds,
+        "poet_paths.json": build_poet_paths(
+            analyzer.export_author_trajectories(analysis["author_trajectories"]), analyzer.geo_coordinates
+        )
+    }
+    return analyzer, analysis["poems"], outputs
+
+
+def assert_same_outputs(snapshot, outputs):
+    assert sorted(snapshot) == sorted(outputs)
+    for filename, data in outputs.items():
+        assert snapshot[filename] == data, f"{filename} 与批量导出不一致"
+
+
+def test_snapshot_matches_batch(batch):
+    analyzer, records, outputs = batch
+    assert_same_outputs(OnlineAggregator.from_records(analyzer, records).snapshot(), outputs)
+
+
+def test_snapshot_matches_batch_after_remove_and_add(batch):
+    analyzer, records, outputs = batch
+    aggregator = OnlineAggregator.from_records(analyzer, records)
+    rng = random.Random(0)
+    churned = rng.sample(records, CHURN)
+    for record in churned:
+        aggregator.remove(record)
+    rng.shuffle(churned)
+    for record in churned:
+        aggregator.add(record)
+    assert_same_outputs(aggregator.snapshot(), outputs)
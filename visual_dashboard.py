@@ -1,5 +1,8 @@
+import argparse
 import json
+import math
 import os
+import time
 from collections import defaultdict
 from datetime import datetime
 
@@ -9,19 +12,31 @@ from pyecharts.commons.utils import JsCode
 from pyecharts.globals import GeoType, CurrentConfig, ThemeType
 from jinja2 import Environment, FileSystemLoader
 
+from poetry_lexicon import EXCLUDED_NAMES
+from preview_snapshots import PREVIEW_DIR, latest_preview
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+# 生成看板必需的结果文件（其余为可选）
+REQUIRED_OUTPUTS = ("geo_stats.json", "sentiment_trend.json", "poet_paths.json")
 TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
-EXCLUDED_NAMES = {"千山","江山","山林","青山", "四海", "江湖", "山川","山河","西山","东山","天下", "九州", "五湖", "六合", "八荒", "九域", "四方", "宇内", "寰中", "江表", "河朔", "塞北", "岭南", "漠北", "中原", "南疆", "北疆", "关内", "关外", "河东", "河西", "山南", "山北", "淮左", "淮右", "山水", "四面山", "山河大地", "山阜", "峽山", "峡山", "河明", "浮川", "居海", "如海", "福海", "海陽", "海國", "海霧江", "湖江", "北湖", "青草湖", "柳邊湖", "明河", "陂湖", "好山", "山開南國", "莫指雲山", "中峰", "中台", "陽洲", "花洲", "四海九州"}
+# 诗人网络面板只画加权度数最高的这些诗人（全图有数万个节点，浏览器画不动）
+POET_NETWORK_LIMIT = 80
 
 
-def load_json(filename):
-    path = os.path.join(OUTPUT_DIR, filename)
+def load_json(filename, data_dir=OUTPUT_DIR):
+    path = os.path.join(data_dir, filename)
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def load_optional_json(filename, default=None, data_dir=OUTPUT_DIR):
+    if not os.path.exists(os.path.join(data_dir, filename)):
+        return default
+    return load_json(filename, data_dir)
+
+
 def build_dynasty_bar(sentiment_trend_data) -> Bar:
     dynasty_counter = defaultdict(int)
     for entry in sentiment_trend_data:
@@ -171,10 +186,22 @@ def build_keyword_cloud(keyword_items, location_name: str) -> WordCloud:
     return wordcloud
 
 
-def build_poet_graph(poet_list, location_name: str) -> Graph:
+def build_poet_graph(poet_list, location_name: str, related_places=()) -> Graph:
     nodes = [{"name": location_name, "symbolSize": 42, "category": 0, "draggable": False}]
     links = []
 
+    for place in related_places[:8]:
+        count = place.get("count", 1)
+        nodes.append(
+            {
+                "name": place["name"],
+                "symbolSize": max(14, min(14 + count, 30)),
+                "category": 2,
+                "draggable": False,
+            }
+        )
+        links.append({"source": location_name, "target": place["name"], "value": count})
+
     for poet in poet_list[:10]:
         poet_name = poet["name"]
         count = poet.get("count", 1)
@@ -198,7 +225,7 @@ def build_poet_graph(poet_list, location_name: str) -> Graph:
         series_name="诗人共吟网络",
         nodes=nodes,
         links=links,
-        categories=[{"name": "地点"}, {"name": "诗人"}],
+        categories=[{"name": "地点"}, {"name": "诗人"}, {"name": "关联地点"}],
         layout="circular",
         is_rotate_label=True,
     )
@@ -213,6 +240,61 @@ def build_poet_graph(poet_list, location_name: str) -> Graph:
     return graph
 
 
+def build_poet_network_graph(poet_network, limit=POET_NETWORK_LIMIT) -> Graph:
+    """
+    全体诗人的共享地名网络（poet_network.json）：取加权度数（共享地点数之和）最高的 limit 位诗人
+    及其之间的边，按社区着色，节点大小随吟咏地点数的平方根增长
+    """
+    nodes = poet_network.get("节点", [])
+    edges = poet_network.get("边", [])
+    degree = defaultdict(int)
+    for source, target, shared, _ in edges:
+        degree[source] += shared
+        degree[target] += shared
+    chosen = sorted(degree, key=lambda index: (-degree[index], index))[:limit]
+    chosen_set = set(chosen)
+
+    communities = sorted({nodes[index]["社区"] for index in chosen})
+    category_of = {community: position for position, community in enumerate(communities)}
+    graph_nodes = [
+        {
+            "name": nodes[index]["名称"],
+            "symbolSize": min(8 + round(1.6 * math.sqrt(nodes[index]["地点数"])), 40),
+            "category": category_of[nodes[index]["社区"]],
+            "value": nodes[index]["地点数"],
+        }
+        for index in chosen
+    ]
+    graph_links = [
+        {"source": nodes[source]["名称"], "target": nodes[target]["名称"], "value": shared}
+        for source, target, shared, _ in edges
+        if source in chosen_set and target in chosen_set
+    ]
+
+    graph = Graph(init_opts=opts.InitOpts(width="100%", height="420px", theme=ThemeType.DARK))
+    graph.chart_id = "poet_network_graph"
+    graph.add(
+        series_name="诗人共享地名网络",
+        nodes=graph_nodes,
+        links=graph_links,
+        categories=[{"name": f"社区 {community}"} for community in communities],
+        layout="force",
+        repulsion=120,
+        edge_length=[40, 160],
+        is_roam=True,
+    )
+    graph.set_global_opts(
+        title_opts=opts.TitleOpts(title=f"诗人共享地名网络（前 {len(graph_nodes)} 位）", pos_left="center"),
+        legend_opts=opts.LegendOpts(is_show=False),
+        tooltip_opts=opts.TooltipOpts(formatter="{b}：{c}"),
+    )
+    graph.set_series_opts(
+        label_opts=opts.LabelOpts(is_show=False),
+        linestyle_opts=opts.LineStyleOpts(color="source", width=0.8, opacity=0.5, curve=0.1),
+    )
+    return graph
+
+
 def compute_overview_stats(geo_stats_data):
     total_mentions = sum(entry["总出现次数"] for entry in geo_stats_data)
     unique_geos = len(geo_stats_data)
@@ -250,9 +332,41 @@ def select_hot_geos(geo_stats, limit=8):
     return filtered
 
 
-def prepare_location_details(geo_stats, keyword_clouds, sentiment_trend, poet_paths):
+def index_place_network(place_network):
+    """
+    将预计算的地名网络整理为 {地名: {"community", "poets", "related"}}，
+    关联地点按共现次数降序
+    """
+    if not place_network:
+        return {}
+    nodes = place_network.get("节点", [])
+    related = defaultdict(list)
+    for source, target, count, _ in place_network.get("边", []):
+        related[source].append((target, count))
+        related[target].append((source, count))
+
+    index = {}
+    for node_index, node in enumerate(nodes):
+        name = node["名称"]
+        if name in EXCLUDED_NAMES:
+            continue
+        neighbours = sorted(related.get(node_index, []), key=lambda x: x[1], reverse=True)
+        index[name] = {
+            "community": node.get("社区"),
+            "poets": [{"name": poet, "count": count} for poet, count in node.get("诗人", [])],
+            "related": [
+                {"name": nodes[other]["名称"], "count": count}
+                for other, count in neighbours
+                if nodes[other]["名称"] not in EXCLUDED_NAMES
+            ],
+        }
+    return index
+
+
+def prepare_location_details(geo_stats, keyword_clouds, sentiment_trend, poet_paths, place_network=None):
     keyword_map = {entry["名称"]: entry.get("关键词", []) for entry in keyword_clouds}
     trend_map = {entry["名称"]: entry.get("数据", []) for entry in sentiment_trend}
+    network_map = index_place_network(place_network)
 
     poet_counter = defaultdict(lambda: defaultdict(int))
     for poet in poet_paths:
@@ -268,7 +382,8 @@ def prepare_location_details(geo_stats, keyword_clouds, sentiment_trend, poet_pa
         name = entry["名称"]
         if name in EXCLUDED_NAMES:
             continue
-        poets_detail = [
+        network = network_map.get(name, {})
+        poets_detail = network.get("poets") or [
             {"name": poet_name, "count": count}
             for poet_name, count in sorted(
                 poet_counter.get(name, {}).items(), key=lambda x: x[1], reverse=True
@@ -283,6 +398,8 @@ def prepare_location_details(geo_stats, keyword_clouds, sentiment_trend, poet_pa
             "timeline": trend_map.get(name) or entry.get("朝代统计", []),
             "keywords": keyword_map.get(name, []),
             "poets": poets_detail,
+            "related": network.get("related", []),
+            "community": network.get("community"),
         }
 
     return location_details
@@ -309,20 +426,55 @@ def render_dashboard(template_name, context, output_path):
     print(f"可视化页面已生成：{output_path}")
 
 
-def build_dashboard():
+def preview_progress(info):
+    """
+    由预览的 latest.json 生成看板顶部的进度信息
+    """
+    poems, total = info["poems"], info.get("total")
+    elapsed = info["written_at"] - info["started_at"]
+    progress = {
+        "version": info["version"],
+        "poems": poems,
+        "total": total,
+        "percent": round(min(poems / total, 1) * 100, 1) if total else None,
+        "written_at": datetime.fromtimestamp(info["written_at"]).strftime("%Y年%m月%d日 %H:%M:%S"),
+        "eta_minutes": None
+    }
+    if total and poems and poems < total and elapsed > 0:
+        progress["eta_minutes"] = round(elapsed / poems * (total - poems) / 60, 1)
+    return progress
+
+
+def build_dashboard(preview=False, preview_dir=PREVIEW_DIR):
+    """
+    由 output/ 中的完整结果生成看板；preview 为 True 时改用最新的阶段性预览（见 preview_snapshots），
+    页面顶部显示进度，写出 output/poetry_dashboard_preview.html。返回所用的预览版本（非预览时为 None）
+    """
+    data_dir = OUTPUT_DIR
+    progress = None
+    output_name = "poetry_dashboard.html"
+    if preview:
+        latest = latest_preview(preview_dir)
+        if latest is None:
+            print(f"未找到阶段性预览（{preview_dir}），使用 output/ 中的完整结果")
+        else:
+            data_dir, info = latest
+            progress = preview_progress(info)
+            output_name = "poetry_dashboard_preview.html"
+
     geo_stats = [
-        entry for entry in load_json("geo_stats.json")
+        entry for entry in load_json("geo_stats.json", data_dir)
         if entry.get("名称") not in EXCLUDED_NAMES
     ]
     sentiment_trend = [
-        entry for entry in load_json("sentiment_trend.json")
+        entry for entry in load_json("sentiment_trend.json", data_dir)
         if entry.get("名称") not in EXCLUDED_NAMES
     ]
     keyword_clouds = [
-        entry for entry in load_json("keyword_clouds.json")
+        entry for entry in load_optional_json("keyword_clouds.json", [], data_dir)
         if entry.get("名称") not in EXCLUDED_NAMES
     ]
-    poet_paths_raw = load_json("poet_paths.json")
+    poet_paths_raw = load_json("poet_paths.json", data_dir)
     poet_paths = []
     for poet in poet_paths_raw:
         filtered_stats = [
@@ -341,8 +493,11 @@ def build_dashboard():
             }
         )
 
+    place_network = load_optional_json("place_network.json", data_dir=data_dir)
+    poet_network = load_optional_json("poet_network.json", data_dir=data_dir)
+
     location_details = prepare_location_details(
-        geo_stats, keyword_clouds, sentiment_trend, poet_paths
+        geo_stats, keyword_clouds, sentiment_trend, poet_paths, place_network
     )
 
     # 默认地点：优先选择有坐标的出现频率最高地点
@@ -362,6 +517,7 @@ def build_dashboard():
         "keywords": [],
         "timeline": [],
         "poets": [],
+        "related": [],
         "total": 0,
     })
 
@@ -369,8 +525,12 @@ def build_dashboard():
         "map_chart": build_geo_map(geo_stats),
         "pie_chart": build_sentiment_pie(default_detail.get("sentiments", {}), default_location),
         "wordcloud_chart": build_keyword_cloud(default_detail.get("keywords", []), default_location),
-        "network_chart": build_poet_graph(default_detail.get("poets", []), default_location),
+        "network_chart": build_poet_graph(
+            default_detail.get("poets", []), default_location, default_detail.get("related", [])
+        ),
     }
+    if poet_network and poet_network.get("边"):
+        charts["poet_network_chart"] = build_poet_network_graph(poet_network)
 
     chart_embeds = {name: chart.render_embed() for name, chart in charts.items()}
     
@@ -390,13 +550,57 @@ def build_dashboard():
         "current_time": now_str,
         "default_location": default_location,
         "location_details": json.dumps(location_details, ensure_ascii=False),
-        "hot_geos": select_hot_geos(geo_stats, limit=8)
+        "hot_geos": select_hot_geos(geo_stats, limit=8),
+        "progress": progress
     }
 
-    output_path = os.path.join(OUTPUT_DIR, "poetry_dashboard.html")
+    output_path = os.path.join(OUTPUT_DIR, output_name)
     render_dashboard("dashboard_template.html", context, output_path)
+    return progress and progress["version"]
+
+
+def outputs_updated_since(started):
+    """
+    看板必需的完整结果是否都在 started（时间戳）之后写出
+    """
+    paths = [os.path.join(OUTPUT_DIR, filename) for filename in REQUIRED_OUTPUTS]
+    return all(os.path.exists(path) and os.path.getmtime(path) >= started for path in paths)
+
+
+def watch_preview(interval, preview_dir=PREVIEW_DIR):
+    """
+    每隔 interval 秒检查一次预览，出现新版本时重新生成预览看板；预览被删除（分析完成）后生成完整看板并退出。
+    一直没有预览（如诗数不足一个预览间隔）时，output/ 中的完整结果在开始监视之后更新即生成完整看板并退出
+    """
+    started = time.time()
+    rendered = None
+    while True:
+        latest = latest_preview(preview_dir)
+        if latest is None:
+            if rendered is not None or outputs_updated_since(started):
+                build_dashboard()
+                return
+        elif latest[1]["version"] != rendered:
+            rendered = build_dashboard(preview=True, preview_dir=preview_dir)
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成诗词山河文化地图看板")
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="使用分析过程中写出的最新阶段性预览（poetey_analysis.py --preview），页面顶部显示进度"
+    )
+    parser.add_argument("--preview-dir", default=PREVIEW_DIR, help="阶段性预览目录")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="与 --preview 同用：每隔若干秒检查新版本并重新生成")
+    args = parser.parse_args()
+    if args.watch:
+        watch_preview(args.watch, args.preview_dir)
+    else:
+        build_dashboard(args.preview, args.preview_dir)
 
 
 if __name__ == "__main__":
-    build_dashboard()
+    main()
 